@@ -1,16 +1,81 @@
 import os
-import joblib
+import asyncio
+import csv
+import json
+import time
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Literal
 
-from fastapi import FastAPI
+from fastapi import (
+    BackgroundTasks, Depends, FastAPI, Header, HTTPException, Query, Request,
+    WebSocket, WebSocketDisconnect
+)
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from starlette.requests import ClientDisconnect
 
 # ------------------- Local Imports -------------------
 from utils.preprocessing import preprocess
 from utils.abuse_words import detect_abusive_tokens
-from utils.sentiment import analyze_sentiment
-from utils.llm_guard import analyze_toxicity_llm
+from utils.sentiment import (
+    analyze_sentiment,
+    analyze_sentiment_batch,
+    cache_stats as sentiment_cache_stats,
+    combine_sentiments,
+    neutral_sentiment
+)
+from utils.llm_guard import (
+    analyze_toxicity_llm,
+    analyze_toxicity_llm_async,
+    analyze_toxicity_llm_many_async,
+    batcher_stats,
+    cached_verdict,
+    llm_gate,
+    model_stats as llm_model_stats,
+    rate_limiter,
+    verdict_cache
+)
+from utils import cascade, engines, metrics
+from utils.admission import LocalLoad
+from utils.deferred_jobs import DeferredJobs
+from utils.engines import engine
+from utils.live_session import SentenceCache, merge_llm, payload_delta, split_sentences
+from utils.long_document import build_windows, locate_phrase, rule_spans, sentence_spans
+from utils.model_registry import ModelHandle, ModelRegistry
+from utils.near_duplicate import NearDuplicateIndex
+from utils.online_learner import FeedbackLog, OnlineTrainer
+from utils.singleflight import SingleFlight
+from utils.verdict_cache import cache_key
+
+# =====================================================
+# STARTUP (LAZY ENGINES + WARM-UP)
+# =====================================================
+
+# background → start serving at once, load engines in a thread (default)
+# eager      → load every engine before accepting traffic
+# lazy       → load each engine on its first request
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background").lower()
+
+# Engines that must be warm for /ready to report ready
+READY_ENGINES = os.getenv("READY_ENGINES", "rules,sentiment,ml").split(",")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_MODE == "eager":
+        await asyncio.to_thread(engines.warm_all)
+    elif WARMUP_MODE == "background":
+        engines.warm_in_background()
+
+    if online_trainer:
+        online_trainer.run(ONLINE_INTERVAL)
+
+    yield
+
+    cpu_executor.shutdown(wait=False)
 
 # =====================================================
 # APP INITIALIZATION
@@ -19,7 +84,8 @@ from utils.llm_guard import analyze_toxicity_llm
 app = FastAPI(
     title="ToxiGuard AI",
     description="Hybrid AI Toxic Content Detection API (Rules + ML + LLM)",
-    version="3.0.0"
+    version="3.0.0",
+    lifespan=lifespan
 )
 
 # =====================================================
@@ -40,25 +106,197 @@ app.add_middleware(
 
 BASE_DIR = os.path.dirname(__file__)
 
-MODEL_PATH = os.path.join(BASE_DIR, "abuse_model.joblib")
-ENCODER_PATH = os.path.join(BASE_DIR, "label_encoder.joblib")
+# Versioned models (models/<version>/), hot-swapped without restart.
+# The artifacts in backend/ itself are the "builtin" fallback.
+MODELS_DIR = os.getenv("MODELS_DIR", os.path.join(BASE_DIR, "models"))
+
+# Seconds between scans of MODELS_DIR for new versions (0 = off)
+MODEL_POLL_SECONDS = float(os.getenv("MODEL_POLL_SECONDS", "10"))
+
+# Share of the smoke set a new version must get right to go live
+MODEL_SMOKE_MIN_ACCURACY = float(os.getenv("MODEL_SMOKE_MIN_ACCURACY", "0.8"))
+
+# auto    → numpy engine when the linear export exists, else sklearn
+# numpy   → numpy engine only (python train_model.py --export-only)
+# sklearn → full joblib Pipeline
+ML_ENGINE = os.getenv("ML_ENGINE", "auto").lower()
+
+# Shared secret for /admin endpoints (X-Admin-Token header). Without it
+# they answer 403, unless ADMIN_OPEN=1 (e.g. local development).
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+ADMIN_OPEN = os.getenv("ADMIN_OPEN", "0") == "1"
+
+# Shared secret for /feedback (X-Moderator-Token header; ADMIN_TOKEN works too)
+MODERATOR_TOKEN = os.getenv("MODERATOR_TOKEN")
+
+# 1 → online-* versions go live on their own; by default an admin activates them
+ONLINE_AUTO_ACTIVATE = os.getenv("ONLINE_AUTO_ACTIVATE", "0") == "1"
+
+
+@engine("ml")
+def get_model_registry():
+    """
+    Model registry with the newest valid version active, loaded on
+    first use or during warm-up. Starts the version watcher.
+    """
+    registry = ModelRegistry(
+        MODELS_DIR,
+        BASE_DIR,
+        ml_engine=ML_ENGINE,
+        min_smoke_accuracy=MODEL_SMOKE_MIN_ACCURACY,
+        hold_prefixes=() if ONLINE_AUTO_ACTIVATE else ("online-",)
+    )
+    registry.load_initial()
+
+    if MODEL_POLL_SECONDS > 0:
+        registry.watch(MODEL_POLL_SECONDS)
+
+    return registry
+
+
+def get_ml_model() -> ModelHandle | None:
+    """
+    Active (version, model, labels). Callers keep the handle for the
+    whole request, so a concurrent swap never mixes two versions.
+    """
+    registry = get_model_registry()
+    return registry.active if registry else None
+
+# =====================================================
+# ONLINE LEARNING (MODERATOR FEEDBACK)
+# =====================================================
+
+FEEDBACK_LOG = os.getenv("FEEDBACK_LOG", os.path.join(BASE_DIR, "data", "feedback.jsonl"))
+
+# 1 → train on feedback in the background and publish model versions.
+# Enable it in one process only (e.g. a single uvicorn worker).
+ONLINE_LEARNING = os.getenv("ONLINE_LEARNING", "0") == "1"
+ONLINE_INTERVAL = float(os.getenv("ONLINE_INTERVAL", "10"))                # seconds between feedback reads
+ONLINE_BATCH_SIZE = int(os.getenv("ONLINE_BATCH_SIZE", "32"))              # records per partial_fit
+ONLINE_PUBLISH_SECONDS = float(os.getenv("ONLINE_PUBLISH_SECONDS", "300"))  # min seconds between versions
+ONLINE_FEEDBACK_WEIGHT = float(os.getenv("ONLINE_FEEDBACK_WEIGHT", "3"))   # vs. bootstrap rows
+
+feedback_log = FeedbackLog(FEEDBACK_LOG)
+
+
+def _on_model_published(version: str):
+    # Pick the new version up now instead of on the next poll
+    registry = get_model_registry.engine.value
+    if registry is not None:
+        registry.poll()
+
+
+online_trainer = OnlineTrainer(
+    feedback_log,
+    encoder_path=os.path.join(BASE_DIR, "label_encoder.joblib"),
+    data_path=os.path.join(BASE_DIR, "data", "sample_data.csv"),
+    models_dir=MODELS_DIR,
+    state_path=os.path.join(MODELS_DIR, ".online", "state.joblib"),
+    batch_size=ONLINE_BATCH_SIZE,
+    publish_every=ONLINE_PUBLISH_SECONDS,
+    feedback_weight=ONLINE_FEEDBACK_WEIGHT,
+    on_publish=_on_model_published
+) if ONLINE_LEARNING else None
+
+# =====================================================
+# RUNTIME CONFIG
+# =====================================================
+
+# Max texts accepted by /predict/batch
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "256"))
+
+# llm="defer" verdicts kept for GET /predict/jobs/{job_id}
+DEFER_JOBS_SIZE = int(os.getenv("DEFER_JOBS_SIZE", "10000"))
+DEFER_JOBS_TTL = float(os.getenv("DEFER_JOBS_TTL", "3600"))   # seconds
+
+deferred_jobs = DeferredJobs(max_size=DEFER_JOBS_SIZE, ttl=DEFER_JOBS_TTL)
+
+# Records scored per chunk by /predict/stream
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "128"))
+
+# Bounded pool for the CPU stages of the async /predict
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(8, os.cpu_count() or 1))))
+cpu_executor = ThreadPoolExecutor(
+    max_workers=CPU_WORKERS,
+    thread_name_prefix="toxiguard-cpu"
+)
+
+# Requests in the local stages at once before 429 (0 = unlimited).
+# Batch may fill LOCAL_BATCH_SHARE of it, backfill LOCAL_BACKFILL_SHARE.
+LOCAL_MAX_IN_FLIGHT = int(os.getenv("LOCAL_MAX_IN_FLIGHT", str(CPU_WORKERS * 8)))
+LOCAL_BATCH_SHARE = float(os.getenv("LOCAL_BATCH_SHARE", "0.75"))
+LOCAL_BACKFILL_SHARE = float(os.getenv("LOCAL_BACKFILL_SHARE", "0.5"))
+
+local_load = LocalLoad(
+    LOCAL_MAX_IN_FLIGHT,
+    workers=CPU_WORKERS,
+    shares={
+        "interactive": 1.0,
+        "batch": LOCAL_BATCH_SHARE,
+        "backfill": LOCAL_BACKFILL_SHARE
+    }
+)
+
+# Fire-and-forget LLM calls (cascade background mode)
+_background_tasks = set()
+
+# Concurrent /predict calls with the same clean_text share one run
+inflight = SingleFlight()
+
+# Reuse the LLM verdict of a recently judged near-duplicate (raid / spam
+# variants). SimHash distance in bits out of 64; size 0 turns it off.
+NEAR_DUP_SIZE = int(os.getenv("NEAR_DUP_SIZE", "5000"))
+NEAR_DUP_MAX_DISTANCE = int(os.getenv("NEAR_DUP_MAX_DISTANCE", "3"))
+NEAR_DUP_TTL = float(os.getenv("NEAR_DUP_TTL", "600"))        # seconds
+NEAR_DUP_MIN_CHARS = int(os.getenv("NEAR_DUP_MIN_CHARS", "16"))  # shorter texts are too noisy
 
-model = None
-label_encoder = None
+near_duplicates = NearDuplicateIndex(
+    max_size=NEAR_DUP_SIZE,
+    max_distance=NEAR_DUP_MAX_DISTANCE,
+    ttl=NEAR_DUP_TTL,
+    min_chars=NEAR_DUP_MIN_CHARS
+) if NEAR_DUP_SIZE > 0 else None
 
-try:
-    model = joblib.load(MODEL_PATH)
-    label_encoder = joblib.load(ENCODER_PATH)
-    print("✅ ML model loaded successfully")
-except Exception as e:
-    print("⚠️ ML model load failed:", e)
+# /predict: texts longer than this are scored in overlapping sentence
+# windows (0 = always score the whole text as one document)
+LONG_TEXT_CHARS = int(os.getenv("LONG_TEXT_CHARS", "2000"))
+LONG_WINDOW_SENTENCES = int(os.getenv("LONG_WINDOW_SENTENCES", "4"))   # sentences per window
+LONG_WINDOW_OVERLAP = int(os.getenv("LONG_WINDOW_OVERLAP", "1"))       # shared with the next window
+LONG_LLM_WINDOWS = int(os.getenv("LONG_LLM_WINDOWS", "3"))             # riskiest windows sent to the LLM
+LONG_LLM_MIN_RISK = float(os.getenv("LONG_LLM_MIN_RISK", "0.35"))      # below this a window never is
+LONG_CHUNK = int(os.getenv("LONG_CHUNK", "64"))                        # sentences / windows per executor task
+
+# /ws/moderate: quiet period after the last edit before rescoring
+WS_DEBOUNCE_MS = float(os.getenv("WS_DEBOUNCE_MS", "300"))
+
+# /ws/moderate: scored sentences remembered per session
+WS_SENTENCE_CACHE = int(os.getenv("WS_SENTENCE_CACHE", "512"))
 
 # =====================================================
 # REQUEST SCHEMA
 # =====================================================
 
+Priority = Literal["interactive", "batch", "backfill"]
+
+
 class TextRequest(BaseModel):
     text: str
+    timings: bool = False   # add a per-stage latency breakdown (ms)
+    deadline_ms: int | None = None   # latency budget; late stages are reported, not awaited
+    priority: Priority = "interactive"
+
+
+class BatchRequest(BaseModel):
+    texts: list[str]
+    llm: Literal["inline", "skip", "defer"] = "skip"
+    priority: Priority = "batch"
+
+
+class FeedbackRequest(BaseModel):
+    text: str
+    label: str                    # corrected label, one of the model's classes
+    predicted: str | None = None  # label the API returned, for auditing
+    moderator: str | None = None
 
 
 # =====================================================
@@ -70,6 +308,172 @@ def health():
     return {"status": "ToxiGuard API running"}
 
 
+@app.get("/ready")
+def ready():
+    """
+    Readiness probe: 200 once the required engines are warm, else 503.
+    """
+    report = engines.readiness(READY_ENGINES)
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.get("/stats")
+def stats():
+    return {
+        "llm_cache": verdict_cache.stats(),
+        "llm_rate_limiter": rate_limiter.stats(),
+        "llm_admission": llm_gate.stats(),
+        "local_admission": local_load.stats(),
+        "llm_batcher": batcher_stats(),
+        "cascade": cascade.stats(),
+        "coalescing": inflight.stats(),
+        "deferred_jobs": deferred_jobs.stats(),
+        "near_duplicates": near_duplicates.stats() if near_duplicates else None,
+        "llm_models": llm_model_stats(),
+        "sentiment_cache": sentiment_cache_stats(),
+        "online_learning": online_trainer.stats() if online_trainer else None
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Counters and latency histograms in the Prometheus text format.
+    """
+    for priority, depth in llm_gate.stats()["queue_depth"].items():
+        metrics.llm_queue_depth.set(depth, priority=priority)
+    metrics.llm_cache_entries.set(verdict_cache.stats()["size"])
+    metrics.requests_in_flight.set(inflight.stats()["in_flight"])
+    metrics.local_in_flight.set(local_load.stats()["in_flight"])
+
+    return PlainTextResponse(
+        metrics.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+# =====================================================
+# MODEL ADMIN (LIST / ACTIVATE / ROLLBACK)
+# =====================================================
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    if not ADMIN_TOKEN:
+        # Activation and rollback swap the live model: never open by default
+        if not ADMIN_OPEN:
+            raise HTTPException(
+                status_code=403,
+                detail="Set ADMIN_TOKEN (or ADMIN_OPEN=1) to use the admin endpoints"
+            )
+        return
+
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def require_moderator(x_moderator_token: str | None = Header(None),
+                      x_admin_token: str | None = Header(None)):
+    tokens = [t for t in (MODERATOR_TOKEN, ADMIN_TOKEN) if t]
+
+    if not tokens:
+        # Labels train the live model: never accept them anonymously
+        if ONLINE_LEARNING:
+            raise HTTPException(
+                status_code=403,
+                detail="Set MODERATOR_TOKEN or ADMIN_TOKEN to accept feedback with ONLINE_LEARNING=1"
+            )
+        return
+
+    if x_moderator_token not in tokens and x_admin_token not in tokens:
+        raise HTTPException(status_code=401, detail="Invalid moderator token")
+
+
+def _registry_or_503() -> ModelRegistry:
+    registry = get_model_registry()
+    if registry is None:
+        raise HTTPException(status_code=503, detail="ML engine unavailable")
+    return registry
+
+
+def _models_report(registry: ModelRegistry) -> dict:
+    return {
+        "active": registry.active.version if registry.active else None,
+        "versions": registry.versions()
+    }
+
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+def list_models():
+    return _models_report(_registry_or_503())
+
+
+@app.post("/admin/models/{version}/activate", dependencies=[Depends(require_admin)])
+def activate_model(version: str):
+    """
+    Loads, smoke-tests and swaps in `version`. In-flight requests
+    finish on the model they started with.
+    """
+    registry = _registry_or_503()
+
+    try:
+        registry.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Model {version} rejected: {e}")
+
+    return _models_report(registry)
+
+
+@app.post("/admin/models/rollback", dependencies=[Depends(require_admin)])
+def rollback_model():
+    registry = _registry_or_503()
+
+    try:
+        registry.rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return _models_report(registry)
+
+
+# =====================================================
+# MODERATOR FEEDBACK
+# =====================================================
+
+@app.post("/feedback", dependencies=[Depends(require_moderator)])
+def feedback(req: FeedbackRequest):
+    """
+    Records a moderator's corrected label. With ONLINE_LEARNING=1 the
+    background trainer learns from it and publishes a new model version
+    (held for an admin unless ONLINE_AUTO_ACTIVATE=1).
+    """
+    text = req.text.strip()
+    if not text:
+        raise HTTPException(status_code=422, detail="Empty text")
+
+    handle = get_ml_model()
+    if handle and req.label not in handle.labels:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown label '{req.label}', expected one of {handle.labels}"
+        )
+
+    feedback_log.append({
+        "text": text,
+        "label": req.label,
+        "predicted": req.predicted,
+        "moderator": req.moderator,
+        "model_version": handle.version if handle else None,
+        "ts": time.time()
+    })
+
+    return {
+        "status": "recorded",
+        "label": req.label,
+        "online_learning": ONLINE_LEARNING
+    }
+
+
 # =====================================================
 # SMART SUGGESTION ENGINE
 # =====================================================
@@ -127,95 +531,112 @@ def build_response(payload: dict):
     freq = dict(Counter(abusive_words))
 
     payload["word_frequency"] = freq
-    payload["suggestions"] = generate_suggestions(abusive_words)
+
+    with metrics.stage("suggestions"):
+        payload["suggestions"] = generate_suggestions(abusive_words)
 
     return payload
 
 
 # =====================================================
-# MAIN ENDPOINT
+# PIPELINE STAGES
 # =====================================================
 
-@app.post("/predict")
-def predict(req: TextRequest):
-    text = req.text.strip()
+def empty_payload() -> dict:
+    return {
+        "toxic": False,
+        "confidence": 0.0,
+        "severity": "low",
+        "reason": "Empty input",
+        "abusive_words": [],
+        "sentiment": None,
+        "source": "none",
+        "rules": None,
+        "ml": None,
+        "llm": None
+    }
 
-    if not text:
-        return build_response({
-            "toxic": False,
-            "confidence": 0.0,
-            "severity": "low",
-            "reason": "Empty input",
-            "abusive_words": [],
-            "sentiment": None,
-            "source": "none",
-            "rules": None,
-            "ml": None,
-            "llm": None
-        })
 
-    # -------------------------------------------------
-    # PREPROCESS
-    # -------------------------------------------------
-    processed = preprocess(text)
-    clean_text = processed["clean_text"]
+def run_preprocess(text: str) -> str:
+    with metrics.stage("preprocess"):
+        return preprocess(text)["clean_text"]
 
-    sentiment = analyze_sentiment(clean_text)
 
-    # -------------------------------------------------
-    # 🧱 RULE ENGINE
-    # -------------------------------------------------
-    abusive_hits = detect_abusive_tokens(clean_text)
+def run_sentiment(clean_text: str) -> dict:
+    with metrics.stage("sentiment"):
+        return analyze_sentiment(clean_text)
 
-    rules_result = {
+
+def run_rules(clean_text: str) -> dict:
+    with metrics.stage("rules"):
+        abusive_hits = detect_abusive_tokens(clean_text)
+
+    return {
         "triggered": len(abusive_hits) > 0,
         "abusive_words": abusive_hits,
         "confidence": 0.95 if abusive_hits else 0.0
     }
 
-    # -------------------------------------------------
-    # 🤖 ML ENGINE
-    # -------------------------------------------------
-    ml_result = None
-    toxic_probability = 0.0
 
-    if model and label_encoder:
-        try:
-            probs = model.predict_proba([clean_text])[0]
-            labels = list(label_encoder.classes_)
+def run_ml(clean_texts: list[str]) -> list[tuple[dict | None, float]]:
+    """
+    Scores all texts with a single predict_proba call.
+    Returns (ml_result, toxic_probability) per text.
+    """
+    results = [(None, 0.0)] * len(clean_texts)
+
+    handle = get_ml_model() if clean_texts else None
+    if not handle:
+        return results
 
+    model, labels = handle.model, handle.labels
+
+    try:
+        with metrics.stage("ml"):
+            all_probs = model.predict_proba(clean_texts)
+        pred_labels = [labels[j] for j in all_probs.argmax(axis=1)]
+
+        for i, probs in enumerate(all_probs):
             if "toxic" in labels:
                 toxic_probability = float(probs[labels.index("toxic")])
             else:
                 toxic_probability = float(max(probs))
 
-            pred_label = label_encoder.inverse_transform([probs.argmax()])[0]
-
             ml_result = {
-                "label": pred_label,
+                "label": pred_labels[i],
                 "toxicity_probability": round(toxic_probability, 3),
                 "all_probabilities": {
-                    labels[i]: round(float(probs[i]), 3)
-                    for i in range(len(labels))
-                }
+                    labels[j]: round(float(probs[j]), 3)
+                    for j in range(len(labels))
+                },
+                "model_version": handle.version
             }
+            results[i] = (ml_result, toxic_probability)
 
-        except Exception as e:
-            print("⚠️ ML prediction error:", e)
+    except Exception as e:
+        print("⚠️ ML prediction error:", e)
 
-    # -------------------------------------------------
-    # 🧠 LLM ENGINE
-    # -------------------------------------------------
-    llm_result = analyze_toxicity_llm(text)
+    return results
 
-    # -------------------------------------------------
-    # 🎯 FINAL DECISION (ENSEMBLE)
-    # -------------------------------------------------
+
+def combine_results(
+    sentiment: dict,
+    rules_result: dict,
+    ml_result: dict | None,
+    toxic_probability: float,
+    llm_result: dict | None,
+    llm_note: str = ""
+) -> dict:
+    """
+    Final ensemble decision over rules + ML + LLM.
+    `llm_result` is None when the LLM stage did not run.
+    """
+    llm = llm_result or {}
 
     scores = [
         rules_result["confidence"],
         toxic_probability,
-        llm_result.get("confidence", 0.0)
+        llm.get("confidence", 0.0)
     ]
 
     final_confidence = round(max(scores), 3)
@@ -231,17 +652,17 @@ def predict(req: TextRequest):
 
     # Combine abusive words from rules + llm
     abusive_words = list(set(
-        abusive_hits +
-        llm_result.get("detected_phrases", [])
+        rules_result["abusive_words"] +
+        llm.get("detected_phrases", [])
     ))
 
     reason = (
         f"Rules: {rules_result['triggered']} | "
         f"ML prob: {round(toxic_probability,2)} | "
-        f"LLM: {llm_result.get('explanation','')}"
+        f"LLM: {llm_note or llm.get('explanation','')}"
     )
 
-    payload = {
+    return {
         "toxic": toxic,
         "confidence": final_confidence,
         "severity": severity,
@@ -254,4 +675,1171 @@ def predict(req: TextRequest):
         "llm": llm_result
     }
 
-    return build_response(payload)
+
+def run_local_stages(clean_text: str) -> tuple:
+    """
+    Sentiment → rules → ML for a single preprocessed text.
+    Returns (sentiment, rules_result, ml_result, toxic_probability).
+    """
+    sentiment = run_sentiment(clean_text)
+    rules_result = run_rules(clean_text)
+    ml_result, toxic_probability = run_ml([clean_text])[0]
+
+    return sentiment, rules_result, ml_result, toxic_probability
+
+
+def plan_llm(text: str, rules_result: dict, ml_result: dict | None,
+             toxic_probability: float) -> tuple[dict, dict | None, str]:
+    """
+    Applies the cascade policy after the cheap stages.
+
+    Returns (decision, llm_result, llm_note). When the LLM is skipped,
+    llm_result is an earlier cached verdict if there is one, else None.
+    """
+    decision = cascade.decide(rules_result, ml_result, toxic_probability)
+
+    if decision["llm"] == "escalated":
+        return decision, None, ""
+
+    llm_result = cached_verdict(text)
+    llm_note = "" if llm_result else f"skipped ({decision['tier']})"
+
+    return decision, llm_result, llm_note
+
+
+# -----------------------------------------------------
+# Near-duplicate verdict reuse
+# -----------------------------------------------------
+
+def find_near_duplicate(text: str, clean_text: str) -> dict | None:
+    """
+    {"verdict", "distance"} when a near-duplicate of `clean_text` was
+    judged by the LLM recently. A text with its own cached verdict gets
+    None: the exact-match cache answers it.
+    """
+    if near_duplicates is None or verdict_cache.contains(text):
+        return None
+
+    near = near_duplicates.lookup(clean_text, cache_key(text))
+    metrics.near_duplicate_total.inc(result="hit" if near else "miss")
+    return near
+
+
+def reuse_near_duplicate(near: dict | None, text: str, rules_result: dict,
+                         toxic_probability: float) -> dict | None:
+    """
+    The neighbour's verdict, adapted to `text`, if rules + ML agree with
+    it; else None and the caller asks the LLM. A few bits of SimHash can
+    hide a flipped meaning ("thank you" / "f*** you"); the local stages
+    catch most of those. Phrases not found in `text` are dropped.
+    """
+    if near is None:
+        return None
+
+    verdict = near["verdict"]
+    local_toxic = max(rules_result["confidence"], toxic_probability) >= 0.5
+
+    if local_toxic != bool(verdict.get("toxic")):
+        metrics.near_duplicate_total.inc(result="rejected")
+        return None
+
+    lowered = text.lower()
+    verdict["detected_phrases"] = [
+        p for p in verdict.get("detected_phrases", []) if p.lower() in lowered
+    ]
+    return near
+
+
+def remember_verdict(text: str, clean_text: str, llm_result: dict):
+    # Only real answers, never fallback verdicts
+    if near_duplicates is not None and llm_result.get("status") in ("ok", "queued"):
+        near_duplicates.add(clean_text, llm_result, cache_key(text))
+
+
+async def judge_llm(text: str, clean_text: str, priority: str = "interactive") -> dict:
+    llm_result = await analyze_toxicity_llm_async(text, priority)
+    remember_verdict(text, clean_text, llm_result)
+    return llm_result
+
+
+def judge_llm_sync(text: str, clean_text: str, priority: str = "interactive") -> dict:
+    llm_result = analyze_toxicity_llm(text, priority)
+    remember_verdict(text, clean_text, llm_result)
+    return llm_result
+
+
+def mark_near_duplicate(payload: dict, near: dict | None) -> dict:
+    if near:
+        payload["source"] = "near_duplicate"
+        payload["near_duplicate"] = {"distance": near["distance"]}
+    return payload
+
+
+# -----------------------------------------------------
+# Local admission (429 + Retry-After)
+# -----------------------------------------------------
+
+#
+# Only CPU work is counted, never a request waiting for the LLM. With
+# admit=False the work is counted without being refused: it was already
+# accepted (the rest of a stream) or has no client to answer (live
+# sessions, offline scoring).
+
+def _server_busy(priority: str) -> HTTPException:
+    metrics.local_rejected_total.inc(priority=priority)
+    return HTTPException(
+        status_code=429,
+        detail="Server busy, retry later",
+        headers={"Retry-After": str(local_load.retry_after())}
+    )
+
+
+def reject_if_saturated(priority: str):
+    if not local_load.admits(priority):
+        raise _server_busy(priority)
+
+
+@contextmanager
+def local_slot(priority: str, admit: bool = True):
+    """
+    Counts the block's CPU work into local_load. With admit, raises 429
+    instead when the local stages are saturated for `priority`.
+    """
+    if not local_load.enter(priority, force=not admit):
+        raise _server_busy(priority)
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        local_load.leave(time.perf_counter() - start)
+
+
+def submit_local(priority: str, fn, *args, admit: bool = True) -> asyncio.Future:
+    """
+    fn(*args) on cpu_executor, counted until it returns, even when the
+    caller stopped waiting for it (deadline).
+    """
+    if not local_load.enter(priority, force=not admit):
+        raise _server_busy(priority)
+
+    start = time.perf_counter()
+    future = asyncio.get_running_loop().run_in_executor(
+        cpu_executor, metrics.in_context(fn, *args)
+    )
+    future.add_done_callback(lambda _: local_load.leave(time.perf_counter() - start))
+    return future
+
+
+# =====================================================
+# MAIN ENDPOINT
+# =====================================================
+
+@app.post("/predict")
+async def predict(req: TextRequest):
+    metrics.requests_total.inc(endpoint="predict")
+    start = time.perf_counter()
+    timings = metrics.start_timings(req.timings)
+
+    deadline = None
+    if req.deadline_ms is not None:
+        deadline = time.monotonic() + max(0, req.deadline_ms) / 1000
+
+    text = req.text.strip()
+
+    if not text:
+        payload = build_response(empty_payload())
+
+    else:
+        # -------------------------------------------------
+        # PREPROCESS
+        # -------------------------------------------------
+        with local_slot(req.priority):
+            clean_text = run_preprocess(text)
+
+        if not clean_text or deadline is not None:
+            # A budgeted request must not wait on someone else's run
+            payload = await predict_text(text, clean_text, deadline, req.priority)
+        else:
+            # Duplicates in flight wait for the first one's payload
+            payload = await inflight.do(
+                clean_text, lambda: predict_text(text, clean_text, priority=req.priority)
+            )
+
+    elapsed = time.perf_counter() - start
+    metrics.request_seconds.observe(elapsed, endpoint="predict")
+
+    if timings is not None:
+        payload["timings"] = {**timings, "total": round(elapsed * 1000, 3)}
+
+    return payload
+
+
+# -----------------------------------------------------
+# Deadlines (per-request latency budget)
+# -----------------------------------------------------
+#
+# With deadline_ms the pipeline returns what finished in time. Each
+# stage is reported as ok, timeout (started, not finished) or skipped
+# (not started / not needed). Rules take microseconds and always run;
+# ML and sentiment run after them until the deadline. An LLM call that misses the deadline keeps running in
+# the background so its verdict is cached for the next request.
+
+LOCAL_STAGES = ("rules", "ml", "sentiment")
+BUDGETED_STAGES = ("ml", "sentiment")   # may be cut short by the deadline
+
+
+def time_left(deadline: float | None) -> float | None:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def _keep_running(task: asyncio.Task):
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def run_local_stages_until(clean_text: str, deadline: float,
+                           progress: dict, results: dict):
+    """
+    ML and sentiment until the deadline. `progress` (running / ok per
+    stage) and `results` fill in as it goes, so the caller can stop waiting.
+    """
+    runners = {
+        "ml": lambda t: run_ml([t])[0],
+        "sentiment": run_sentiment
+    }
+
+    for name in BUDGETED_STAGES:
+        if time.monotonic() >= deadline:
+            return
+
+        progress[name] = "running"
+        results[name] = runners[name](clean_text)
+        progress[name] = "ok"
+
+
+async def local_stages(clean_text: str, deadline: float | None, stages: dict,
+                       priority: str = "interactive") -> tuple:
+    """
+    (sentiment, rules_result, ml_result, toxic_probability) from the
+    CPU pool. With a deadline, rules run first whatever the budget and
+    ML / sentiment that missed it contribute nothing (neutral sentiment).
+    Raises 429 when the local stages are saturated for `priority`.
+    """
+    if deadline is None:
+        local = await submit_local(priority, run_local_stages, clean_text)
+        stages.update(dict.fromkeys(LOCAL_STAGES, "ok"))
+        return local
+
+    progress, results = {}, {}
+    future = submit_local(
+        priority, run_local_stages_until, clean_text, deadline, progress, results
+    )
+
+    # Rules cost less than a trip through the pool: run here, always
+    rules_result = run_rules(clean_text)
+    stages["rules"] = "ok"
+
+    try:
+        await asyncio.wait_for(asyncio.shield(future), time_left(deadline))
+    except asyncio.TimeoutError:
+        pass
+
+    # The worker may still be running: read each status once
+    for name in BUDGETED_STAGES:
+        state = progress.get(name)
+        stages[name] = "ok" if state == "ok" else "timeout" if state else "skipped"
+
+    done = {name: results[name] for name in BUDGETED_STAGES if stages[name] == "ok"}
+
+    ml_result, toxic_probability = done.get("ml", (None, 0.0))
+    sentiment = done.get("sentiment") or neutral_sentiment()
+
+    return sentiment, rules_result, ml_result, toxic_probability
+
+
+async def await_llm(task: asyncio.Task, deadline: float | None, stages: dict) -> dict | None:
+    if deadline is not None:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), time_left(deadline))
+        except asyncio.TimeoutError:
+            _keep_running(task)
+            stages["llm"] = "timeout"
+            return None
+    else:
+        result = await task
+
+    stages["llm"] = "ok"
+    return result
+
+
+def with_stages(payload: dict, stages: dict, deadline: float | None) -> dict:
+    if deadline is not None:
+        payload["stages"] = stages
+        for name, status in stages.items():
+            metrics.deadline_stages_total.inc(stage=name, status=status)
+    return payload
+
+
+async def predict_text(text: str, clean_text: str, deadline: float | None = None,
+                       priority: str = "interactive") -> dict:
+    """
+    Full pipeline for one text: LLM overlapped with the local stages.
+    """
+    if LONG_TEXT_CHARS and len(text) > LONG_TEXT_CHARS:
+        return await predict_long(text, deadline, priority)
+
+    if cascade.enabled():
+        return await predict_cascaded(text, clean_text, deadline, priority)
+
+    stages = {"preprocess": "ok"}
+
+    # -------------------------------------------------
+    # 🧠 LLM ENGINE (sent first, overlaps local stages)
+    # -------------------------------------------------
+    near = find_near_duplicate(text, clean_text)
+    llm_task = None if near else asyncio.create_task(judge_llm(text, clean_text, priority))
+
+    # -------------------------------------------------
+    # 🧱 🤖 RULES + ML + SENTIMENT (bounded executor)
+    # -------------------------------------------------
+    try:
+        sentiment, rules_result, ml_result, toxic_probability = (
+            await local_stages(clean_text, deadline, stages, priority)
+        )
+    except BaseException:
+        if llm_task:
+            llm_task.cancel()
+        raise
+
+    # Checked against the local stages; on disagreement the LLM decides
+    near = reuse_near_duplicate(near, text, rules_result, toxic_probability)
+    if near:
+        llm_result = near["verdict"]
+        stages["llm"] = "ok"
+    else:
+        if llm_task is None:
+            llm_task = asyncio.create_task(judge_llm(text, clean_text, priority))
+        llm_result = await await_llm(llm_task, deadline, stages)
+
+    # -------------------------------------------------
+    # 🎯 FINAL DECISION (ENSEMBLE)
+    # -------------------------------------------------
+    payload = combine_results(
+        sentiment, rules_result, ml_result, toxic_probability, llm_result,
+        "timeout (deadline)" if stages["llm"] == "timeout" else ""
+    )
+
+    payload = mark_near_duplicate(payload, near)
+    return build_response(with_stages(payload, stages, deadline))
+
+
+async def predict_cascaded(text: str, clean_text: str, deadline: float | None = None,
+                           priority: str = "interactive") -> dict:
+    """
+    Cheap stages first, LLM only when the cascade policy escalates.
+    """
+    stages = {"preprocess": "ok"}
+
+    sentiment, rules_result, ml_result, toxic_probability = (
+        await local_stages(clean_text, deadline, stages, priority)
+    )
+
+    decision, llm_result, llm_note = plan_llm(
+        text, rules_result, ml_result, toxic_probability
+    )
+    stages["llm"] = "skipped"
+
+    near = None
+    if decision["llm"] != "skipped" and llm_result is None:
+        near = reuse_near_duplicate(
+            find_near_duplicate(text, clean_text), text, rules_result, toxic_probability
+        )
+
+    if near:
+        llm_result, llm_note = near["verdict"], ""
+        stages["llm"] = "ok"
+
+    elif decision["llm"] == "escalated":
+        llm_result = await await_llm(
+            asyncio.create_task(judge_llm(text, clean_text, priority)), deadline, stages
+        )
+        if llm_result is None:
+            llm_note = "timeout (deadline)"
+
+    elif decision["llm"] == "background" and llm_result is None:
+        # Nobody waits for it: lowest priority
+        _keep_running(asyncio.create_task(judge_llm(text, clean_text, "backfill")))
+
+    payload = combine_results(
+        sentiment, rules_result, ml_result, toxic_probability,
+        llm_result, llm_note
+    )
+    payload["cascade"] = decision
+
+    payload = mark_near_duplicate(payload, near)
+    return build_response(with_stages(payload, stages, deadline))
+
+
+# =====================================================
+# LONG DOCUMENTS (WINDOWED SCORING)
+# =====================================================
+#
+# Rules and sentiment run once per sentence, ML once per window (each
+# window's clean text is the join of its sentences'), all fanned out
+# over cpu_executor in chunks of LONG_CHUNK. Only the LONG_LLM_WINDOWS
+# riskiest windows go to the LLM, so cost follows the risky content,
+# not the length. With a deadline, preprocess + rules always finish;
+# ML and sentiment run side by side and are dropped if they miss it.
+
+def score_long_sentences(sentences: list[str]) -> list[dict]:
+    scored = []
+
+    for sentence in sentences:
+        clean_text = run_preprocess(sentence)
+        scored.append({
+            "clean_text": clean_text,
+            "rules": run_rules(clean_text)
+        })
+
+    return scored
+
+
+def run_sentiment_batch(clean_texts: list[str]) -> list[dict]:
+    with metrics.stage("sentiment"):
+        return analyze_sentiment_batch(clean_texts)
+
+
+async def _fan_out(fn, items: list, priority: str, admit: bool) -> list:
+    """
+    fn(chunk) on cpu_executor for each LONG_CHUNK-sized chunk, concatenated.
+    Each chunk counts into local_load; with admit, only the first can be refused.
+    """
+    chunks = [items[i:i + LONG_CHUNK] for i in range(0, len(items), LONG_CHUNK)]
+
+    futures = [
+        submit_local(priority, fn, chunk, admit=admit and i == 0)
+        for i, chunk in enumerate(chunks)
+    ]
+    results = await asyncio.gather(*futures)
+    return [item for chunk in results for item in chunk]
+
+
+async def predict_long(text: str, deadline: float | None = None,
+                       priority: str = "interactive") -> dict:
+    spans = sentence_spans(text)
+    if not spans:
+        return build_response(empty_payload())
+
+    sentences = await _fan_out(
+        score_long_sentences, [s for _, _, s in spans], priority, admit=True
+    )
+    stages = dict.fromkeys(("preprocess", "rules"), "ok")
+
+    windows = build_windows(len(spans), LONG_WINDOW_SENTENCES, LONG_WINDOW_OVERLAP)
+    window_texts = [
+        " ".join(s["clean_text"] for s in sentences[first:last] if s["clean_text"])
+        for first, last in windows
+    ]
+
+    # ML and sentiment side by side; what misses the deadline contributes
+    # nothing (it keeps running so its CPU stays counted in local_load)
+    ml_outputs = [(None, 0.0)] * len(windows)
+    sentiment = neutral_sentiment()
+
+    if deadline is not None and time_left(deadline) <= 0:
+        stages.update(dict.fromkeys(BUDGETED_STAGES, "skipped"))
+    else:
+        tasks = {
+            "ml": asyncio.create_task(
+                _fan_out(run_ml, window_texts, priority, admit=False)
+            ),
+            "sentiment": asyncio.create_task(_fan_out(
+                run_sentiment_batch, [s["clean_text"] for s in sentences], priority, admit=False
+            ))
+        }
+        _, late = await asyncio.wait(tasks.values(), timeout=time_left(deadline))
+
+        for name, task in tasks.items():
+            stages[name] = "timeout" if task in late else "ok"
+            if task in late:
+                _keep_running(task)
+
+        if stages["ml"] == "ok":
+            ml_outputs = tasks["ml"].result()
+        if stages["sentiment"] == "ok":
+            sentiment = combine_sentiments(tasks["sentiment"].result())
+
+    # -------------------------------------------------
+    # Window risk → LLM for the top windows only
+    # -------------------------------------------------
+    scored_windows = []
+    for (first, last), (ml_result, toxic_probability) in zip(windows, ml_outputs):
+        words = sorted({w for s in sentences[first:last] for w in s["rules"]["abusive_words"]})
+        rules_result = {
+            "triggered": len(words) > 0,
+            "abusive_words": words,
+            "confidence": 0.95 if words else 0.0
+        }
+
+        scored_windows.append({
+            "start": spans[first][0],
+            "end": spans[last - 1][1],
+            "rules": rules_result,
+            "ml": ml_result,
+            "toxic_probability": toxic_probability,
+            "risk": max(rules_result["confidence"], toxic_probability)
+        })
+
+    risky = sorted(
+        (w for w in scored_windows if w["risk"] >= LONG_LLM_MIN_RISK),
+        key=lambda w: w["risk"],
+        reverse=True
+    )[:LONG_LLM_WINDOWS]
+
+    llm_windows = []
+    for window in risky:
+        window_text = text[window["start"]:window["end"]]
+
+        if cascade.enabled():
+            decision, cached, _ = plan_llm(
+                window_text, window["rules"], window["ml"], window["toxic_probability"]
+            )
+            if decision["llm"] == "skipped":
+                if cached:
+                    window["llm"] = cached
+                continue
+
+        llm_windows.append((window, window_text))
+
+    # Windows the LLM did not answer by the deadline just go without
+    tasks = [
+        asyncio.create_task(analyze_toxicity_llm_async(window_text, priority))
+        for _, window_text in llm_windows
+    ]
+    late = set()
+    if tasks:
+        _, late = await asyncio.wait(tasks, timeout=time_left(deadline))
+
+    for (window, _), task in zip(llm_windows, tasks):
+        if task in late:
+            _keep_running(task)
+        else:
+            window["llm"] = task.result()
+
+    # -------------------------------------------------
+    # Aggregate + per-span offsets
+    # -------------------------------------------------
+    words = sorted({w for s in sentences for w in s["rules"]["abusive_words"]})
+    rules_result = {
+        "triggered": len(words) > 0,
+        "abusive_words": words,
+        "confidence": 0.95 if words else 0.0
+    }
+
+    top = max(scored_windows, key=lambda w: w["toxic_probability"])
+    answered = [w["llm"] for w in scored_windows if w.get("llm")]
+
+    payload = combine_results(
+        sentiment,
+        rules_result,
+        top["ml"],
+        top["toxic_probability"],
+        merge_llm(answered),
+        "" if answered else "skipped (no risky windows)"
+    )
+
+    hits = []
+    for (start, _, sentence), s in zip(spans, sentences):
+        hits.extend(rule_spans(sentence, start, s["rules"]["abusive_words"]))
+
+    lowered = text.lower()
+    for window in scored_windows:
+        if window["toxic_probability"] >= 0.5:
+            hits.append({
+                "start": window["start"],
+                "end": window["end"],
+                "source": "ml",
+                "confidence": round(window["toxic_probability"], 3)
+            })
+
+        llm_result = window.get("llm")
+        if llm_result and llm_result.get("toxic"):
+            for phrase in llm_result.get("detected_phrases") or [""]:
+                start, end = locate_phrase(lowered, window["start"], window["end"], phrase)
+                hits.append({
+                    "start": start,
+                    "end": end,
+                    "text": phrase or None,
+                    "source": "llm",
+                    "confidence": llm_result.get("confidence", 0.0)
+                })
+
+    payload["spans"] = sorted(hits, key=lambda h: (h["start"], h["end"]))
+    payload["long_document"] = {
+        "sentences": len(spans),
+        "windows": len(windows),
+        "llm_windows": len(llm_windows)
+    }
+
+    stages["llm"] = "timeout" if late else "ok" if tasks else "skipped"
+    return build_response(with_stages(payload, stages, deadline))
+
+
+# =====================================================
+# BATCH ENDPOINT
+# =====================================================
+
+def batch_local_stages(texts: list[str], priority: str, admit: bool):
+    """
+    Preprocess, ML (one vectorized call), sentiment and rules for a batch,
+    in one local_load slot (429 when saturated, with admit).
+
+    Returns (payloads, rows): payloads holds the empty texts' results,
+    rows one (index, text, clean_text, ml_result, toxic_probability,
+    sentiment, rules_result) per text still to finish.
+    """
+    texts = [t.strip() for t in texts]
+    payloads = [None] * len(texts)
+
+    with local_slot(priority, admit):
+        items = []
+        for i, text in enumerate(texts):
+            if not text:
+                payloads[i] = build_response(empty_payload())
+            else:
+                items.append((i, text, run_preprocess(text)))
+
+        clean_texts = [clean_text for _, _, clean_text in items]
+        ml_outputs = run_ml(clean_texts)
+
+        sentiments = run_sentiment_batch(clean_texts)
+
+        rules_results = [run_rules(clean_text) for clean_text in clean_texts]
+
+    rows = [
+        (i, text, clean_text, ml_result, toxic_probability, sentiment, rules_result)
+        for (i, text, clean_text), (ml_result, toxic_probability), sentiment, rules_result
+        in zip(items, ml_outputs, sentiments, rules_results)
+    ]
+    return payloads, rows
+
+
+def plan_batch_llm(row: tuple, llm: str, schedule) -> dict:
+    """
+    What a batch row needs from the LLM. "judge" is True when the caller
+    must still ask it (sync or async, its choice).
+    """
+    _, text, clean_text, ml_result, toxic_probability, _, rules_result = row
+    plan = {"decision": None, "near": None, "llm_result": None, "llm_note": "", "judge": False}
+
+    if llm != "inline":
+        plan["llm_note"] = "skipped" if llm == "skip" else "deferred"
+        return plan
+
+    if cascade.enabled():
+        decision, plan["llm_result"], plan["llm_note"] = plan_llm(
+            text, rules_result, ml_result, toxic_probability
+        )
+        plan["decision"] = decision
+
+        if decision["llm"] == "skipped" or plan["llm_result"] is not None:
+            return plan
+
+    plan["near"] = reuse_near_duplicate(
+        find_near_duplicate(text, clean_text), text, rules_result, toxic_probability
+    )
+    if plan["near"]:
+        plan["llm_result"], plan["llm_note"] = plan["near"]["verdict"], ""
+    elif plan["decision"] and plan["decision"]["llm"] == "background":
+        schedule(judge_llm_sync, text, clean_text, "backfill")
+    else:
+        plan["judge"] = True
+
+    return plan
+
+
+def finish_batch(payloads: list, rows: list, plans: list, llm: str, schedule) -> list[dict]:
+    for row, plan in zip(rows, plans):
+        i, _, _, ml_result, toxic_probability, sentiment, rules_result = row
+
+        payload = combine_results(
+            sentiment, rules_result, ml_result, toxic_probability,
+            plan["llm_result"], plan["llm_note"]
+        )
+        if plan["decision"]:
+            payload["cascade"] = plan["decision"]
+
+        payloads[i] = build_response(mark_near_duplicate(payload, plan["near"]))
+
+    if llm == "defer":
+        for i, text, clean_text, *_ in rows:
+            job_id = deferred_jobs.create()
+            payloads[i]["llm_job"] = job_id
+            schedule(judge_deferred, job_id, text, clean_text)
+
+    return payloads
+
+
+def judge_deferred(job_id: str, text: str, clean_text: str):
+    deferred_jobs.finish(job_id, judge_llm_sync(text, clean_text, "backfill"))
+
+
+def score_batch(texts: list[str], llm: str, schedule,
+                priority: str = "batch", admit: bool = True) -> list[dict]:
+    """
+    Scores many texts at once. ML runs as one vectorized call.
+
+    llm = "inline" → LLM per text (slow)
+          "skip"   → rules + ML only
+          "defer"  → rules + ML now, LLM in the background; each
+                     result's `llm_job` fetches the verdict later
+
+    `schedule(fn, *args)` queues background work (e.g. BackgroundTasks.add_task).
+    Inline LLM calls wait at `priority`, background ones at "backfill".
+    The local stages count into local_load (429 when saturated, with admit).
+    """
+    payloads, rows = batch_local_stages(texts, priority, admit)
+
+    # LLM calls (if any) run after the slot is released
+    plans = [plan_batch_llm(row, llm, schedule) for row in rows]
+    for row, plan in zip(rows, plans):
+        if plan["judge"]:
+            plan["llm_result"] = judge_llm_sync(row[1], row[2], priority)
+
+    return finish_batch(payloads, rows, plans, llm, schedule)
+
+
+async def score_batch_async(texts: list[str], llm: str, schedule,
+                            priority: str = "batch", admit: bool = True) -> list[dict]:
+    """
+    score_batch() for the event loop: the local stages run on the CPU
+    pool, inline LLM calls on the async path, so waiting on the LLM never
+    holds a cpu_executor thread.
+    """
+    loop = asyncio.get_running_loop()
+    payloads, rows = await loop.run_in_executor(
+        cpu_executor, batch_local_stages, texts, priority, admit
+    )
+
+    plans = [plan_batch_llm(row, llm, schedule) for row in rows]
+    judged = [(row, plan) for row, plan in zip(rows, plans) if plan["judge"]]
+    results = await asyncio.gather(*(
+        judge_llm(row[1], row[2], priority) for row, _ in judged
+    ))
+    for (_, plan), llm_result in zip(judged, results):
+        plan["llm_result"] = llm_result
+
+    return finish_batch(payloads, rows, plans, llm, schedule)
+
+
+@app.post("/predict/batch")
+async def predict_batch(req: BatchRequest, background_tasks: BackgroundTasks):
+    if len(req.texts) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(req.texts)} > {BATCH_MAX_SIZE}"
+        )
+
+    metrics.requests_total.inc(endpoint="batch")
+    start = time.perf_counter()
+
+    # Local stages on the CPU pool, inline LLM calls on the async path
+    payloads = await score_batch_async(
+        req.texts, req.llm, background_tasks.add_task, req.priority
+    )
+
+    metrics.request_seconds.observe(time.perf_counter() - start, endpoint="batch")
+    return {"results": payloads}
+
+
+@app.get("/predict/jobs/{job_id}")
+def predict_job(job_id: str):
+    """
+    Background LLM verdict of an llm="defer" batch result: "pending"
+    until it lands, then "done" with the verdict (or its shed / error
+    fallback).
+    """
+    job = deferred_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+
+# =====================================================
+# STREAMING BULK ENDPOINT (NDJSON / CSV IN, NDJSON OUT)
+# =====================================================
+
+async def iter_lines(byte_stream):
+    """
+    Decoded lines from an async byte stream, one at a time.
+    Only the current partial line is buffered.
+    """
+    buffer = b""
+
+    async for chunk in byte_stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+
+        for line in lines:
+            yield line.decode("utf-8", "replace").rstrip("\r")
+
+    if buffer:
+        yield buffer.decode("utf-8", "replace").rstrip("\r")
+
+
+async def iter_records(lines, fmt: str):
+    """
+    Yields (text, error) per input record.
+
+    ndjson → {"text": "..."} objects (or bare JSON strings), one per line
+    csv    → header row with a `text` column, like data/sample_data.csv
+    """
+    if fmt == "ndjson":
+        async for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None, "Invalid JSON line"
+                continue
+
+            if isinstance(record, dict):
+                record = record.get("text")
+            if isinstance(record, str):
+                yield record, None
+            else:
+                yield None, "Missing text field"
+        return
+
+    text_col = None
+    pending = ""
+
+    async for line in lines:
+        # A quoted field may span lines: wait for balanced quotes
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+
+        row = next(csv.reader([record]), [])
+
+        if text_col is None:
+            if "text" not in row:
+                yield None, "CSV header must contain a 'text' column"
+                return
+            text_col = row.index("text")
+        elif text_col < len(row):
+            yield row[text_col], None
+        else:
+            yield None, "Missing text column"
+
+    if pending:
+        yield None, "Unterminated quoted CSV field"
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that can read the request body while it streams.
+
+    Starlette's default listens for client disconnects on `receive`,
+    which would swallow the request body chunks we are still consuming.
+    Disconnects surface instead through request.stream() (ClientDisconnect)
+    or a failed send (OSError): scoring stops there, and the background
+    tasks of an abandoned stream are dropped.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except (ClientDisconnect, OSError):
+            metrics.stream_disconnects_total.inc()
+            return
+        finally:
+            await self.body_iterator.aclose()
+
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/predict/stream")
+async def predict_stream(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    input_format: Literal["ndjson", "csv"] | None = Query(None, alias="format"),
+    llm: Literal["skip", "inline"] = "skip",
+    priority: Priority = "backfill"
+):
+    """
+    Bulk moderation for backfills: NDJSON or CSV request body in,
+    one NDJSON result line per input record out.
+
+    Records are scored in chunks of STREAM_CHUNK_SIZE through the same
+    pipeline as /predict/batch, so memory stays flat whatever the size.
+    """
+    metrics.requests_total.inc(endpoint="stream")
+
+    if input_format is None:
+        content_type = request.headers.get("content-type", "")
+        input_format = "csv" if "csv" in content_type else "ndjson"
+
+    # Refused only up front: once the response has started, every chunk
+    # is accepted (and counted while it is scored)
+    reject_if_saturated(priority)
+
+
+    async def flush(chunk):
+        texts = [text for _, text, error in chunk if error is None]
+        payloads = iter(await score_batch_async(
+            texts, llm, background_tasks.add_task, priority, False
+        ))
+
+        out = []
+        for index, _, error in chunk:
+            line = {"index": index, "error": error} if error else {
+                "index": index, **next(payloads)
+            }
+            out.append(json.dumps(line, default=str) + "\n")
+        return "".join(out)
+
+    async def results():
+        chunk = []
+        index = 0
+
+        async for text, error in iter_records(iter_lines(request.stream()), input_format):
+            chunk.append((index, text, error))
+            index += 1
+
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield await flush(chunk)
+                chunk = []
+
+        # Body fully read: receive() can now only report a disconnect
+        if chunk and not await request.is_disconnected():
+            yield await flush(chunk)
+
+    return DuplexStreamingResponse(
+        results(),
+        media_type="application/x-ndjson",
+        background=background_tasks
+    )
+
+
+# =====================================================
+# LIVE MODERATION (WEBSOCKET)
+# =====================================================
+#
+# One session per editor. The client sends the full text on each edit:
+#
+#   → {"type": "text", "seq": 12, "text": "..."}
+#
+# The server waits WS_DEBOUNCE_MS for typing to pause, cancels the
+# previous rescoring if it is still running, and scores only sentences
+# this session has not seen yet. Each settled edit gets up to two pushes:
+#
+#   ← {"type": "delta", "seq": 12, "phase": "local", ...}   rules + ML + sentiment
+#   ← {"type": "delta", "seq": 12, "phase": "final", ...}   + LLM verdicts
+#
+# A push carries only what changed since the previous one (payload_delta);
+# applied in order they rebuild a /predict payload plus "sentences".
+
+def score_sentences(sentences: list[str]) -> list[dict]:
+    """
+    Rules, sentiment and ML per sentence, ML as one batched call.
+    The LLM verdict is filled in later by score_sentences_llm.
+    """
+    clean_texts = [run_preprocess(sentence) for sentence in sentences]
+    ml_outputs = iter(run_ml([c for c in clean_texts if c]))
+
+    entries = []
+    for clean_text in clean_texts:
+        ml_result, toxic_probability = next(ml_outputs) if clean_text else (None, 0.0)
+
+        entries.append({
+            "sentiment": run_sentiment(clean_text),
+            "rules": run_rules(clean_text),
+            "ml": ml_result,
+            "toxic_probability": toxic_probability,
+            "llm": None,
+            "llm_note": "pending",
+            "llm_retry": False
+        })
+
+    return entries
+
+
+async def score_sentences_llm(pending: dict[str, dict]):
+    """
+    LLM verdicts for a session's pending sentences, in one batched
+    request. Shed / error fallbacks are not kept: the sentence is marked
+    llm_retry and asked again on the next edit.
+    """
+    ask = {}
+
+    for sentence, entry in pending.items():
+        if cascade.enabled():
+            decision, llm_result, llm_note = plan_llm(
+                sentence, entry["rules"], entry["ml"], entry["toxic_probability"]
+            )
+
+            # "background" escalates too: this phase already runs after the push
+            if decision["llm"] == "skipped":
+                entry["llm"], entry["llm_note"] = llm_result, llm_note
+                continue
+
+        ask[sentence] = entry
+
+    results = await analyze_toxicity_llm_many_async(list(ask), "interactive")
+
+    for entry, result in zip(ask.values(), results):
+        if result.get("status") in ("shed", "error"):
+            entry["llm"], entry["llm_note"], entry["llm_retry"] = None, result["status"], True
+        else:
+            entry["llm"], entry["llm_note"], entry["llm_retry"] = result, "", False
+
+
+def live_payload(spans: list[tuple], entries: list[dict]) -> dict:
+    """
+    Document verdict from per-sentence entries: rules pooled, ML from
+    the most toxic sentence, sentiment averaged, LLM merged.
+    """
+    if not entries:
+        payload = build_response(empty_payload())
+        payload.update(sentences=[], llm_pending=False)
+        return payload
+
+    abusive_words = sorted({w for e in entries for w in e["rules"]["abusive_words"]})
+    rules_result = {
+        "triggered": len(abusive_words) > 0,
+        "abusive_words": abusive_words,
+        "confidence": 0.95 if abusive_words else 0.0
+    }
+
+    top = max(entries, key=lambda e: e["toxic_probability"])
+    llm_results = [e["llm"] for e in entries if e["llm"]]
+    llm_pending = any(e["llm_note"] == "pending" for e in entries)
+
+    if llm_results:
+        llm_note = ""
+    else:
+        llm_note = "pending" if llm_pending else "skipped"
+
+    payload = build_response(combine_results(
+        combine_sentiments([e["sentiment"] for e in entries]),
+        rules_result,
+        top["ml"],
+        top["toxic_probability"],
+        merge_llm(llm_results),
+        llm_note
+    ))
+
+    payload["sentences"] = []
+    for (start, end, _), e in zip(spans, entries):
+        confidence = round(max(
+            e["rules"]["confidence"],
+            e["toxic_probability"],
+            (e["llm"] or {}).get("confidence", 0.0)
+        ), 3)
+
+        payload["sentences"].append({
+            "start": start,
+            "end": end,
+            "toxic": confidence >= 0.5,
+            "confidence": confidence,
+            "abusive_words": e["rules"]["abusive_words"]
+        })
+
+    payload["llm_pending"] = llm_pending
+    return payload
+
+
+@app.websocket("/ws/moderate")
+async def moderate_ws(websocket: WebSocket):
+    await websocket.accept()
+
+    cache = SentenceCache(WS_SENTENCE_CACHE)
+    sent = {}        # payload the client has rebuilt so far
+    task = None
+
+    async def push(seq, phase: str, payload: dict):
+        nonlocal sent
+        delta = payload_delta(sent, payload)
+        await websocket.send_json({"type": "delta", "seq": seq, "phase": phase, **delta})
+        sent = payload
+
+    async def rescore(seq, text: str):
+        await asyncio.sleep(WS_DEBOUNCE_MS / 1000)
+
+        metrics.requests_total.inc(endpoint="ws")
+        start = time.perf_counter()
+
+        try:
+            spans = split_sentences(text)
+            entries = [cache.get(sentence) for _, _, sentence in spans]
+
+            missing = list(dict.fromkeys(
+                sentence for (_, _, sentence), e in zip(spans, entries) if e is None
+            ))
+            if missing:
+                scored = dict(zip(missing, await submit_local(
+                    "interactive", score_sentences, missing, admit=False
+                )))
+                for sentence, entry in scored.items():
+                    cache.put(sentence, entry)
+                entries = [
+                    e or scored[sentence]
+                    for (_, _, sentence), e in zip(spans, entries)
+                ]
+
+            # New sentences, and ones whose LLM call was shed or failed
+            pending = {
+                sentence: e for (_, _, sentence), e in zip(spans, entries)
+                if e["llm_note"] == "pending" or e["llm_retry"]
+            }
+            for e in pending.values():
+                e["llm_note"] = "pending"
+
+            await push(seq, "local" if pending else "final", live_payload(spans, entries))
+
+            if pending:
+                await score_sentences_llm(pending)
+                await push(seq, "final", live_payload(spans, entries))
+
+        except WebSocketDisconnect:
+            return
+        except Exception as e:
+            print("⚠️ Live moderation error:", e)
+            await websocket.send_json({"type": "error", "seq": seq, "detail": str(e)})
+
+        metrics.request_seconds.observe(time.perf_counter() - start, endpoint="ws")
+
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+
+            if not isinstance(message, dict) or not isinstance(message.get("text"), str):
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": 'Expected {"type": "text", "seq": n, "text": "..."}'
+                })
+                continue
+
+            # A newer edit supersedes the pending or running rescoring
+            if task:
+                task.cancel()
+            task = asyncio.create_task(rescore(message.get("seq"), message["text"]))
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if task:
+            task.cancel()
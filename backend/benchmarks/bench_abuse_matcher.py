@@ -0,0 +1,132 @@
+# bench_abuse_matcher.py
+#
+# Latency of the abusive lexicon matcher vs lexicon size.
+#
+# Run from backend/:
+#   python -m benchmarks.bench_abuse_matcher
+#   python -m benchmarks.bench_abuse_matcher --legacy
+
+import argparse
+import csv
+import os
+import random
+import re
+import string
+import time
+
+from utils.abuse_words import AbuseMatcher, abusive_words
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "data", "sample_data.csv")
+
+LEXICON_SIZES = [200, 1000, 5000, 20000, 50000]
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+
+def load_corpus(limit: int) -> list[str]:
+    with open(DATA_PATH, newline="", encoding="utf-8") as f:
+        rows = [row["text"] for row in csv.DictReader(f)]
+    return rows[:limit]
+
+
+def synthetic_lexicon(size: int, seed: int = 42) -> set[str]:
+    """
+    Real lexicon padded with random words and two-word phrases.
+    """
+    rng = random.Random(seed)
+    words = set(abusive_words)
+
+    while len(words) < size:
+        word = "".join(
+            rng.choice(string.ascii_lowercase)
+            for _ in range(rng.randint(3, 10))
+        )
+        if rng.random() < 0.1:
+            word += " " + "".join(
+                rng.choice(string.ascii_lowercase)
+                for _ in range(rng.randint(3, 8))
+            )
+        words.add(word)
+
+    return words
+
+
+def legacy_detect(words, text: str):
+    """
+    The original per-word regex loop, kept for comparison.
+    """
+    text_lower = text.lower()
+    found = set()
+
+    for word in words:
+        if " " in word:
+            if word in text_lower:
+                found.add(word)
+        else:
+            pattern = r"\b" + re.escape(word) + r"\b"
+            if re.search(pattern, text_lower):
+                found.add(word)
+
+    return sorted(found)
+
+
+def time_per_call(fn, corpus, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            fn(text)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(corpus)) * 1e6
+
+
+# =====================================================
+# MAIN
+# =====================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Abusive lexicon matcher benchmark")
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--legacy",
+        action="store_true",
+        help="Also time the old regex loop (slow on large lexicons)"
+    )
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.texts)
+
+    print(f"Corpus: {len(corpus)} texts from {DATA_PATH}")
+    header = f"{'lexicon':>8} | {'build ms':>9} | {'matcher µs/text':>15}"
+    if args.legacy:
+        header += f" | {'legacy µs/text':>14}"
+    print(header)
+    print("-" * len(header))
+
+    for size in LEXICON_SIZES:
+        words = synthetic_lexicon(size)
+
+        start = time.perf_counter()
+        matcher = AbuseMatcher(words)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        matcher_us = time_per_call(matcher.find, corpus, args.repeat)
+        line = f"{size:>8} | {build_ms:>9.1f} | {matcher_us:>15.1f}"
+
+        if args.legacy:
+            sample = corpus[:50]
+            legacy_us = time_per_call(
+                lambda t: legacy_detect(words, t), sample, 1
+            )
+            for text in sample:
+                assert legacy_detect(words, text) == matcher.find(text)
+            line += f" | {legacy_us:>14.1f}"
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# bench_ml_engine.py
+#
+# sklearn Pipeline vs numpy-only LinearTextModel: agreement, per-item
+# latency and resident memory (each engine measured in a fresh process).
+#
+# Run from backend/ after `python train_model.py --export-only`:
+#   python -m benchmarks.bench_ml_engine
+
+import argparse
+import csv
+import multiprocessing as mp
+import os
+import resource
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "data", "sample_data.csv")
+MODEL_PATH = os.path.join(BASE_DIR, "abuse_model.joblib")
+LINEAR_EXPORT_DIR = os.path.join(BASE_DIR, "abuse_model_linear")
+
+
+def load_corpus() -> list[str]:
+    from utils.preprocessing import normalize_text
+
+    with open(DATA_PATH, newline="", encoding="utf-8") as f:
+        return [normalize_text(row["text"]) for row in csv.DictReader(f)]
+
+
+def load_engine(name: str):
+    if name == "numpy":
+        from utils.linear_model import LinearTextModel
+        return LinearTextModel(LINEAR_EXPORT_DIR)
+
+    import joblib
+    return joblib.load(MODEL_PATH)
+
+
+# =====================================================
+# WORKER (one fresh process per engine)
+# =====================================================
+
+def measure(name: str, corpus: list[str], queue):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    model = load_engine(name)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Per-item latency (one text per call, as /predict does)
+    start = time.perf_counter()
+    for text in corpus:
+        model.predict_proba([text])
+    single_us = (time.perf_counter() - start) / len(corpus) * 1e6
+
+    # Whole-batch latency
+    start = time.perf_counter()
+    probs = model.predict_proba(corpus)
+    batch_us = (time.perf_counter() - start) / len(corpus) * 1e6
+
+    queue.put({
+        "engine": name,
+        "load_ms": load_ms,
+        "rss_mb": (rss_after - rss_before) / 1024,
+        "single_us": single_us,
+        "batch_us": batch_us,
+        "probs": probs.tolist()
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ML engine benchmark")
+    parser.add_argument("--texts", type=int, default=1000)
+    args = parser.parse_args()
+
+    corpus = load_corpus()[:args.texts]
+    ctx = mp.get_context("spawn")
+    results = {}
+
+    for name in ("sklearn", "numpy"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=measure, args=(name, corpus, queue))
+        proc.start()
+        results[name] = queue.get()
+        proc.join()
+
+    max_diff = max(
+        abs(a - b)
+        for row_a, row_b in zip(results["sklearn"]["probs"], results["numpy"]["probs"])
+        for a, b in zip(row_a, row_b)
+    )
+
+    print(f"Corpus: {len(corpus)} texts, max |Δp| = {max_diff:.2e}")
+    print(f"{'engine':>8} | {'load ms':>8} | {'+RSS MB':>8} | {'µs/item (1)':>11} | {'µs/item (batch)':>15}")
+    for name, r in results.items():
+        print(
+            f"{name:>8} | {r['load_ms']:>8.1f} | {r['rss_mb']:>8.1f} | "
+            f"{r['single_us']:>11.1f} | {r['batch_us']:>15.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
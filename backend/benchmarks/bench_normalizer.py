@@ -0,0 +1,93 @@
+# bench_normalizer.py
+#
+# Throughput of normalize_text on data/sample_data.csv, compared with
+# the original multi-pass implementation (outputs must be identical).
+#
+# Run from backend/:
+#   python -m benchmarks.bench_normalizer
+
+import argparse
+import csv
+import os
+import re
+import string
+import time
+
+from utils.preprocessing import OBFUSCATION_MAP, normalize_text
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "data", "sample_data.csv")
+
+
+# =====================================================
+# REFERENCE IMPLEMENTATION
+# =====================================================
+
+def legacy_normalize_text(text: str) -> str:
+    """
+    The original normalizer, kept byte-for-byte for comparison.
+    """
+    if not text:
+        return ""
+
+    text = text.lower().strip()
+    text = re.sub(r"http\S+|www\S+", " ", text)
+    text = re.sub(r"\S+@\S+", " ", text)
+
+    for k, v in OBFUSCATION_MAP.items():
+        text = text.replace(k, v)
+
+    text = text.encode("ascii", "ignore").decode()
+    text = text.translate(str.maketrans("", "", string.punctuation))
+    text = re.sub(r"\s+", " ", text).strip()
+
+    return text
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+
+def load_corpus() -> list[str]:
+    with open(DATA_PATH, newline="", encoding="utf-8") as f:
+        return [row["text"] for row in csv.DictReader(f)]
+
+
+def throughput(fn, corpus, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            fn(text)
+    elapsed = time.perf_counter() - start
+    return repeat * len(corpus) / elapsed
+
+
+# =====================================================
+# MAIN
+# =====================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="normalize_text benchmark")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+
+    mismatches = [
+        text for text in corpus
+        if normalize_text(text) != legacy_normalize_text(text)
+    ]
+    if mismatches:
+        raise SystemExit(f"❌ {len(mismatches)} outputs differ, e.g. {mismatches[0]!r}")
+
+    legacy = throughput(legacy_normalize_text, corpus, args.repeat)
+    current = throughput(normalize_text, corpus, args.repeat)
+
+    print(f"Corpus: {len(corpus)} rows from {DATA_PATH} (outputs identical)")
+    print(f"legacy normalize_text : {legacy:>12,.0f} rows/s")
+    print(f"normalize_text        : {current:>12,.0f} rows/s")
+    print(f"speedup               : {current / legacy:>12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
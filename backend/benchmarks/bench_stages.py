@@ -0,0 +1,264 @@
+# bench_stages.py
+#
+# Per-stage latency / throughput / peak memory on seeded synthetic
+# corpora built with dataset.py's sentence generator. Results are
+# written as JSON so runs from different commits can be compared.
+#
+# Run from backend/:
+#   python -m benchmarks.bench_stages
+#   python -m benchmarks.bench_stages --lengths 1,8,32 --batches 1,64 --out before.json
+#   python -m benchmarks.bench_stages --out after.json --compare before.json
+
+import os
+
+# The LLM stage is network-bound and out of scope here; an empty key
+# takes precedence over .env and keeps it disabled. The verdict cache
+# stays in memory, so reset_caches() never touches a real cache file.
+os.environ["OPENROUTER_API_KEY"] = ""
+os.environ["LLM_CACHE_DB"] = ""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import app
+from dataset import labels, random_noise, random_sentence
+from utils.abuse_words import detect_abusive_tokens
+from utils.preprocessing import normalize_text
+from utils.sentiment import _score_text, analyze_sentiment
+
+PER_TEXT_STAGES = ["normalize", "rules", "sentiment", "suggestions", "predict"]
+BATCH_STAGES = ["ml", "batch"]
+
+
+# =====================================================
+# CORPUS
+# =====================================================
+
+def build_corpus(n: int, sentences: int, seed: int) -> list[str]:
+    """
+    `n` texts of `sentences` generated sentences each, deterministic per seed.
+    """
+    random.seed(seed)
+    return [
+        random_noise(" ".join(
+            random_sentence(random.choice(labels)) for _ in range(sentences)
+        ))
+        for _ in range(n)
+    ]
+
+
+# =====================================================
+# STAGES
+# =====================================================
+#
+# Each stage is (prepare, run): prepare(corpus) builds the inputs once,
+# run(item) is the timed call. Per-text stages get one text per call,
+# batch stages one list of `batch` texts.
+
+_loop = asyncio.new_event_loop()
+
+
+def _predict(text: str):
+    return _loop.run_until_complete(app.predict(app.TextRequest(text=text)))
+
+
+def stage_fns(name: str):
+    if name == "normalize":
+        return (lambda corpus: corpus, normalize_text)
+    if name == "rules":
+        return (lambda corpus: [normalize_text(t) for t in corpus], detect_abusive_tokens)
+    if name == "sentiment":
+        return (lambda corpus: [normalize_text(t) for t in corpus], analyze_sentiment)
+    if name == "suggestions":
+        return (
+            lambda corpus: [list(detect_abusive_tokens(normalize_text(t))) for t in corpus],
+            app.generate_suggestions
+        )
+    if name == "predict":
+        return (lambda corpus: corpus, _predict)
+    if name == "ml":
+        model = app.get_ml_model().model
+        return (lambda corpus: [normalize_text(t) for t in corpus], model.predict_proba)
+    if name == "batch":
+        return (lambda corpus: corpus, lambda texts: app.score_batch(texts, "skip", lambda *args: None))
+    raise ValueError(f"Unknown stage: {name}")
+
+
+def _batches(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def reset_caches():
+    """
+    Empties the result caches (sentiment memo, LLM verdicts, near-duplicate
+    index), so every pass starts cold whatever ran before it and results
+    compare across commits.
+    """
+    _score_text.cache_clear()
+    app.verdict_cache.clear()
+    if app.near_duplicates is not None:
+        app.near_duplicates.clear()
+
+
+def measure(name: str, corpus: list[str], batch: int | None) -> dict:
+    prepare, run = stage_fns(name)
+    items = prepare(corpus)
+    calls = _batches(items, batch) if batch else items
+
+    # Warm-up (model pages, TextBlob lexicon, regex caches)
+    for item in calls[:min(len(calls), 5)]:
+        run(item)
+
+    reset_caches()
+    latencies = []
+    start = time.perf_counter()
+    for item in calls:
+        t0 = time.perf_counter()
+        run(item)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+
+    # Separate pass: tracemalloc slows everything down
+    reset_caches()
+    tracemalloc.start()
+    for item in calls:
+        run(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "stage": name,
+        "length": None,
+        "batch": batch or 1,
+        "calls": len(calls),
+        "p50_ms": round(percentile(latencies, 50), 4),
+        "p95_ms": round(percentile(latencies, 95), 4),
+        "p99_ms": round(percentile(latencies, 99), 4),
+        "texts_per_s": round(len(corpus) / elapsed, 1),
+        "peak_kb": round(peak / 1024, 1)
+    }
+
+
+# =====================================================
+# RESULTS
+# =====================================================
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(row: dict) -> tuple:
+    return (row["stage"], row["length"], row["batch"])
+
+
+def compare(current: list[dict], baseline_path: str, threshold: float) -> int:
+    """
+    Prints p50 / throughput deltas against a previous run.
+    Returns the number of regressions beyond `threshold` percent.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {_key(row): row for row in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"\nvs {baseline_path}")
+    print(f"{'stage':<12} {'len':>4} {'batch':>6} {'p50 Δ':>9} {'tput Δ':>9}")
+
+    for row in current:
+        old = baseline.get(_key(row))
+        if old is None:
+            continue
+
+        p50 = (row["p50_ms"] / old["p50_ms"] - 1) * 100 if old["p50_ms"] else 0.0
+        tput = (row["texts_per_s"] / old["texts_per_s"] - 1) * 100 if old["texts_per_s"] else 0.0
+        flag = ""
+        if p50 > threshold or tput < -threshold:
+            regressions += 1
+            flag = "  ⚠️"
+
+        print(
+            f"{row['stage']:<12} {row['length']:>4} {row['batch']:>6} "
+            f"{p50:>+8.1f}% {tput:>+8.1f}%{flag}"
+        )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage on synthetic corpora")
+    parser.add_argument("--n", type=int, default=500, help="Texts per corpus")
+    parser.add_argument("--lengths", default="1,4,16", help="Sentences per text")
+    parser.add_argument("--batches", default="1,32,256", help="Batch sizes for ml / batch stages")
+    parser.add_argument("--stages", default=",".join(PER_TEXT_STAGES + BATCH_STAGES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Write results as JSON")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    lengths = [int(x) for x in args.lengths.split(",")]
+    batches = [int(x) for x in args.batches.split(",")]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+
+    results = []
+    print(f"{'stage':<12} {'len':>4} {'batch':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'texts/s':>10} {'peak KB':>9}")
+
+    for length in lengths:
+        corpus = build_corpus(args.n, length, args.seed)
+
+        for name in stages:
+            for batch in (batches if name in BATCH_STAGES else [None]):
+                row = measure(name, corpus, batch)
+                row["length"] = length
+                results.append(row)
+
+                print(
+                    f"{name:<12} {length:>4} {row['batch']:>6} "
+                    f"{row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} {row['p99_ms']:>9.3f} "
+                    f"{row['texts_per_s']:>10,.0f} {row['peak_kb']:>9,.1f}"
+                )
+
+    if args.out:
+        meta = {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ml_engine": app.get_model_registry.engine.status(),
+            "model_version": app.get_ml_model().version,
+            "n": args.n,
+            "seed": args.seed,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n⚠️ {regressions} regression(s) over {args.threshold}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
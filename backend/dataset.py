@@ -1,6 +1,22 @@
-import pandas as pd
+# dataset.py
+#
+#   python dataset.py                         data/sample_data.csv (1200 per class)
+#   python dataset.py --rows 5000000 --out data/synthetic.csv --seed 7
+#   python dataset.py --rows 5000000 --out data/synthetic.parquet
+#
+# With --rows, rows are generated lazily and written in chunks. Each
+# class walks a seeded permutation of its sentence space (no rejection
+# sampling), and a fixed-size Bloom filter instead of a set guards
+# against the rare repeats, so memory stays flat however many rows.
+
+import argparse
+import csv
+import hashlib
+import math
 import random
 import os
+import sys
+import time
 
 # ---------------- Word Banks ----------------
 
@@ -94,36 +110,306 @@ def random_sentence(label):
 
 # ---------------- Dataset Generation ----------------
 
-rows = []
-seen = set()
-
 TARGET_PER_CLASS = 1200
 labels = ["positive", "abusive", "toxic"]
-counts = {label: 0 for label in labels}
 
-while min(counts.values()) < TARGET_PER_CLASS:
-    label = random.choice(labels)
-    text = random_sentence(label)
 
-    if text.lower() in seen:
-        continue
+# ---------------- Streaming Generation ----------------
+
+class BloomFilter:
+    """
+    Fixed-memory set membership with a bounded false-positive rate.
+    A false positive only rejects a sentence that was actually new.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+
+        # Double hashing: h1 + i*h2 gives k independent-enough positions
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> bool:
+        """
+        Adds `item`; returns False if it was (probably) already present.
+        """
+        new = False
+        for pos in self._positions(item):
+            byte, bit = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte] & bit:
+                self.bits[byte] |= bit
+                new = True
+        return new
+
+
+def sentence_space(label: str) -> list[list[str]]:
+    """
+    Word lists whose product is every sentence random_sentence(label)
+    can build, before noise: prefix, target, verb, tail, filler, suffix.
+    """
+    if label == "positive":
+        tails = positive_words
+    elif label == "abusive":
+        tails = abusive_words
+    else:
+        tails = (
+            toxic_words
+            + [f"{t} but {p}" for t in toxic_words for p in positive_words]
+            + [f"{a} and {t}" for a in abusive_words for t in toxic_words]
+        )
+    return [prefix, targets, verbs, tails, fillers, suffix]
+
+
+def sentence_at(space: list[list[str]], index: int) -> str:
+    """
+    The `index`-th sentence of the product, in mixed radix.
+    """
+    parts = []
+    for words in reversed(space):
+        index, digit = divmod(index, len(words))
+        parts.append(words[digit])
+    pre, target, verb, tail, filler, end = reversed(parts)
+
+    return (pre + target + " " + verb + " " + tail + filler + end).strip()
+
+
+class IndexPermutation:
+    """
+    Seeded bijection on range(n), computed per index instead of shuffled
+    in memory: a 4-round Feistel network over the next even power of two,
+    cycle-walked back into range (under 4 rounds of walking on average).
+    """
+
+    def __init__(self, n: int, seed: int):
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(64) for _ in range(4)]
+
+    def _round(self, x: int, key: int) -> int:
+        x = ((x ^ key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        return (x >> 29 ^ x) & self.mask
+
+    def __getitem__(self, i: int) -> int:
+        x = i
+        while True:
+            left, right = x >> self.half, x & self.mask
+            for key in self.keys:
+                left, right = right, left ^ self._round(right, key)
+            x = left << self.half | right
+            if x < self.n:
+                return x
+
+
+# Tier 0 draws every sentence once with random_noise(); later tiers draw
+# them again with one fixed noise each, so a class holds
+# len(NOISE_TIERS) × its sentence space rows before it runs out.
+NOISE_TIERS = (
+    [None]
+    + [(True, None)]                                  # upper-cased
+    + [(False, d) for d in "0123456789"]              # one typo digit
+    + [(True, d) for d in "0123456789"]               # both
+)
+
+
+def forced_noise(text: str, upper: bool, digit: str | None, index: int) -> str:
+    if digit is not None and len(text) >= 4:
+        i = 1 + index * 2654435761 % (len(text) - 2)
+        text = text[:i] + digit + text[i + 1:]
+    return text.upper() if upper else text
+
+
+def iter_rows(total: int, seed: int, error_rate: float = 0.001,
+              stats: dict | None = None):
+    """
+    Yields (text, label) with classes balanced and texts unique
+    (case-insensitive).
+
+    Each class walks a seeded permutation of its sentence space, so
+    sentences are drawn without replacement and every row costs the
+    same however full the space is. The Bloom filter only catches the
+    rare texts two draws build alike (e.g. the same typo). A class is
+    dropped once all its noise tiers are used up.
+    """
+    random.seed(seed)
+    seen = BloomFilter(total, error_rate)
+
+    spaces = {label: sentence_space(label) for label in labels}
+    sizes = {label: math.prod(len(words) for words in spaces[label]) for label in labels}
+    perms = {
+        label: IndexPermutation(sizes[label], seed * len(labels) + i)
+        for i, label in enumerate(labels)
+    }
+    draws = {label: 0 for label in labels}
+
+    per_class = math.ceil(total / len(labels))
+    counts = {label: 0 for label in labels}
+    open_labels = list(labels)
+    stats = stats if stats is not None else {}
+    stats.update(rejected=0, exhausted=[])
+
+    produced = 0
+    while produced < total and open_labels:
+        label = random.choice(open_labels)
+
+        tier, k = divmod(draws[label], sizes[label])
+        if tier >= len(NOISE_TIERS):
+            open_labels.remove(label)
+            stats["exhausted"].append(label)
+            continue
+        draws[label] += 1
+
+        index = perms[label][k]
+        text = sentence_at(spaces[label], index)
+        if tier == 0:
+            text = random_noise(text)
+        else:
+            text = forced_noise(text, *NOISE_TIERS[tier], index)
+
+        if not seen.add(text.lower()):
+            stats["rejected"] += 1
+            continue
+
+        counts[label] += 1
+        if counts[label] >= per_class:
+            open_labels.remove(label)
+
+        produced += 1
+        yield text, label
+
+
+class ChunkWriter:
+    """
+    Appends row chunks to one CSV file or one Parquet file
+    (a row group per chunk; needs pyarrow).
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.parquet = path.endswith(".parquet")
+
+        if self.parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("❌ Parquet output needs pyarrow: pip install pyarrow")
+
+            self._pa = pa
+            self.schema = pa.schema([("text", pa.string()), ("label", pa.string())])
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.f = open(path, "w", newline="", encoding="utf-8")
+            self.writer = csv.writer(self.f)
+            self.writer.writerow(["text", "label"])
+
+    def write(self, rows: list[tuple[str, str]]):
+        if self.parquet:
+            texts, row_labels = zip(*rows)
+            self.writer.write_table(self._pa.table(
+                {"text": list(texts), "label": list(row_labels)}, schema=self.schema
+            ))
+        else:
+            self.writer.writerows(rows)
+            self.f.flush()
+
+    def close(self):
+        if self.parquet:
+            self.writer.close()
+        else:
+            self.f.close()
+
+
+def stream_dataset(total: int, out: str, seed: int, chunk_size: int, error_rate: float):
+    start = time.perf_counter()
+    stats = {}
+    writer = ChunkWriter(out)
+    chunk = []
+    written = 0
+
+    for row in iter_rows(total, seed, error_rate, stats):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            writer.write(chunk)
+            written += len(chunk)
+            chunk = []
+
+            rate = written / (time.perf_counter() - start)
+            print(f"rows {written:,} | {rate:,.0f} rows/s", file=sys.stderr, flush=True)
+
+    if chunk:
+        writer.write(chunk)
+        written += len(chunk)
+    writer.close()
+
+    print(f"✅ {written:,} rows written to {out} in {time.perf_counter() - start:.1f}s")
+    print(f"Duplicates rejected: {stats['rejected']:,}")
+    if stats["exhausted"]:
+        print(f"⚠️ Sentence space exhausted for: {', '.join(stats['exhausted'])}")
+
+
+# ---------------- Original Sample Dataset ----------------
+
+def build_sample():
+    import pandas as pd
+
+    rows = []
+    seen = set()
 
-    seen.add(text.lower())
-    rows.append({
-        "text": text,
-        "label": label
-    })
+    counts = {label: 0 for label in labels}
 
-    counts[label] += 1
+    while min(counts.values()) < TARGET_PER_CLASS:
+        label = random.choice(labels)
+        text = random_sentence(label)
 
-df = pd.DataFrame(rows)
+        if text.lower() in seen:
+            continue
+
+        seen.add(text.lower())
+        rows.append({
+            "text": text,
+            "label": label
+        })
+
+        counts[label] += 1
+
+    df = pd.DataFrame(rows)
+
+    os.makedirs("data", exist_ok=True)
+    df.to_csv("data/sample_data.csv", index=False)
+
+    print("✅ Dataset created")
+    print("Total rows:", len(df))
+    print("Class distribution:")
+    print(df["label"].value_counts())
+    print("\nSample rows:")
+    print(df.sample(10))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic labeled comments")
+    parser.add_argument("--rows", type=int, help="Stream this many rows instead of the sample dataset")
+    parser.add_argument("--out", default="data/synthetic.csv", help=".csv or .parquet")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--error-rate", type=float, default=0.001, help="Bloom filter false-positive rate")
+    args = parser.parse_args()
+
+    if args.rows is None:
+        build_sample()
+    else:
+        stream_dataset(
+            args.rows, args.out, args.seed, args.chunk_size, args.error_rate
+        )
 
-os.makedirs("data", exist_ok=True)
-df.to_csv("data/sample_data.csv", index=False)
 
-print("✅ Dataset created")
-print("Total rows:", len(df))
-print("Class distribution:")
-print(df["label"].value_counts())
-print("\nSample rows:")
-print(df.sample(10))
+if __name__ == "__main__":
+    main()
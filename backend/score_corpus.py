@@ -0,0 +1,366 @@
+# score_corpus.py
+#
+# Offline scorer for large CSV / JSONL corpora, outside the API.
+#
+#   python score_corpus.py data/comments.csv results.jsonl
+#   python score_corpus.py big.jsonl results.csv --workers 8 --chunk-size 2000
+#   python score_corpus.py big.csv results.parquet --resume
+#
+# Each worker process loads the ML model once and scores whole chunks
+# through the same pipeline as /predict/batch (rules + ML + sentiment;
+# the LLM stays off unless --llm is given). Results are written as
+# chunks finish, and a checkpoint next to the output allows --resume.
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Flat columns for CSV / Parquet output
+FLAT_COLUMNS = [
+    "index", "text", "toxic", "confidence", "severity", "abusive_words",
+    "ml_label", "toxicity_probability", "model_version", "sentiment_label",
+    "polarity", "llm_status"
+]
+
+
+# =====================================================
+# INPUT (chunked reads with byte offsets)
+# =====================================================
+
+def _lines_with_offsets(f, counter: list):
+    """
+    Decoded lines from a binary file; counter[0] tracks bytes consumed.
+    """
+    for raw in iter(f.readline, b""):
+        counter[0] += len(raw)
+        yield raw.decode("utf-8", "replace")
+
+
+def iter_records(path: str, fmt: str, text_column: str, offset: int, header):
+    """
+    Yields (text, byte_offset_after_record, header).
+    `offset` / `header` come from a checkpoint when resuming.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        counter = [offset]
+        lines = _lines_with_offsets(f, counter)
+
+        if fmt == "jsonl":
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    record = record.get(text_column)
+                yield (record if isinstance(record, str) else ""), counter[0], None
+            return
+
+        reader = csv.reader(lines)
+        if header is None:
+            header = next(reader, [])
+        if text_column not in header:
+            raise SystemExit(f"❌ CSV has no '{text_column}' column: {header}")
+        col = header.index(text_column)
+
+        for row in reader:
+            yield (row[col] if col < len(row) else ""), counter[0], header
+
+
+# =====================================================
+# OUTPUT
+# =====================================================
+
+def flatten(index: int, text: str, payload: dict) -> dict:
+    ml = payload.get("ml") or {}
+    sentiment = payload.get("sentiment") or {}
+    llm = payload.get("llm") or {}
+
+    return {
+        "index": index,
+        "text": text,
+        "toxic": payload["toxic"],
+        "confidence": payload["confidence"],
+        "severity": payload["severity"],
+        "abusive_words": "|".join(sorted(payload["abusive_words"])),
+        "ml_label": ml.get("label"),
+        "toxicity_probability": ml.get("toxicity_probability"),
+        "model_version": ml.get("model_version"),
+        "sentiment_label": sentiment.get("label"),
+        "polarity": sentiment.get("polarity"),
+        "llm_status": llm.get("status", "off")
+    }
+
+
+class ResultWriter:
+    """
+    Appends results as chunks complete.
+    Parquet output is a directory of part files (Parquet can't append).
+    """
+
+    def __init__(self, path: str, fmt: str, resume: bool, part: int):
+        self.path = path
+        self.fmt = fmt
+        self.part = part
+
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit("❌ Parquet output needs pyarrow: pip install pyarrow")
+            os.makedirs(path, exist_ok=True)
+            return
+
+        new_file = not (resume and os.path.exists(path))
+        self.f = open(path, "w" if new_file else "a", newline="", encoding="utf-8")
+
+        if fmt == "csv":
+            self.csv = csv.DictWriter(self.f, fieldnames=FLAT_COLUMNS)
+            if new_file:
+                self.csv.writeheader()
+
+    def write(self, start_index: int, texts: list[str], payloads: list[dict]):
+        if self.fmt == "jsonl":
+            for i, (text, payload) in enumerate(zip(texts, payloads)):
+                line = {"index": start_index + i, "text": text, **payload}
+                self.f.write(json.dumps(line, default=str) + "\n")
+
+        elif self.fmt == "csv":
+            for i, (text, payload) in enumerate(zip(texts, payloads)):
+                self.csv.writerow(flatten(start_index + i, text, payload))
+
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            rows = [
+                flatten(start_index + i, text, payload)
+                for i, (text, payload) in enumerate(zip(texts, payloads))
+            ]
+            table = pa.Table.from_pylist(rows)
+            pq.write_table(table, os.path.join(self.path, f"part-{self.part:05d}.parquet"))
+            self.part += 1
+            return
+
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        if self.fmt != "parquet":
+            self.f.close()
+
+
+# =====================================================
+# CHECKPOINT
+# =====================================================
+
+def checkpoint_path(output: str) -> str:
+    return output.rstrip("/") + ".checkpoint.json"
+
+
+def load_checkpoint(output: str, input_path: str) -> dict | None:
+    path = checkpoint_path(output)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+
+    if state.get("input") != os.path.abspath(input_path):
+        raise SystemExit(f"❌ Checkpoint {path} belongs to {state.get('input')}")
+    return state
+
+
+def save_checkpoint(output: str, state: dict):
+    path = checkpoint_path(output)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+# =====================================================
+# WORKERS
+# =====================================================
+
+_worker_llm = False
+
+
+def _init_worker(llm: bool, workers: int):
+    """
+    Runs once per process: imports the pipeline and loads the model.
+    The model is pinned for the run (no hot swaps between chunks).
+
+    Every process has its own rate limiter, so each gets 1/workers of
+    LLM_RPM and LLM_BURST (main() caps workers at LLM_BURST with --llm):
+    together they stay within the API's limit.
+    """
+    global _worker_llm
+    _worker_llm = llm
+
+    os.environ["MODEL_POLL_SECONDS"] = "0"
+    if llm:
+        rpm = float(os.getenv("LLM_RPM", "12"))
+        burst = int(os.getenv("LLM_BURST", "3"))
+        os.environ["LLM_RPM"] = str(rpm / workers)
+        os.environ["LLM_BURST"] = str(burst // workers)
+
+    import app
+    app.get_ml_model()
+
+
+def _score_chunk(texts: list[str]) -> list[dict]:
+    import app
+
+    mode = "inline" if _worker_llm else "skip"
+    return app.score_batch(texts, mode, lambda *args: None, "backfill", admit=False)
+
+
+# =====================================================
+# PROGRESS REPORT
+# =====================================================
+
+def _fmt_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def report(rows: int, rows_start: int, offset: int, offset_start: int,
+           total_bytes: int, started: float, final: bool = False):
+    elapsed = max(time.monotonic() - started, 1e-9)
+    rate = (rows - rows_start) / elapsed
+    byte_rate = (offset - offset_start) / elapsed
+    done = offset / total_bytes if total_bytes else 1.0
+
+    eta = (total_bytes - offset) / byte_rate if byte_rate > 0 else 0.0
+    status = "done in " + _fmt_eta(elapsed) if final else "ETA " + _fmt_eta(eta)
+
+    print(
+        f"rows {rows:,} | {rate:,.0f} rows/s | {done * 100:5.1f}% | {status}",
+        file=sys.stderr,
+        flush=True
+    )
+
+
+# =====================================================
+# MAIN
+# =====================================================
+
+def detect_format(path: str, choices: tuple) -> str:
+    ext = os.path.splitext(path.rstrip("/"))[1].lstrip(".").lower()
+    ext = {"ndjson": "jsonl", "json": "jsonl"}.get(ext, ext)
+    if ext not in choices:
+        raise SystemExit(f"❌ Can't infer format of {path}, pass it explicitly")
+    return ext
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV / JSONL corpus offline")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "jsonl", "parquet"])
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--llm", action="store_true", help="Also run the LLM stage (slow)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint")
+    parser.add_argument("--report-every", type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    # A worker's rate limiter needs a burst of at least 1
+    llm_burst = max(1, int(os.getenv("LLM_BURST", "3")))
+    if args.llm and args.workers > llm_burst:
+        print(
+            f"⚠️ --llm: using {llm_burst} workers instead of {args.workers} "
+            f"(LLM_BURST={llm_burst} is split across them)",
+            file=sys.stderr
+        )
+        args.workers = llm_burst
+
+    in_fmt = args.input_format or detect_format(args.input, ("csv", "jsonl"))
+    out_fmt = args.output_format or detect_format(args.output, ("csv", "jsonl", "parquet"))
+
+    state = load_checkpoint(args.output, args.input) if args.resume else None
+    if state:
+        print(f"↩️  Resuming after {state['rows_done']:,} rows", file=sys.stderr)
+    else:
+        state = {
+            "input": os.path.abspath(args.input),
+            "rows_done": 0,
+            "input_offset": 0,
+            "header": None,
+            "part": 0
+        }
+
+    writer = ResultWriter(args.output, out_fmt, bool(args.resume and state["rows_done"]), state["part"])
+    records = iter_records(
+        args.input, in_fmt, args.text_column, state["input_offset"], state["header"]
+    )
+
+    total_bytes = os.path.getsize(args.input)
+    rows_start, offset_start = state["rows_done"], state["input_offset"]
+    started = last_report = time.monotonic()
+
+    def chunks():
+        chunk, end, header = [], None, state["header"]
+        for text, end, header in records:
+            chunk.append(text)
+            if len(chunk) >= args.chunk_size:
+                yield chunk, end, header
+                chunk = []
+        if chunk:
+            yield chunk, end, header
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.llm, args.workers)
+    ) as pool:
+        pending = deque()
+        source = chunks()
+        exhausted = False
+
+        while pending or not exhausted:
+            # Keep a bounded number of chunks in flight
+            while not exhausted and len(pending) < args.workers * 2:
+                item = next(source, None)
+                if item is None:
+                    exhausted = True
+                    break
+                texts, end, header = item
+                pending.append((texts, end, header, pool.submit(_score_chunk, texts)))
+
+            if not pending:
+                break
+
+            # Write in input order, then advance the checkpoint
+            texts, end, header, future = pending.popleft()
+            writer.write(state["rows_done"], texts, future.result())
+
+            state["rows_done"] += len(texts)
+            state["input_offset"] = end
+            state["header"] = header
+            state["part"] = writer.part
+            save_checkpoint(args.output, state)
+
+            if time.monotonic() - last_report >= args.report_every:
+                last_report = time.monotonic()
+                report(state["rows_done"], rows_start, state["input_offset"],
+                       offset_start, total_bytes, started)
+
+    writer.close()
+    report(state["rows_done"], rows_start, state["input_offset"],
+           offset_start, total_bytes, started, final=True)
+
+
+if __name__ == "__main__":
+    main()
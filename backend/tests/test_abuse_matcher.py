@@ -0,0 +1,68 @@
+# test_abuse_matcher.py
+#
+# detect_abusive_tokens (Aho-Corasick) must return exactly the sorted
+# hits of the original per-word regex loop.
+#
+# Run from backend/:
+#   python -m pytest tests
+
+import csv
+import os
+import re
+
+import pytest
+
+from utils.abuse_words import abusive_words, detect_abusive_tokens
+from utils.preprocessing import normalize_text
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "sample_data.csv")
+
+
+def legacy_detect(text: str) -> list[str]:
+    """
+    The per-word regex loop AbuseMatcher replaced.
+    """
+    text_lower = text.lower()
+    found = set()
+
+    for word in abusive_words:
+        if " " in word:
+            if word in text_lower:
+                found.add(word)
+        elif re.search(r"\b" + re.escape(word) + r"\b", text_lower):
+            found.add(word)
+
+    return sorted(found)
+
+
+BOUNDARY_CASES = [
+    # Underscores and digits are word characters
+    "idiot_", "_idiot", "idiot_face", "stupid2", "2stupid", "idiot 2day",
+    # Punctuation next to words
+    "idiot!", "(idiot)", "idiot,stupid", "stupid.idiot", "'jerk'", "loser?!",
+    # Obfuscated entries that start / end with non-word characters
+    "a$$hole", "you a$$hole!", "xa$$hole", "a$$holes", "a$$hole_",
+    "bewakoof)", "tu bewakoof) hai", "bewakoof))", "bewakoof)x", "(bewakoof)",
+    "f*ck", "f**k you", "b!tch", "sh*tty", "motherf**ker",
+    # Words inside longer words
+    "classic", "assess", "shell", "hello", "killer", "dieting",
+    # Phrases match as substrings
+    "go to hell", "just go to hellfire", "you suck", "shut up now", "go die",
+    # Case and empty input
+    "IDIOT", "Go To Hell", "", "   ",
+]
+
+
+@pytest.mark.parametrize("text", BOUNDARY_CASES)
+def test_boundary_cases_match_legacy(text):
+    assert detect_abusive_tokens(text) == legacy_detect(text)
+
+
+def test_sample_corpus_matches_legacy():
+    with open(DATA_PATH, newline="", encoding="utf-8") as f:
+        texts = [row["text"] for row in csv.DictReader(f)]
+
+    for text in texts:
+        # Raw text and what the pipeline passes in
+        for variant in (text, normalize_text(text)):
+            assert detect_abusive_tokens(variant) == legacy_detect(variant), variant
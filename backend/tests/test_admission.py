@@ -0,0 +1,221 @@
+# test_admission.py
+#
+# PriorityGate (LLM slot queue) and LocalLoad (429 admission).
+#
+# Run from backend/:
+#   python -m pytest tests
+
+import asyncio
+import threading
+import time
+
+from utils.admission import LocalLoad, PriorityGate
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+
+class FakeBucket:
+    """
+    Token bucket whose tokens are handed out by the test.
+    """
+
+    def __init__(self, tokens: int = 0, rate: float = 60.0):
+        self.tokens = tokens
+        self.rate = rate / 60.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.tokens > 0:
+                self.tokens -= 1
+                return True
+            return False
+
+    def next_token_in(self) -> float:
+        return 0.0 if self.tokens > 0 else 0.005
+
+    def give(self, n: int = 1):
+        with self._lock:
+            self.tokens += n
+
+
+def wait_for(condition, timeout: float = 2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "condition not reached"
+        time.sleep(0.002)
+
+
+def start_waiter(gate, priority, results, tag, max_wait=2.0):
+    thread = threading.Thread(
+        target=lambda: results.append((tag, gate.acquire(priority, max_wait)))
+    )
+    thread.start()
+    return thread
+
+
+# =====================================================
+# PRIORITY GATE
+# =====================================================
+
+def test_free_slot_is_granted_at_once():
+    gate = PriorityGate(FakeBucket(tokens=1), max_queue=4)
+
+    assert gate.acquire("batch") == "ok"
+    assert gate.stats()["admitted"]["batch"] == 1
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    bucket = FakeBucket()
+    gate = PriorityGate(bucket, max_queue=10, shares={"interactive": 1, "batch": 1, "backfill": 1})
+    results = []
+
+    threads = []
+    for priority, tag in [("backfill", "bf"), ("batch", "b1"), ("interactive", "i"), ("batch", "b2")]:
+        threads.append(start_waiter(gate, priority, results, tag))
+        wait_for(lambda: gate.depth() == len(threads))
+
+    for n in range(1, 5):
+        bucket.give()
+        wait_for(lambda: len(results) == n)
+
+    for thread in threads:
+        thread.join()
+
+    assert [tag for tag, _ in results] == ["i", "b1", "b2", "bf"]
+    assert {status for _, status in results} == {"queued"}
+    assert gate.depth() == 0
+
+
+def test_lower_priorities_are_shed_past_their_share():
+    gate = PriorityGate(
+        FakeBucket(), max_queue=4,
+        shares={"interactive": 1.0, "batch": 0.5, "backfill": 0.25}
+    )
+    results = []
+
+    threads = [start_waiter(gate, "batch", results, i, max_wait=0.5) for i in range(2)]
+    wait_for(lambda: gate.depth() == 2)
+
+    # Batch may fill 2 of 4 places, backfill 1: both are shed at once
+    assert gate.acquire("batch") == "shed"
+    assert gate.acquire("backfill") == "shed"
+
+    # Interactive may still queue
+    threads.append(start_waiter(gate, "interactive", results, "i", max_wait=0.5))
+    wait_for(lambda: gate.depth() == 3)
+
+    for thread in threads:
+        thread.join()
+
+    stats = gate.stats()
+    assert stats["shed"]["backfill"] == 1
+    assert stats["queue_depth"] == {"interactive": 0, "batch": 0, "backfill": 0}
+
+
+def test_timeout_sheds_and_frees_the_place():
+    bucket = FakeBucket()
+    gate = PriorityGate(bucket, max_queue=1)
+
+    assert gate.acquire("interactive", max_wait=0.05) == "shed"
+    assert gate.depth() == 0
+
+    # The token goes to the next caller, not the one that gave up
+    bucket.give()
+    assert gate.acquire("interactive", max_wait=1.0) in ("ok", "queued")
+    assert bucket.tokens == 0
+
+
+def test_grant_racing_the_timeout_counts_as_granted():
+    gate = PriorityGate(FakeBucket(), max_queue=2)
+    waiter = gate._enter("interactive")
+
+    # Dispatcher grants (token spent) just as the caller's wait times out
+    with gate._cond:
+        waiter.done = True
+        gate._waiting["interactive"] -= 1
+
+    assert gate._leave(waiter, granted=False) is True
+    assert gate.stats()["shed"]["interactive"] == 0
+    assert gate.depth() == 0
+
+
+def test_no_refill_sheds_instead_of_queueing():
+    gate = PriorityGate(FakeBucket(rate=0), max_queue=4, max_wait=5)
+
+    start = time.monotonic()
+    assert gate.acquire("interactive") == "shed"
+    assert time.monotonic() - start < 0.5
+
+
+def test_async_waiters_and_cancellation():
+    async def scenario():
+        bucket = FakeBucket()
+        gate = PriorityGate(bucket, max_queue=4)
+
+        cancelled = asyncio.create_task(gate.acquire_async("interactive", 2.0))
+        waiting = asyncio.create_task(gate.acquire_async("batch", 2.0))
+        await asyncio.sleep(0.02)
+        assert gate.depth() == 2
+
+        cancelled.cancel()
+        await asyncio.sleep(0.02)
+        assert gate.depth() == 1
+
+        # The token skips the cancelled waiter
+        bucket.give()
+        assert await waiting == "queued"
+        assert gate.depth() == 0
+
+        timed_out = await gate.acquire_async("interactive", 0.05)
+        assert timed_out == "shed"
+
+    asyncio.run(scenario())
+
+
+def test_try_acquire_never_jumps_the_queue():
+    bucket = FakeBucket()
+    gate = PriorityGate(bucket, max_queue=4)
+    gate._dispatcher = object()   # no dispatcher: the waiter stays queued
+
+    gate._enter("backfill")
+    bucket.give()
+
+    # A token is free, but someone is waiting for it: no hedge slot
+    assert gate.try_acquire() is False
+    assert bucket.tokens == 1
+
+
+# =====================================================
+# LOCAL LOAD
+# =====================================================
+
+def test_local_load_shares_and_force():
+    load = LocalLoad(4, workers=2, shares={"interactive": 1.0, "batch": 0.5, "backfill": 0.25})
+
+    assert load.enter("backfill")
+    assert not load.enter("backfill")
+    assert load.enter("batch")
+    assert not load.admits("batch")
+    assert load.enter("interactive") and load.enter("interactive")
+    assert not load.enter("interactive")
+
+    # Accepted work is counted even when saturated
+    assert load.enter("backfill", force=True)
+    assert load.stats()["in_flight"] == 5
+    assert load.stats()["rejected"] == {"interactive": 1, "batch": 1, "backfill": 1}
+
+
+def test_retry_after_follows_cpu_time():
+    load = LocalLoad(4, workers=2)
+
+    for _ in range(4):
+        load.enter("interactive")
+    for _ in range(50):
+        load.enter("interactive", force=True)
+        load.leave(2.0)
+
+    # 4 in flight × ~2 s each over 2 workers
+    assert 3 <= load.retry_after() <= 4
@@ -0,0 +1,38 @@
+# test_deferred_jobs.py
+#
+# DeferredJobs (llm="defer" verdicts fetched by job id).
+#
+# Run from backend/:
+#   python -m pytest tests
+
+import time
+
+from utils.deferred_jobs import DeferredJobs
+
+
+def test_job_is_pending_until_finished():
+    jobs = DeferredJobs()
+    job_id = jobs.create()
+
+    assert jobs.get(job_id) == {"job": job_id, "status": "pending", "llm": None}
+
+    jobs.finish(job_id, {"toxic": True, "status": "ok"})
+    assert jobs.get(job_id)["status"] == "done"
+    assert jobs.get(job_id)["llm"] == {"toxic": True, "status": "ok"}
+    assert jobs.get("unknown") is None
+
+
+def test_jobs_are_bounded_and_expire():
+    jobs = DeferredJobs(max_size=2, ttl=0.05)
+    first, second, third = jobs.create(), jobs.create(), jobs.create()
+
+    # Oldest dropped first; a late verdict for it is ignored
+    assert jobs.get(first) is None
+    jobs.finish(first, {"status": "ok"})
+    assert jobs.stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert jobs.get(second) is None and jobs.get(third) is None
+
+    jobs.create()
+    assert jobs.stats()["size"] == 1
@@ -0,0 +1,196 @@
+# test_llm_hedging.py
+#
+# Fallback and hedge order of llm_guard._hedged_call, with a fake
+# OpenRouter client (no network, no API key).
+#
+# Run from backend/:
+#   python -m pytest tests
+
+import asyncio
+import json
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+
+from utils import llm_guard
+
+
+VERDICT = {
+    "toxic": True,
+    "confidence": 0.9,
+    "severity": "high",
+    "explanation": "Direct insult aimed at the reader."
+}
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+
+class FakeClient:
+    """
+    Async client whose models answer after `delay` seconds with
+    `content`, or raise when content is an exception.
+    """
+
+    def __init__(self, models: dict):
+        self.models = models           # model -> (delay, content)
+        self.started = []
+        self.cancelled = []
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, messages, **kwargs):
+        self.started.append(model)
+        delay, content = self.models[model]
+
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(model)
+            raise
+
+        if isinstance(content, Exception):
+            raise content
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+
+class FakeGate:
+    def __init__(self, slots: int):
+        self.slots = slots
+
+    def try_acquire(self) -> bool:
+        if self.slots > 0:
+            self.slots -= 1
+            return True
+        return False
+
+
+def verdict(**overrides) -> str:
+    return json.dumps({**VERDICT, **overrides})
+
+
+@pytest.fixture
+def models(monkeypatch):
+    def setup(names, slots=10, hedge_after=None):
+        monkeypatch.setattr(llm_guard, "LLM_MODELS", names)
+        monkeypatch.setattr(llm_guard, "llm_gate", FakeGate(slots))
+        monkeypatch.setattr(llm_guard, "_latencies", {})
+        monkeypatch.setattr(llm_guard, "LLM_HEDGE_MIN_SAMPLES", 1)
+        monkeypatch.setattr(llm_guard, "LLM_HEDGE_MIN_MS", 0)
+
+        # Known latency → hedge after `hedge_after` seconds
+        if hedge_after is not None:
+            for name in names:
+                llm_guard._latencies[name] = deque([hedge_after])
+
+    return setup
+
+
+def run(client):
+    return asyncio.run(llm_guard._hedged_call(client, "you are an idiot"))
+
+
+# =====================================================
+# FALLBACK
+# =====================================================
+
+def test_primary_answers(models):
+    models(["a", "b"])
+    client = FakeClient({"a": (0, verdict()), "b": (0, verdict())})
+
+    result, model = run(client)
+
+    assert model == "a"
+    assert result["confidence"] == 0.9
+    assert client.started == ["a"]
+
+
+def test_failures_fall_through_in_order(models):
+    models(["a", "b", "c"])
+    client = FakeClient({
+        "a": (0, RuntimeError("down")),
+        "b": (0, verdict(confidence="high")),   # unusable verdict
+        "c": (0, verdict(confidence=0.7))
+    })
+
+    result, model = run(client)
+
+    assert model == "c"
+    assert result["confidence"] == 0.7
+    assert client.started == ["a", "b", "c"]
+
+
+def test_no_slot_means_no_fallback(models):
+    models(["a", "b"], slots=0)
+    client = FakeClient({"a": (0, RuntimeError("down")), "b": (0, verdict())})
+
+    assert run(client) == (None, None)
+    assert client.started == ["a"]
+
+
+def test_every_model_failing_returns_none(models):
+    models(["a", "b"])
+    client = FakeClient({"a": (0, None), "b": (0, "not json")})
+
+    assert run(client) == (None, None)
+
+
+# =====================================================
+# HEDGING
+# =====================================================
+
+def test_slow_primary_is_hedged_and_cancelled(models):
+    models(["a", "b"], hedge_after=0.02)
+    client = FakeClient({"a": (1.0, verdict()), "b": (0.01, verdict(confidence=0.6))})
+
+    result, model = run(client)
+
+    assert model == "b"
+    assert result["confidence"] == 0.6
+    assert client.started == ["a", "b"]
+    assert client.cancelled == ["a"]
+
+
+def test_primary_winning_the_race_cancels_the_hedge(models):
+    models(["a", "b"], hedge_after=0.02)
+    client = FakeClient({"a": (0.05, verdict()), "b": (1.0, verdict(confidence=0.6))})
+
+    result, model = run(client)
+
+    assert model == "a"
+    assert client.cancelled == ["b"]
+
+
+def test_no_slot_for_hedge_waits_for_primary(models):
+    models(["a", "b"], slots=0, hedge_after=0.01)
+    client = FakeClient({"a": (0.05, verdict()), "b": (0, verdict())})
+
+    result, model = run(client)
+
+    assert model == "a"
+    assert client.started == ["a"]
+
+
+def test_unknown_latency_never_hedges(models):
+    models(["a", "b"])
+    client = FakeClient({"a": (0.05, verdict()), "b": (0, verdict())})
+
+    _, model = run(client)
+
+    assert model == "a"
+    assert client.started == ["a"]
+
+
+def test_cancelled_primary_still_counts_its_latency(models):
+    models(["a", "b"], hedge_after=0.02)
+    client = FakeClient({"a": (1.0, verdict()), "b": (0.01, verdict())})
+
+    run(client)
+
+    # Recorded as a lower bound, so hedge_delay does not drift down
+    samples = llm_guard._latencies["a"]
+    assert len(samples) == 2
+    assert samples[-1] >= 0.02
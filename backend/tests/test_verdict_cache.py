@@ -0,0 +1,34 @@
+# test_verdict_cache.py
+#
+# VerdictCache SQLite persistence: pruning by TTL and size.
+#
+# Run from backend/:
+#   python -m pytest tests
+
+import time
+
+from utils.verdict_cache import VerdictCache
+
+
+def count_rows(cache) -> int:
+    return cache._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+
+def test_db_keeps_the_newest_rows_within_its_size(tmp_path):
+    cache = VerdictCache(max_size=10, db_path=str(tmp_path / "cache.db"), db_max_size=150)
+
+    for i in range(400):
+        cache.put(f"text {i}", {"toxic": False, "i": i})
+
+    assert count_rows(cache) == 150
+    assert cache.stats()["db_evictions"] == 250
+    assert cache.get("text 399")["i"] == 399
+    assert cache.get("text 5") is None
+
+
+def test_expired_rows_are_dropped_at_startup(tmp_path):
+    path = str(tmp_path / "cache.db")
+    VerdictCache(ttl=0.01, db_path=path).put("old", {"toxic": True})
+    time.sleep(0.02)
+
+    assert count_rows(VerdictCache(db_path=path)) == 0
@@ -1,77 +1,472 @@
 # train_model.py
+#
+#   python train_model.py                 train, evaluate, save + export
+#   python train_model.py --export-only   export the saved model for the
+#                                         numpy inference engine
+#   python train_model.py --version v2    also publish as models/v2 for
+#                                         the running API to hot-swap
+#   python train_model.py --search        out-of-core mode: stream the CSV,
+#                                         cache features, grid-search and
+#                                         train the best configuration
+
+import argparse
+import csv
+import hashlib
+import itertools
+import os
+import shutil
+import time
 
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.pipeline import Pipeline
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import classification_report, confusion_matrix
-from sklearn.preprocessing import LabelEncoder
 import joblib
 from utils.preprocessing import normalize_text
+from utils.linear_model import export_pipeline
+
+DATA_PATH = "data/sample_data.csv"
+MODEL_PATH = "abuse_model.joblib"
+ENCODER_PATH = "label_encoder.joblib"
+LINEAR_EXPORT_DIR = "abuse_model_linear"
+MODELS_DIR = "models"
+CACHE_DIR = ".train_cache"
+
+# Bump when the cache layout changes
+CACHE_FORMAT = 1
+
+
+def train():
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.pipeline import Pipeline
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import classification_report, confusion_matrix
+    from sklearn.preprocessing import LabelEncoder
+
+    df = pd.read_csv(DATA_PATH)
+
+    print("\nClass distribution:")
+    print(df["label"].value_counts())
+
+    # ---------------- Clean text ----------------
+    df["text"] = df["text"].astype(str).apply(normalize_text)
+
+    # ---------------- Encode labels ----------------
+    encoder = LabelEncoder()
+    df["label_encoded"] = encoder.fit_transform(df["label"])
+
+    # Save encoder for inference
+    joblib.dump(encoder, ENCODER_PATH)
+
+    X = df["text"]
+    y = df["label_encoded"]
+
+    # ---------------- Train-test split ----------------
+    X_train, X_test, y_train, y_test = train_test_split(
+        X,
+        y,
+        test_size=0.2,
+        random_state=42,
+        stratify=y
+    )
 
-df = pd.read_csv("data/sample_data.csv")
-
-print("\nClass distribution:")
-print(df["label"].value_counts())
-
-# ---------------- Clean text ----------------
-df["text"] = df["text"].astype(str).apply(normalize_text)
-
-# ---------------- Encode labels ----------------
-encoder = LabelEncoder()
-df["label_encoded"] = encoder.fit_transform(df["label"])
-
-# Save encoder for inference
-joblib.dump(encoder, "label_encoder.joblib")
-
-X = df["text"]
-y = df["label_encoded"]
-
-# ---------------- Train-test split ----------------
-X_train, X_test, y_train, y_test = train_test_split(
-    X,
-    y,
-    test_size=0.2,
-    random_state=42,
-    stratify=y
-)
-
-# ---------------- Pipeline ----------------
-pipeline = Pipeline([
-    ("tfidf", TfidfVectorizer(
-        ngram_range=(1,2),
-        max_features=15000,
-        min_df=2
-    )),
-    ("clf", LogisticRegression(
-        max_iter=3000,
-        class_weight="balanced",
-        multi_class="auto",
-        n_jobs=-1
+    # ---------------- Pipeline ----------------
+    pipeline = Pipeline([
+        ("tfidf", TfidfVectorizer(
+            ngram_range=(1,2),
+            max_features=15000,
+            min_df=2
+        )),
+        ("clf", LogisticRegression(
+            max_iter=3000,
+            class_weight="balanced",
+            multi_class="auto",
+            n_jobs=-1
+        ))
+    ])
+
+    # ---------------- Train ----------------
+    pipeline.fit(X_train, y_train)
+
+    # ---------------- Evaluate ----------------
+    y_pred = pipeline.predict(X_test)
+
+    print("\nClassification Report:")
+    print(classification_report(
+        y_test,
+        y_pred,
+        target_names=encoder.classes_
     ))
-])
 
-# ---------------- Train ----------------
-pipeline.fit(X_train, y_train)
+    print("\nConfusion Matrix:")
+    print(confusion_matrix(y_test, y_pred))
+
+    accuracy = pipeline.score(X_test, y_test)
+    print(f"\nModel accuracy: {accuracy * 100:.2f}%")
+
+    # ---------------- Save model ----------------
+    joblib.dump(pipeline, MODEL_PATH)
+    print(f"\nModel saved as '{MODEL_PATH}'")
+    print(f"Label encoder saved as '{ENCODER_PATH}'")
+
+    return pipeline, encoder
+
+
+def export(pipeline, encoder):
+    """
+    Writes vocabulary, IDF weights and LR coefficients for the
+    numpy-only inference engine (utils/linear_model.py).
+    """
+    class_names = encoder.inverse_transform(pipeline.classes_)
+    export_pipeline(pipeline, class_names, LINEAR_EXPORT_DIR)
+    print(f"Linear model exported to '{LINEAR_EXPORT_DIR}/'")
+
+
+# =====================================================
+# OUT-OF-CORE TRAINING WITH CACHED FEATURES
+# =====================================================
+#
+# .train_cache/<key>/
+#   clean.txt                 normalized text, one document per line
+#   labels.txt                raw labels, same order
+#   counts-<n>-<m>.npz        term counts for ngram_range (n, m), min_df applied
+#   vocab-<n>-<m>.txt         feature names, column order of the counts
+#
+# <key> hashes the data file, utils/preprocessing.py and CACHE_FORMAT, so
+# editing either invalidates the cache. Count matrices are computed once
+# per n-gram range; max_features only selects the most frequent columns
+# (what CountVectorizer does itself) and TF-IDF is recomputed from
+# counts, so every grid point reuses the same matrices. During the search
+# columns are selected and weighted on the training split only, so the
+# test split never influences the features it is scored on.
+
+def cache_key(data_path: str) -> str:
+    digest = hashlib.sha256(f"format={CACHE_FORMAT}".encode())
+
+    preprocessing = os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "preprocessing.py")
+    for path in (data_path, preprocessing):
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+
+    return digest.hexdigest()[:16]
+
+
+def _normalize_chunk(rows: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    return [(normalize_text(text), label) for text, label in rows]
+
+
+def _read_chunks(data_path: str, chunk_size: int):
+    with open(data_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        while True:
+            chunk = [(row["text"], row["label"]) for row in itertools.islice(reader, chunk_size)]
+            if not chunk:
+                return
+            yield chunk
+
+
+def cache_clean_text(data_path: str, cache_dir: str, chunk_size: int, jobs: int):
+    """
+    Streams the CSV in chunks, normalizes them in parallel and writes
+    clean.txt / labels.txt. Skipped when the cache already has them.
+    """
+    clean_path = os.path.join(cache_dir, "clean.txt")
+    labels_path = os.path.join(cache_dir, "labels.txt")
+
+    if os.path.exists(clean_path) and os.path.exists(labels_path):
+        print("♻️  Normalized text: cached")
+        return
+
+    from multiprocessing import Pool
+
+    os.makedirs(cache_dir, exist_ok=True)
+    start = time.perf_counter()
+    rows = 0
+
+    with open(clean_path + ".tmp", "w", encoding="utf-8") as clean_f, \
+         open(labels_path + ".tmp", "w", encoding="utf-8") as labels_f, \
+         Pool(jobs) as pool:
+
+        for chunk in pool.imap(_normalize_chunk, _read_chunks(data_path, chunk_size)):
+            for text, label in chunk:
+                clean_f.write(text + "\n")
+                labels_f.write(label + "\n")
+            rows += len(chunk)
+
+    os.replace(clean_path + ".tmp", clean_path)
+    os.replace(labels_path + ".tmp", labels_path)
+    print(f"✅ Normalized {rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+
+def iter_clean_text(cache_dir: str):
+    with open(os.path.join(cache_dir, "clean.txt"), encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+def read_labels(cache_dir: str) -> list[str]:
+    with open(os.path.join(cache_dir, "labels.txt"), encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def cache_counts(cache_dir: str, ngram_range: tuple, min_df: int) -> tuple[str, str]:
+    """
+    Term-count matrix for one n-gram range, built from the streamed
+    clean text. Returns (counts_path, vocab_path).
+    """
+    from scipy import sparse
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    name = f"{ngram_range[0]}-{ngram_range[1]}"
+    counts_path = os.path.join(cache_dir, f"counts-{name}-df{min_df}.npz")
+    vocab_path = os.path.join(cache_dir, f"vocab-{name}-df{min_df}.txt")
+
+    if os.path.exists(counts_path) and os.path.exists(vocab_path):
+        print(f"♻️  Counts {name}: cached")
+        return counts_path, vocab_path
+
+    start = time.perf_counter()
+    vectorizer = CountVectorizer(ngram_range=ngram_range, min_df=min_df, dtype="int32")
+    counts = vectorizer.fit_transform(iter_clean_text(cache_dir))
+
+    sparse.save_npz(counts_path, counts.tocsr())
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(vectorizer.get_feature_names_out()))
+
+    print(
+        f"✅ Counts {name}: {counts.shape[0]:,} x {counts.shape[1]:,} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return counts_path, vocab_path
+
+
+def top_features(counts, max_features: int, rows=None, min_df: int = 1):
+    """
+    Column indices CountVectorizer(min_df=..., max_features=...) would
+    keep when fit on `rows` (default all): the most frequent terms, in
+    vocabulary order.
+    """
+    import numpy as np
+
+    if rows is not None:
+        counts = counts[rows]
+
+    columns = np.arange(counts.shape[1])
+    if min_df > 1:
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        columns = columns[df >= min_df]
+
+    if len(columns) <= max_features:
+        return columns
+
+    tfs = np.asarray(counts[:, columns].sum(axis=0)).ravel()
+    return np.sort(columns[(-tfs).argsort()[:max_features]])
+
+
+def tfidf_from_counts(counts, train_rows):
+    """
+    TfidfVectorizer(norm="l2", smooth_idf=True) weights, with IDF taken
+    from `train_rows` only. Returns (matrix, idf).
+    """
+    import numpy as np
+    from sklearn.preprocessing import normalize
+
+    n = len(train_rows)
+    df = np.bincount(counts[train_rows].indices, minlength=counts.shape[1])
+    idf = np.log((1 + n) / (1 + df)) + 1
+
+    return normalize(counts.multiply(idf).tocsr()), idf
+
+
+def _evaluate(counts, columns, ngram_range: tuple, max_features: int, C: float,
+              y, train_rows, test_rows) -> dict:
+    """
+    One grid point, run in a worker process. `counts` arrives memory-mapped
+    (joblib), so workers share one copy of the matrix.
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import f1_score
+
+    start = time.perf_counter()
+    counts = counts[:, columns]
+
+    X, _ = tfidf_from_counts(counts, train_rows)
+
+    clf = LogisticRegression(max_iter=3000, class_weight="balanced", C=C)
+    clf.fit(X[train_rows], y[train_rows])
+    y_pred = clf.predict(X[test_rows])
+
+    return {
+        "ngram_range": ngram_range,
+        "max_features": max_features,
+        "C": C,
+        "macro_f1": round(float(f1_score(y[test_rows], y_pred, average="macro")), 4),
+        "accuracy": round(float((y_pred == y[test_rows]).mean()), 4),
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+
+def search(data_path: str, ngram_ranges: list[tuple], max_features: list[int],
+           Cs: list[float], min_df: int, chunk_size: int, jobs: int):
+    """
+    Cached-feature grid search; trains and returns the best
+    (pipeline, encoder) on all rows.
+    """
+    import numpy as np
+    from joblib import Parallel, delayed
+    from scipy import sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import LabelEncoder
+
+    cache_dir = os.path.join(CACHE_DIR, cache_key(data_path))
+    print(f"Feature cache: {cache_dir}")
+
+    cache_clean_text(data_path, cache_dir, chunk_size, max(1, os.cpu_count() if jobs < 0 else jobs))
+    cached = {ngram: cache_counts(cache_dir, ngram, min_df) for ngram in ngram_ranges}
+
+    encoder = LabelEncoder()
+    y = encoder.fit_transform(read_labels(cache_dir))
+
+    rows = np.arange(len(y))
+    train_rows, test_rows = train_test_split(rows, test_size=0.2, random_state=42, stratify=y)
+
+    # ---------------- Parallel grid ----------------
+    grid = list(itertools.product(ngram_ranges, max_features, Cs))
+    print(f"\nSearching {len(grid)} configurations on {jobs} jobs...")
+
+    # Loaded once here; joblib memory-maps them into the workers
+    counts = {ngram: sparse.load_npz(counts_path) for ngram, (counts_path, _) in cached.items()}
+    columns = {
+        (ngram, k): top_features(counts[ngram], k, train_rows, min_df)
+        for ngram in ngram_ranges for k in max_features
+    }
+
+    results = Parallel(n_jobs=jobs)(
+        delayed(_evaluate)(counts[ngram], columns[ngram, k], ngram, k, C, y, train_rows, test_rows)
+        for ngram, k, C in grid
+    )
+    results.sort(key=lambda r: r["macro_f1"], reverse=True)
+
+    print(f"\n{'ngram':<7} {'max_feat':>9} {'C':>6} {'macro F1':>9} {'acc':>7} {'sec':>6}")
+    for r in results:
+        print(
+            f"{r['ngram_range'][0]}-{r['ngram_range'][1]:<5} {r['max_features']:>9,} "
+            f"{r['C']:>6g} {r['macro_f1']:>9.4f} {r['accuracy']:>7.4f} {r['seconds']:>6.1f}"
+        )
+
+    best = results[0]
+    print(f"\nBest: {best}")
+
+    # ---------------- Final fit on all rows ----------------
+    with open(cached[best["ngram_range"]][1], encoding="utf-8") as f:
+        terms = f.read().split("\n")
+
+    counts = counts[best["ngram_range"]]
+    columns = top_features(counts, best["max_features"])
+    counts = counts[:, columns]
+
+    X, idf = tfidf_from_counts(counts, rows)
+
+    clf = LogisticRegression(max_iter=3000, class_weight="balanced", C=best["C"])
+    clf.fit(X, y)
+
+    # Fixed vocabulary: fit only computes IDF, in one streamed pass
+    tfidf = TfidfVectorizer(
+        ngram_range=best["ngram_range"],
+        vocabulary={terms[c]: i for i, c in enumerate(columns)}
+    )
+    tfidf.fit(iter_clean_text(cache_dir))
+
+    if not np.allclose(tfidf.idf_, idf):
+        raise RuntimeError("IDF from cached counts does not match TfidfVectorizer")
+
+    pipeline = Pipeline([("tfidf", tfidf), ("clf", clf)])
+
+    joblib.dump(pipeline, MODEL_PATH)
+    joblib.dump(encoder, ENCODER_PATH)
+    print(f"\nModel saved as '{MODEL_PATH}'")
+    print(f"Label encoder saved as '{ENCODER_PATH}'")
+
+    return pipeline, encoder
+
+
+def _parse_list(value: str, cast) -> list:
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def _parse_ngram(value: str) -> tuple:
+    low, high = value.split("-")
+    return int(low), int(high)
+
+
+def publish(version: str):
+    """
+    Copies the saved artifacts to models/<version>. They are staged in a
+    hidden directory and renamed into place, so the registry never sees
+    a half-written version.
+    """
+    target = os.path.join(MODELS_DIR, version)
+    if os.path.exists(target):
+        raise SystemExit(f"❌ Model version '{version}' already exists")
+
+    staging = os.path.join(MODELS_DIR, f".staging-{version}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    shutil.copy2(MODEL_PATH, staging)
+    shutil.copy2(ENCODER_PATH, staging)
+    shutil.copytree(LINEAR_EXPORT_DIR, os.path.join(staging, LINEAR_EXPORT_DIR))
+
+    os.rename(staging, target)
+    print(f"Published model version '{version}' to '{target}/'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the ToxiGuard ML model")
+    parser.add_argument(
+        "--export-only",
+        action="store_true",
+        help=f"Skip training, export the existing {MODEL_PATH}"
+    )
+    parser.add_argument(
+        "--version",
+        help=f"Publish the result as {MODELS_DIR}/<version> for hot reload"
+    )
+
+    # ---------------- Out-of-core search mode ----------------
+    parser.add_argument("--search", action="store_true", help="Cached-feature grid search, then train the best")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--ngrams", default="1-1,1-2", help="n-gram ranges, e.g. 1-1,1-2,1-3")
+    parser.add_argument("--max-features", default="5000,15000,50000")
+    parser.add_argument("--C", default="0.5,1,4")
+    parser.add_argument("--min-df", type=int, default=2)
+    parser.add_argument("--chunk-size", type=int, default=50000, help="CSV rows per normalization chunk")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel workers (-1 = all cores)")
+    args = parser.parse_args()
 
-# ---------------- Evaluate ----------------
-y_pred = pipeline.predict(X_test)
+    if args.export_only:
+        pipeline = joblib.load(MODEL_PATH)
+        encoder = joblib.load(ENCODER_PATH)
+    elif args.search:
+        pipeline, encoder = search(
+            args.data,
+            _parse_list(args.ngrams, _parse_ngram),
+            _parse_list(args.max_features, int),
+            _parse_list(args.C, float),
+            args.min_df,
+            args.chunk_size,
+            args.jobs
+        )
+    else:
+        pipeline, encoder = train()
 
-print("\nClassification Report:")
-print(classification_report(
-    y_test,
-    y_pred,
-    target_names=encoder.classes_
-))
+    export(pipeline, encoder)
 
-print("\nConfusion Matrix:")
-print(confusion_matrix(y_test, y_pred))
+    if args.version:
+        publish(args.version)
 
-accuracy = pipeline.score(X_test, y_test)
-print(f"\nModel accuracy: {accuracy * 100:.2f}%")
 
-# ---------------- Save model ----------------
-joblib.dump(pipeline, "abuse_model.joblib")
-print("\nModel saved as 'abuse_model.joblib'")
-print("Label encoder saved as 'label_encoder.joblib'")
+if __name__ == "__main__":
+    main()
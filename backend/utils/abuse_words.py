@@ -1,5 +1,5 @@
 # abuse_words.py
-import re
+from utils.engines import engine
 
 abusive_words = {
 
@@ -92,23 +92,125 @@ suggestions = {
 }
 
 
+# =====================================================
+# MULTI-PATTERN MATCHER (AHO-CORASICK)
+# =====================================================
+
+def _is_word_char(ch: str) -> bool:
+    # Same definition of a word character as the `\b` regex anchor
+    return ch.isalnum() or ch == "_"
+
+
+class AbuseMatcher:
+    """
+    Aho-Corasick automaton over the abusive lexicon.
+
+    Finds every word and phrase in a single pass over the text.
+    Single tokens only count when they sit on regex word boundaries,
+    phrases (entries containing a space) match as plain substrings.
+    """
+
+    def __init__(self, words):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._bounded = {}
+
+        for word in set(words):
+            if not word:
+                continue
+            self._bounded[word] = " " not in word
+            self._add(word)
+
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self._bounded)
+
+    def _add(self, word: str):
+        state = 0
+        for ch in word:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(word)
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+
+                # Inherit matches ending at the failure state
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """
+        Yield (start, end, word) for every lexicon hit in `text`.
+        `text` is expected to be lowercased already.
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        bounded = self._bounded
+        n = len(text)
+        state = 0
+
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            if not out[state]:
+                continue
+
+            end = i + 1
+            for word in out[state]:
+                start = end - len(word)
+
+                if bounded[word]:
+                    before = start > 0 and _is_word_char(text[start - 1])
+                    after = end < n and _is_word_char(text[end])
+                    if before == _is_word_char(word[0]):
+                        continue
+                    if after == _is_word_char(word[-1]):
+                        continue
+
+                yield start, end, word
+
+    def find(self, text: str) -> list[str]:
+        """
+        Sorted unique lexicon entries present in `text`.
+        """
+        return sorted({word for _, _, word in self.iter_matches(text.lower())})
+
+
+@engine("rules")
+def get_matcher() -> AbuseMatcher:
+    """
+    Lexicon compiled once, on first use or during warm-up.
+    """
+    return AbuseMatcher(abusive_words)
+
+
 def detect_abusive_tokens(text: str):
     """
     Detect abusive words & phrases (normal + obfuscated + Hinglish)
     """
-    text_lower = text.lower()
-    found = set()
-
-    for word in abusive_words:
-
-        # If phrase contains space → direct match
-        if " " in word:
-            if word in text_lower:
-                found.add(word)
-        else:
-            # Word boundary for single tokens
-            pattern = r"\b" + re.escape(word) + r"\b"
-            if re.search(pattern, text_lower):
-                found.add(word)
-
-    return sorted(found)
+    return get_matcher().find(text)
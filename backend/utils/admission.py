@@ -0,0 +1,292 @@
+import asyncio
+import heapq
+import math
+import time
+from itertools import count
+from threading import Condition, Event, Lock, Thread
+
+from utils import metrics
+
+# =====================================================
+# PRIORITIES
+# =====================================================
+#
+# interactive → a user waiting on /predict or the live editor
+# batch       → /predict/batch callers
+# backfill    → /predict/stream, score_corpus.py and other rescans
+
+PRIORITIES = {"interactive": 0, "batch": 1, "backfill": 2}
+
+
+# =====================================================
+# LLM ADMISSION (PRIORITY QUEUE IN FRONT OF THE BUCKET)
+# =====================================================
+#
+# Callers that find no free rate-limit slot wait in one heap ordered by
+# (priority, arrival). A dispatcher thread hands each new token to the
+# best waiter, so backfill never takes a slot an interactive caller is
+# waiting for. Lower priorities may only use part of the queue
+# (`shares`): under load they are shed at once and fall back to a
+# rules + ML verdict, instead of queueing ahead of users.
+#
+# Threads (sync LLM path) wait on an Event and asyncio callers on a
+# Future, so the async path still holds no thread while it waits.
+
+class _Waiter:
+    __slots__ = ("priority", "enqueued", "event", "future", "loop", "done")
+
+    def __init__(self, priority: str, loop=None):
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else Event()
+        self.done = False   # granted or given up; guarded by the gate lock
+
+
+class PriorityGate:
+
+    def __init__(self, bucket, max_queue: int = 20, max_wait: float = 5.0,
+                 shares: dict | None = None):
+        self.bucket = bucket
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.shares = shares or {"interactive": 1.0, "batch": 0.5, "backfill": 0.25}
+
+        self._heap = []                    # (rank, seq, waiter)
+        self._seq = count()
+        self._cond = Condition(Lock())
+        self._waiting = {p: 0 for p in PRIORITIES}
+        self._dispatcher = None
+
+        self.admitted = {p: 0 for p in PRIORITIES}
+        self.queued = {p: 0 for p in PRIORITIES}
+        self.shed = {p: 0 for p in PRIORITIES}
+
+    # ---------------- Queue bookkeeping ----------------
+
+    def depth(self, priority: str | None = None) -> int:
+        if priority is not None:
+            return self._waiting[priority]
+        return sum(self._waiting.values())
+
+    def _capacity(self, priority: str) -> int:
+        return int(self.max_queue * self.shares.get(priority, 1.0))
+
+    def _enter(self, priority: str, loop=None):
+        """
+        "ok" when a slot is free and nobody is waiting, None when the
+        caller is shed, else its queued _Waiter.
+        """
+        if priority not in PRIORITIES:
+            priority = "interactive"
+
+        with self._cond:
+            if not self._heap and self.bucket.try_acquire():
+                self.admitted[priority] += 1
+                metrics.llm_admission_total.inc(priority=priority, result="admitted")
+                return "ok"
+
+            # No refill (LLM_RPM=0): waiting could never succeed
+            if self.depth() >= self._capacity(priority) or self.bucket.rate <= 0:
+                self.shed[priority] += 1
+                metrics.llm_admission_total.inc(priority=priority, result="shed")
+                return None
+
+            waiter = _Waiter(priority, loop)
+            heapq.heappush(self._heap, (PRIORITIES[priority], next(self._seq), waiter))
+            self._waiting[priority] += 1
+            self.queued[priority] += 1
+            metrics.llm_admission_total.inc(priority=priority, result="queued")
+
+            self._ensure_dispatcher()
+            self._cond.notify()
+            return waiter
+
+    def _leave(self, waiter: _Waiter, granted: bool) -> bool:
+        """
+        Settles a waiter that stopped waiting. Returns True if it got a
+        slot after all (granted while timing out).
+        """
+        with self._cond:
+            if not waiter.done:
+                waiter.done = True
+                self._waiting[waiter.priority] -= 1
+                if not granted:
+                    self.shed[waiter.priority] += 1
+                    metrics.llm_admission_total.inc(priority=waiter.priority, result="timeout")
+                return granted
+            return True
+
+    # ---------------- Dispatcher ----------------
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None:
+            self._dispatcher = Thread(
+                target=self._dispatch, name="toxiguard-llm-gate", daemon=True
+            )
+            self._dispatcher.start()
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                # Drop waiters that already gave up
+                while self._heap and self._heap[0][2].done:
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                if not self.bucket.try_acquire():
+                    # Waiters give up after max_wait anyway; never sleep longer
+                    # (and never wait(inf), which raises OverflowError)
+                    delay = min(self.bucket.next_token_in(), max(self.max_wait, 0.01))
+                    self._cond.wait(timeout=max(0.001, delay))
+                    continue
+
+                waiter = heapq.heappop(self._heap)[2]
+                waiter.done = True
+                self._waiting[waiter.priority] -= 1
+
+                metrics.llm_queue_wait_seconds.observe(
+                    time.monotonic() - waiter.enqueued, priority=waiter.priority
+                )
+
+                if waiter.loop is not None:
+                    waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+                else:
+                    waiter.event.set()
+
+    # ---------------- Acquire ----------------
+
+    def acquire(self, priority: str = "interactive", max_wait: float | None = None) -> str:
+        """
+        Blocking. Returns "ok", "queued" (got a slot after waiting) or "shed".
+        """
+        waiter = self._enter(priority)
+        if waiter is None:
+            return "shed"
+        if waiter == "ok":
+            return "ok"
+
+        timeout = self.max_wait if max_wait is None else max_wait
+        granted = waiter.event.wait(timeout)
+        return "queued" if self._leave(waiter, granted) else "shed"
+
+    async def acquire_async(self, priority: str = "interactive",
+                            max_wait: float | None = None) -> str:
+        """
+        Async twin of acquire(); waits on a Future, not a thread.
+        """
+        waiter = self._enter(priority, asyncio.get_running_loop())
+        if waiter is None:
+            return "shed"
+        if waiter == "ok":
+            return "ok"
+
+        timeout = self.max_wait if max_wait is None else max_wait
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            granted = True
+        except asyncio.TimeoutError:
+            granted = False
+        except asyncio.CancelledError:
+            self._leave(waiter, False)
+            raise
+
+        return "queued" if self._leave(waiter, granted) else "shed"
+
+    def try_acquire(self) -> bool:
+        """
+        A slot for an optional extra call (hedge / fallback), only when
+        one is free and nobody is queued for it.
+        """
+        with self._cond:
+            return not self._heap and self.bucket.try_acquire()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_queue": self.max_queue,
+                "max_wait": self.max_wait,
+                "queue_depth": dict(self._waiting),
+                "admitted": dict(self.admitted),
+                "queued": dict(self.queued),
+                "shed": dict(self.shed)
+            }
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# =====================================================
+# LOCAL STAGE ADMISSION (429 WHEN SATURATED)
+# =====================================================
+#
+# Work in the local stages (preprocess, rules, ML, sentiment) is counted
+# while it runs, never while a request waits for the LLM. Past its share
+# of `max_in_flight` a priority is turned away with 429 + Retry-After
+# instead of queueing on the CPU pool.
+
+class LocalLoad:
+
+    def __init__(self, max_in_flight: int, workers: int, shares: dict | None = None):
+        self.max_in_flight = max_in_flight
+        self.workers = max(1, workers)
+        self.shares = shares or {"interactive": 1.0, "batch": 0.75, "backfill": 0.5}
+
+        self.in_flight = 0
+        self._avg_seconds = 0.01     # moving average of one request's local work
+        self._lock = Lock()
+
+        self.rejected = {p: 0 for p in PRIORITIES}
+
+    def _saturated(self, priority: str) -> bool:
+        limit = self.max_in_flight * self.shares.get(priority, 1.0)
+        if self.max_in_flight and self.in_flight >= limit:
+            self.rejected[priority] = self.rejected.get(priority, 0) + 1
+            return True
+        return False
+
+    def admits(self, priority: str) -> bool:
+        """
+        Whether `priority` would be let in now, without entering.
+        """
+        with self._lock:
+            return not self._saturated(priority)
+
+    def enter(self, priority: str, force: bool = False) -> bool:
+        """
+        Counts one unit of local work in. `force` counts it even when
+        saturated (work already accepted, e.g. the rest of a stream).
+        """
+        with self._lock:
+            if not force and self._saturated(priority):
+                return False
+
+            self.in_flight += 1
+            return True
+
+    def leave(self, seconds: float):
+        with self._lock:
+            self.in_flight -= 1
+            self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * seconds
+
+    def retry_after(self) -> int:
+        """
+        Seconds until the local work in flight should have drained.
+        """
+        with self._lock:
+            return max(1, math.ceil(self.in_flight * self._avg_seconds / self.workers))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "avg_ms": round(self._avg_seconds * 1000, 2),
+                "rejected": dict(self.rejected)
+            }
@@ -0,0 +1,112 @@
+import os
+from collections import Counter
+from threading import Lock
+
+# =====================================================
+# CASCADE POLICY CONFIG
+# =====================================================
+#
+# Decides whether the LLM is worth calling once the cheap stages
+# (rules + ML) have run. Tiers are checked in this order:
+#
+#   no_ml       → ML unavailable, always escalate
+#   uncertain   → ML risk inside the escalate band, always escalate
+#   agree_toxic → rules fired and ML risk >= CASCADE_TOXIC_MIN, skip LLM
+#   agree_clean → rules silent and ML risk <= CASCADE_CLEAN_MAX, skip LLM
+#   disagree    → anything else, escalate
+#
+# CASCADE_MODE:
+#   off        → LLM always runs (default)
+#   skip       → skipped tiers never call the LLM
+#   background → skipped tiers call the LLM after responding, only to
+#                warm the verdict cache with an explanation
+
+CASCADE_MODE = os.getenv("CASCADE_MODE", "off").lower()
+
+CASCADE_TOXIC_MIN = float(os.getenv("CASCADE_TOXIC_MIN", "0.5"))
+CASCADE_CLEAN_MAX = float(os.getenv("CASCADE_CLEAN_MAX", "0.15"))
+CASCADE_ESCALATE_LOW = float(os.getenv("CASCADE_ESCALATE_LOW", "0.35"))
+CASCADE_ESCALATE_HIGH = float(os.getenv("CASCADE_ESCALATE_HIGH", "0.65"))
+
+SKIP_TIERS = {"agree_toxic", "agree_clean"}
+
+_counts = Counter()
+_lock = Lock()
+
+
+def enabled() -> bool:
+    return CASCADE_MODE in ("skip", "background")
+
+
+# =====================================================
+# DECISION
+# =====================================================
+
+def ml_risk(ml_result: dict | None, toxic_probability: float) -> float:
+    """
+    Probability that the text is not clean.
+    Uses 1 - P(positive) when the model has a positive class,
+    so "abusive" predictions count as risky too.
+    """
+    probs = (ml_result or {}).get("all_probabilities", {})
+    if "positive" in probs:
+        return 1.0 - probs["positive"]
+    return toxic_probability
+
+
+def classify(rules_result: dict, ml_result: dict | None,
+             toxic_probability: float) -> str:
+    if ml_result is None:
+        return "no_ml"
+
+    risk = ml_risk(ml_result, toxic_probability)
+
+    if CASCADE_ESCALATE_LOW <= risk <= CASCADE_ESCALATE_HIGH:
+        return "uncertain"
+    if rules_result["triggered"] and risk >= CASCADE_TOXIC_MIN:
+        return "agree_toxic"
+    if not rules_result["triggered"] and risk <= CASCADE_CLEAN_MAX:
+        return "agree_clean"
+    return "disagree"
+
+
+def decide(rules_result: dict, ml_result: dict | None,
+           toxic_probability: float) -> dict:
+    """
+    Returns {"tier": str, "llm": "escalated" | "skipped" | "background"}
+    and updates the per-tier counters.
+    """
+    tier = classify(rules_result, ml_result, toxic_probability)
+
+    if tier not in SKIP_TIERS:
+        action = "escalated"
+    elif CASCADE_MODE == "background":
+        action = "background"
+    else:
+        action = "skipped"
+
+    with _lock:
+        _counts[tier] += 1
+        _counts[action] += 1
+
+    return {"tier": tier, "llm": action}
+
+
+def stats() -> dict:
+    with _lock:
+        counts = dict(_counts)
+
+    total = sum(counts.get(a, 0) for a in ("escalated", "skipped", "background"))
+    avoided = counts.get("skipped", 0)
+
+    return {
+        "mode": CASCADE_MODE,
+        "tiers": {
+            tier: counts.get(tier, 0)
+            for tier in ("no_ml", "uncertain", "agree_toxic", "agree_clean", "disagree")
+        },
+        "escalated": counts.get("escalated", 0),
+        "background": counts.get("background", 0),
+        "llm_avoided": avoided,
+        "llm_avoided_ratio": round(avoided / total, 3) if total else 0.0
+    }
@@ -0,0 +1,92 @@
+import copy
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+
+# =====================================================
+# DEFERRED LLM VERDICTS (POLL BY JOB ID)
+# =====================================================
+
+class DeferredJobs:
+    """
+    Background LLM verdicts of /predict/batch llm="defer", kept so the
+    caller can fetch them by job id.
+
+    Size-bounded (oldest jobs dropped first); each job lives `ttl`
+    seconds from creation. Shed / error fallbacks are kept too, so a
+    poller learns that no real verdict is coming.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._jobs = OrderedDict()   # job_id -> (expires_at, result | None)
+        self._lock = Lock()
+
+        self.created = 0
+        self.finished = 0
+        self.evictions = 0
+
+    def create(self) -> str:
+        job_id = uuid.uuid4().hex
+
+        with self._lock:
+            self._purge(time.time())
+            self._jobs[job_id] = (time.time() + self.ttl, None)
+            self.created += 1
+
+            while len(self._jobs) > self.max_size:
+                self._jobs.popitem(last=False)
+                self.evictions += 1
+
+        return job_id
+
+    def finish(self, job_id: str, result: dict):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return   # expired or evicted while the LLM worked
+
+            self._jobs[job_id] = (entry[0], copy.deepcopy(result))
+            self.finished += 1
+
+    def get(self, job_id: str) -> dict | None:
+        """
+        {"job", "status": pending | done, "llm"} or None when unknown
+        or expired.
+        """
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or entry[0] < time.time():
+                return None
+
+            result = copy.deepcopy(entry[1])
+
+        return {
+            "job": job_id,
+            "status": "pending" if result is None else "done",
+            "llm": result
+        }
+
+    def _purge(self, now: float):
+        # Jobs are created in expiry order: expired ones are at the front
+        while self._jobs:
+            job_id, (expires_at, _) = next(iter(self._jobs.items()))
+            if expires_at >= now:
+                break
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(1 for _, result in self._jobs.values() if result is None)
+            return {
+                "size": len(self._jobs),
+                "max_size": self.max_size,
+                "pending": pending,
+                "created": self.created,
+                "finished": self.finished,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,140 @@
+import time
+from threading import Lock, Thread
+
+
+# =====================================================
+# LAZY ENGINE REGISTRY
+# =====================================================
+#
+# Each pipeline engine (rules, ML, sentiment, LLM) is a zero-argument
+# loader wrapped with @engine("name"). The wrapped function loads once on
+# first call (thread-safe), records how long it took, and then returns
+# the cached value. warm_all() preloads them in the background and
+# readiness() reports their state for /ready.
+
+_registry = {}
+
+
+class EngineUnavailable(Exception):
+    """
+    Raised by a loader when its engine is intentionally off
+    (e.g. no API key). The engine is reported as "disabled".
+    """
+
+
+class Engine:
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self.loader = loader
+
+        self.state = "cold"      # cold | warming | warm | disabled | failed
+        self.value = None
+        self.error = None
+        self.load_ms = None
+
+        self._lock = Lock()
+
+    def get(self):
+        """
+        Loaded value, or None when the engine is disabled or failed.
+        """
+        if self.state in ("warm", "disabled", "failed"):
+            return self.value
+
+        with self._lock:
+            if self.state == "cold":
+                self._load()
+
+        return self.value
+
+    def _load(self):
+        self.state = "warming"
+        start = time.perf_counter()
+
+        try:
+            self.value = self.loader()
+            self.state = "warm"
+        except EngineUnavailable as e:
+            self.state = "disabled"
+            self.error = str(e)
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+
+        self.load_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        if self.state == "warm":
+            print(f"✅ {self.name} engine ready in {self.load_ms} ms")
+        else:
+            print(f"⚠️ {self.name} engine {self.state}: {self.error}")
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "load_ms": self.load_ms,
+            "error": self.error
+        }
+
+
+def engine(name: str):
+    """
+    Decorator turning a loader into a lazy, cached getter.
+    The Engine object stays reachable as `getter.engine`.
+    """
+    def wrap(loader):
+        eng = Engine(name, loader)
+        _registry[name] = eng
+
+        def getter():
+            return eng.get()
+
+        getter.engine = eng
+        getter.__name__ = loader.__name__
+        getter.__doc__ = loader.__doc__
+        return getter
+
+    return wrap
+
+
+def get_engine(name: str) -> Engine:
+    return _registry[name]
+
+
+# =====================================================
+# WARM-UP + READINESS
+# =====================================================
+
+def warm_all(names: list[str] | None = None):
+    for name in names or list(_registry):
+        _registry[name].get()
+
+
+def warm_in_background(names: list[str] | None = None) -> Thread:
+    thread = Thread(
+        target=warm_all,
+        args=(names,),
+        name="toxiguard-warmup",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def readiness(required: list[str]) -> dict:
+    engines = {name: eng.status() for name, eng in _registry.items()}
+
+    ready = all(
+        engines.get(name, {}).get("state") == "warm"
+        for name in required
+    )
+    degraded = [
+        name for name, status in engines.items()
+        if status["state"] in ("disabled", "failed")
+    ]
+
+    return {
+        "ready": ready,
+        "degraded": degraded,
+        "engines": engines
+    }
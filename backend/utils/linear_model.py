@@ -0,0 +1,160 @@
+import json
+import os
+import re
+
+import numpy as np
+
+
+# =====================================================
+# NUMPY-ONLY TF-IDF + LINEAR MODEL INFERENCE
+# =====================================================
+#
+# Reads the export written by `python train_model.py --export-only`:
+#
+#   meta.json      classes, n-gram range, token pattern, link function
+#   vocab.txt      one term per line, line number = feature index
+#   idf.npy        (n_features,)            IDF weights
+#   coef.npy       (n_features, n_classes)  LR coefficients, transposed
+#   intercept.npy  (n_classes,)
+#
+# The .npy files are memory-mapped, so worker processes share the pages.
+
+EXPORT_FORMAT_VERSION = 1
+
+
+class LinearTextModel:
+    """
+    Drop-in for the sklearn TfidfVectorizer + LogisticRegression pipeline.
+    Only predict_proba is provided.
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if meta.get("format_version") != EXPORT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported linear export format in {path}")
+
+        with open(os.path.join(path, "vocab.txt"), encoding="utf-8") as f:
+            self.vocabulary = {
+                term: i for i, term in enumerate(f.read().split("\n"))
+            }
+
+        mode = "r" if mmap else None
+        self.idf = np.load(os.path.join(path, "idf.npy"), mmap_mode=mode)
+        self.coef = np.load(os.path.join(path, "coef.npy"), mmap_mode=mode)
+        self.intercept = np.load(os.path.join(path, "intercept.npy"))
+
+        self.classes_ = meta["classes"]
+        self.min_n, self.max_n = meta["ngram_range"]
+        self.lowercase = meta["lowercase"]
+        self.sublinear_tf = meta["sublinear_tf"]
+        self.link = meta["link"]
+        self._token_re = re.compile(meta["token_pattern"])
+
+    # ---------------- Features ----------------
+
+    def _ngrams(self, text: str) -> list[str]:
+        if self.lowercase:
+            text = text.lower()
+
+        tokens = self._token_re.findall(text)
+        grams = list(tokens) if self.min_n == 1 else []
+
+        for n in range(max(2, self.min_n), self.max_n + 1):
+            grams.extend(
+                " ".join(tokens[i:i + n])
+                for i in range(len(tokens) - n + 1)
+            )
+
+        return grams
+
+    def _scores(self, text: str) -> np.ndarray:
+        counts = {}
+        vocab = self.vocabulary
+
+        for gram in self._ngrams(text):
+            idx = vocab.get(gram)
+            if idx is not None:
+                counts[idx] = counts.get(idx, 0) + 1
+
+        if not counts:
+            return np.array(self.intercept, dtype=np.float64)
+
+        idx = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+
+        if self.sublinear_tf:
+            tf = np.log(tf) + 1
+
+        weights = tf * self.idf[idx]
+        weights /= np.sqrt(weights @ weights)
+
+        return weights @ self.coef[idx] + self.intercept
+
+    # ---------------- Prediction ----------------
+
+    def decision_function(self, texts) -> np.ndarray:
+        return np.vstack([self._scores(text) for text in texts])
+
+    def predict_proba(self, texts) -> np.ndarray:
+        scores = self.decision_function(texts)
+
+        if self.link == "sigmoid":
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+
+        if self.link == "ovr":
+            probs = 1.0 / (1.0 + np.exp(-scores))
+            return probs / probs.sum(axis=1, keepdims=True)
+
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+# =====================================================
+# EXPORT (used by train_model.py)
+# =====================================================
+
+def export_pipeline(pipeline, class_names: list[str], out_dir: str):
+    """
+    Dumps a fitted Pipeline([("tfidf", TfidfVectorizer), ("clf", LogisticRegression)])
+    into the format read by LinearTextModel.
+    """
+    tfidf = pipeline.named_steps["tfidf"]
+    clf = pipeline.named_steps["clf"]
+
+    if tfidf.norm != "l2" or not tfidf.use_idf or tfidf.analyzer != "word":
+        raise ValueError("Only word n-gram TF-IDF with l2 norm and idf is supported")
+    if tfidf.strip_accents or tfidf.stop_words or tfidf.preprocessor or tfidf.tokenizer:
+        raise ValueError("Custom preprocessing is not supported by the linear export")
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    terms = sorted(tfidf.vocabulary_, key=tfidf.vocabulary_.get)
+    with open(os.path.join(out_dir, "vocab.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(terms))
+
+    np.save(os.path.join(out_dir, "idf.npy"), tfidf.idf_.astype(np.float64))
+    np.save(os.path.join(out_dir, "coef.npy"), np.ascontiguousarray(clf.coef_.T, dtype=np.float64))
+    np.save(os.path.join(out_dir, "intercept.npy"), clf.intercept_.astype(np.float64))
+
+    if clf.coef_.shape[0] == 1:
+        link = "sigmoid"
+    elif getattr(clf, "multi_class", "auto") == "ovr" or clf.solver == "liblinear":
+        link = "ovr"
+    else:
+        link = "softmax"
+
+    meta = {
+        "format_version": EXPORT_FORMAT_VERSION,
+        "classes": [str(c) for c in class_names],
+        "ngram_range": list(tfidf.ngram_range),
+        "token_pattern": tfidf.token_pattern,
+        "lowercase": bool(tfidf.lowercase),
+        "sublinear_tf": bool(tfidf.sublinear_tf),
+        "link": link
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
@@ -0,0 +1,125 @@
+import re
+from collections import OrderedDict
+
+
+# =====================================================
+# SENTENCE SPLITTING
+# =====================================================
+#
+# Live sessions rescore a document sentence by sentence: typing only
+# changes the sentence under the cursor, so every other sentence is a
+# cache hit. A "sentence" runs up to . ! ? (repeated) or a line break.
+
+_SENTENCE = re.compile(r"[^.!?\n]+[.!?]*")
+
+
+def split_sentences(text: str) -> list[tuple[int, int, str]]:
+    """
+    (start, end, sentence) per non-blank sentence, with character
+    offsets into `text` so the client can highlight spans.
+    """
+    sentences = []
+
+    for match in _SENTENCE.finditer(text):
+        raw = match.group()
+        stripped = raw.strip()
+        if not stripped:
+            continue
+
+        start = match.start() + (len(raw) - len(raw.lstrip()))
+        sentences.append((start, start + len(stripped), stripped))
+
+    return sentences
+
+
+# =====================================================
+# PER-SESSION SENTENCE CACHE
+# =====================================================
+
+class SentenceCache:
+    """
+    Small LRU of sentence → scored entry, one per live session.
+    """
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sentence: str) -> dict | None:
+        entry = self._entries.get(sentence)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(sentence)
+        self.hits += 1
+        return entry
+
+    def put(self, sentence: str, entry: dict):
+        self._entries[sentence] = entry
+        self._entries.move_to_end(sentence)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+# =====================================================
+# AGGREGATION
+# =====================================================
+
+def merge_llm(results: list[dict]) -> dict | None:
+    """
+    One document-level LLM verdict from per-sentence verdicts: the most
+    confident sentence decides, detected phrases are pooled.
+    """
+    if not results:
+        return None
+
+    top = max(results, key=lambda r: r.get("confidence", 0.0))
+
+    phrases = []
+    for result in results:
+        for phrase in result.get("detected_phrases", []):
+            if phrase not in phrases:
+                phrases.append(phrase)
+
+    return {**top, "detected_phrases": phrases}
+
+
+# =====================================================
+# DELTAS
+# =====================================================
+
+def payload_delta(old: dict, new: dict) -> dict:
+    """
+    What changed from `old` to `new` (both /predict-shaped payloads):
+
+        {"changes": {key: value}, "removed": [key],
+         "sentences": {"count": n, "changed": {index: sentence}}}
+
+    Top-level keys are compared whole, except "sentences", which is
+    patched by index so an edit in one sentence sends one entry.
+    """
+    changes = {
+        key: value for key, value in new.items()
+        if key != "sentences" and old.get(key) != value
+    }
+    removed = [key for key in old if key not in new]
+
+    delta = {"changes": changes, "removed": removed}
+
+    old_sentences = old.get("sentences", [])
+    new_sentences = new.get("sentences", [])
+
+    changed = {
+        i: sentence for i, sentence in enumerate(new_sentences)
+        if i >= len(old_sentences) or old_sentences[i] != sentence
+    }
+    if changed or len(old_sentences) != len(new_sentences):
+        delta["sentences"] = {"count": len(new_sentences), "changed": changed}
+
+    return delta
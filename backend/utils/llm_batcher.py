@@ -0,0 +1,76 @@
+import asyncio
+
+
+# =====================================================
+# ASYNC MICRO-BATCHER
+# =====================================================
+
+class MicroBatcher:
+    """
+    Collects concurrent submissions for up to `window_ms` or `max_items`
+    and hands them to `handler` as one list.
+
+    `handler(items)` is a coroutine returning one result per item, in order.
+    Each caller gets back its own result. If the handler raises, every
+    caller in that batch sees the exception.
+    """
+
+    def __init__(self, handler, window_ms: float = 20.0, max_items: int = 8):
+        self.handler = handler
+        self.window = window_ms / 1000.0
+        self.max_items = max(1, max_items)
+
+        self.loop = asyncio.get_running_loop()
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        future = self.loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self.loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = self.loop.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0
+        }
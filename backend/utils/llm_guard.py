@@ -1,10 +1,18 @@
 import os
+import asyncio
 import json
+import math
 import re
 import time
-from threading import Lock
+from collections import deque
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from utils import metrics
+from utils.admission import PRIORITIES, PriorityGate
+from utils.engines import EngineUnavailable, engine
+from utils.llm_batcher import MicroBatcher
+from utils.rate_limiter import TokenBucket
+from utils.verdict_cache import VerdictCache
 
 # =====================================================
 # LOAD ENVIRONMENT
@@ -22,29 +30,111 @@ OPENROUTER_MODEL = os.getenv(
     "arcee-ai/trinity-large-preview:free"
 )
 
-if not OPENROUTER_API_KEY:
-    raise RuntimeError("OPENROUTER_API_KEY not found in environment")
+# Ordered fallback list, primary first (defaults to OPENROUTER_MODEL)
+LLM_MODELS = [
+    m.strip() for m in os.getenv("LLM_MODELS", OPENROUTER_MODEL).split(",")
+    if m.strip()
+]
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))   # seconds per request
 
 # =====================================================
-# OPENROUTER CLIENT
+# OPENROUTER CLIENTS (LAZY)
 # =====================================================
 
-client = OpenAI(
-    api_key=OPENROUTER_API_KEY,
-    base_url="https://openrouter.ai/api/v1",
-    timeout=20.0
-)
+@engine("llm")
+def get_clients():
+    """
+    (sync, async) OpenRouter clients, created on first use.
+    Without an API key the service runs in rules + ML only mode.
+    """
+    if not OPENROUTER_API_KEY:
+        raise EngineUnavailable(
+            "OPENROUTER_API_KEY not set, running without LLM"
+        )
+
+    from openai import AsyncOpenAI, OpenAI
+
+    client = OpenAI(
+        api_key=OPENROUTER_API_KEY,
+        base_url="https://openrouter.ai/api/v1",
+        timeout=LLM_TIMEOUT
+    )
+
+    # Same endpoint for the async /predict pipeline
+    async_client = AsyncOpenAI(
+        api_key=OPENROUTER_API_KEY,
+        base_url="https://openrouter.ai/api/v1",
+        timeout=LLM_TIMEOUT
+    )
+
+    return client, async_client
 
 # =====================================================
 # THROTTLING + CACHE CONFIG
 # =====================================================
 
-LLM_COOLDOWN = 5   # seconds (increase if still rate-limited)
+LLM_RPM = float(os.getenv("LLM_RPM", "12"))            # requests per minute
+LLM_BURST = int(os.getenv("LLM_BURST", "3"))            # back-to-back calls allowed
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "20"))   # callers waiting for a slot
+LLM_MAX_WAIT = float(os.getenv("LLM_MAX_WAIT", "5"))    # seconds a call may wait
+
+# Share of LLM_MAX_QUEUE lower priorities may fill before they are shed
+# (interactive may use all of it)
+LLM_QUEUE_BATCH_SHARE = float(os.getenv("LLM_QUEUE_BATCH_SHARE", "0.5"))
+LLM_QUEUE_BACKFILL_SHARE = float(os.getenv("LLM_QUEUE_BACKFILL_SHARE", "0.25"))
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "10000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))   # seconds
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB")   # optional SQLite path
+LLM_CACHE_DB_SIZE = int(os.getenv("LLM_CACHE_DB_SIZE", "100000"))   # max rows kept on disk
+
+rate_limiter = TokenBucket(rate_per_minute=LLM_RPM, burst=LLM_BURST)
+
+# Callers wait for a slot here, in priority order
+llm_gate = PriorityGate(
+    rate_limiter,
+    max_queue=LLM_MAX_QUEUE,
+    max_wait=LLM_MAX_WAIT,
+    shares={
+        "interactive": 1.0,
+        "batch": LLM_QUEUE_BATCH_SHARE,
+        "backfill": LLM_QUEUE_BACKFILL_SHARE
+    }
+)
+
+verdict_cache = VerdictCache(
+    max_size=LLM_CACHE_SIZE,
+    ttl=LLM_CACHE_TTL,
+    db_path=LLM_CACHE_DB,
+    db_max_size=LLM_CACHE_DB_SIZE
+)
+
+# =====================================================
+# MICRO-BATCHING CONFIG (async path only)
+# =====================================================
+
+LLM_BATCHING = os.getenv("LLM_BATCHING", "0") == "1"
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "25"))
+LLM_BATCH_MAX = int(os.getenv("LLM_BATCH_MAX", "8"))
+LLM_BATCH_MAX_TOKENS = int(os.getenv("LLM_BATCH_MAX_TOKENS", "2800"))
 
-_last_llm_time = 0.0
-_last_prompt = None
-_last_llm_result = None
-_llm_lock = Lock()
+_batcher = None
+
+# =====================================================
+# HEDGING CONFIG (async path only)
+# =====================================================
+#
+# When a model has not answered within LLM_HEDGE_PERCENTILE of its own
+# recent latencies, the next model in LLM_MODELS is called in parallel
+# and the first usable answer wins. 0 disables hedging; later models
+# are then only tried after a failure.
+
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_MS = float(os.getenv("LLM_HEDGE_MIN_MS", "250"))       # never hedge sooner
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # latencies needed first
+
+_latencies = {}   # model -> deque of recent successful call durations (s)
 
 # =====================================================
 # INTERNAL HELPERS
@@ -69,6 +159,23 @@ def _extract_json(text: str) -> dict:
 
     return {}
 
+
+def _fallback_result(status: str, explanation: str) -> dict:
+    return {
+        "toxic": False,
+        "confidence": 0.0,
+        "severity": "low",
+        "category": [],
+        "detected_phrases": [],
+        "explanation": explanation,
+        "status": status
+    }
+
+def _disabled_result() -> dict:
+    return _fallback_result(
+        "disabled", "LLM disabled: OPENROUTER_API_KEY not configured"
+    )
+
 # =====================================================
 # PROMPT (FORCED EXPLANATION)
 # =====================================================
@@ -110,6 +217,28 @@ Rules:
 - Explanation must be meaningful and specific.
 """.strip()
 
+BATCH_PROMPT_SUFFIX = """
+BATCH MODE:
+The user message is a JSON array of items: [{"id": 0, "text": "..."}, ...].
+Judge every item independently, exactly as described above.
+
+Return ONLY valid JSON of this form, with one result per input id:
+
+{
+  "results": [
+    {
+      "id": 0,
+      "toxic": true or false,
+      "confidence": 0.0 to 1.0,
+      "severity": "low" | "medium" | "high",
+      "category": ["category names"],
+      "detected_phrases": ["exact words or phrases"],
+      "explanation": "One or two clear sentences explaining the decision"
+    }
+  ]
+}
+""".strip()
+
 # =====================================================
 # MODEL CAPABILITY CHECK
 # =====================================================
@@ -125,90 +254,465 @@ def _supports_system_role(model: str) -> bool:
     return True
 
 # =====================================================
-# MAIN API (THROTTLED + CACHED)
+# REQUEST / RESPONSE HELPERS
 # =====================================================
 
-def analyze_toxicity_llm(text: str) -> dict:
+def _build_messages(text: str, prompt: str = SYSTEM_PROMPT,
+                    model: str = OPENROUTER_MODEL) -> list[dict]:
+    if _supports_system_role(model):
+        return [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": text}
+        ]
+
+    merged_prompt = f"{prompt}\n\nUSER_TEXT:\n{text}"
+    return [
+        {"role": "user", "content": merged_prompt}
+    ]
+
+
+def _normalize_result(parsed: dict) -> dict | None:
     """
-    Uses LLM to analyze toxicity with explainability.
-    Throttled + cached to prevent rate limits.
+    Maps one parsed LLM verdict onto the result schema.
+    Returns None when nothing usable was parsed.
     """
+    if not parsed or not isinstance(parsed, dict):
+        return None
+
+    # Models sometimes answer "high" or null here: not a usable verdict
+    try:
+        confidence = float(parsed.get("confidence", 0.0))
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(confidence):
+        return None
+
+    explanation = str(parsed.get("explanation", "")).strip()
+    if len(explanation) < 20:
+        explanation = "LLM did not provide a sufficient explanation."
+
+    severity = parsed.get("severity", "low")
+    if severity not in ("low", "medium", "high"):
+        severity = "low"
+
+    return {
+        "toxic": parsed.get("toxic") is True or str(parsed.get("toxic")).lower() == "true",
+        "confidence": min(1.0, max(0.0, confidence)),
+        "severity": severity,
+        "category": _str_list(parsed.get("category")),
+        "detected_phrases": _str_list(parsed.get("detected_phrases")),
+        "explanation": explanation
+    }
+
+
+def _str_list(value) -> list[str]:
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if not isinstance(value, list):
+        return []
+    return [str(v) for v in value if isinstance(v, (str, int, float)) and str(v).strip()]
 
-    global _last_llm_time, _last_prompt, _last_llm_result
 
-    now = time.time()
+def _parse(raw_text: str | None) -> dict | None:
+    result = _normalize_result(_extract_json((raw_text or "").strip()))
+    if result is None:
+        metrics.llm_parse_failures_total.inc()
+    return result
+
+
+def _finish(text: str, result: dict, status: str, model: str) -> dict:
+    result["model"] = model
+
+    # ---------------- Cache parsed verdicts only ----------------
+    verdict_cache.put(text, result)
+
+    result["status"] = status
+    return result
+
+
+def _record_latency(model: str, seconds: float):
+    samples = _latencies.get(model)
+    if samples is None:
+        samples = _latencies[model] = deque(maxlen=200)
+    samples.append(seconds)
+
+
+def hedge_delay(model: str) -> float | None:
+    """
+    Seconds to wait for `model` before hedging with the next one,
+    or None while hedging is off or its latency is not known yet.
+    """
+    samples = _latencies.get(model)
+    if LLM_HEDGE_PERCENTILE <= 0 or not samples or len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * LLM_HEDGE_PERCENTILE / 100))
+    return max(ordered[index], LLM_HEDGE_MIN_MS / 1000)
+
+
+def model_stats() -> dict:
+    return {
+        model: {
+            "samples": len(_latencies.get(model, ())),
+            "hedge_after_ms": (
+                round(hedge_delay(model) * 1000, 1) if hedge_delay(model) else None
+            )
+        }
+        for model in LLM_MODELS
+    }
+
+
+def cached_verdict(text: str) -> dict | None:
+    """
+    Cached LLM verdict for `text`, without calling the LLM.
+    """
+    cached = verdict_cache.get(text)
+    if cached:
+        cached["status"] = "ok"
+
+    metrics.llm_cache_total.inc(result="hit" if cached else "miss")
+    return cached
+
+# =====================================================
+# MAIN API (RATE LIMITED + CACHED)
+# =====================================================
+
+def analyze_toxicity_llm(text: str, priority: str = "interactive") -> dict:
+    """
+    Uses LLM to analyze toxicity with explainability.
+    Rate limited + cached to prevent rate limits.
+
+    `priority` (interactive / batch / backfill) orders callers waiting
+    for a slot; lower priorities are shed first when the queue fills.
+
+    The result carries `status`:
+        ok       → answered (or served from cache) without waiting
+        queued   → answered after waiting for a rate-limit slot
+        shed     → queue full or no slot within LLM_MAX_WAIT, fallback verdict
+        error    → call or parsing failed, fallback verdict
+        disabled → no API key configured, fallback verdict
+    """
 
     # ---------------- Fast cache hit ----------------
-    with _llm_lock:
-        if text == _last_prompt and _last_llm_result:
-            return _last_llm_result
-
-        # ---------------- Throttle window ----------------
-        if now - _last_llm_time < LLM_COOLDOWN:
-            return {
-                "toxic": False,
-                "confidence": 0.0,
-                "severity": "low",
-                "category": [],
-                "detected_phrases": [],
-                "explanation": "LLM throttled to prevent rate limit"
-            }
+    cached = cached_verdict(text)
+    if cached:
+        return cached
+
+    clients = get_clients()
+    if clients is None:
+        return _disabled_result()
+    client = clients[0]
+
+    # ---------------- Rate limit ----------------
+    with metrics.stage("llm_wait"):
+        status = llm_gate.acquire(priority)
+
+    if status != "ok":
+        metrics.llm_throttled_total.inc(result=status)
+    if status == "shed":
+        return _fallback_result(
+            "shed", "LLM rate limit reached, request shed"
+        )
+
+    # ---------------- Models in order, next one on failure ----------------
+    for i, model in enumerate(LLM_MODELS):
+        if i > 0 and not llm_gate.try_acquire():
+            break
+
+        try:
+            start = time.perf_counter()
+            with metrics.stage("llm"):
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=_build_messages(text, model=model),
+                    temperature=0.2,
+                    max_tokens=350
+                )
+            metrics.llm_calls_total.inc(mode="single", outcome="ok")
+            _record_latency(model, time.perf_counter() - start)
+
+            result = _parse(response.choices[0].message.content)
+
+        except Exception as e:
+            metrics.llm_calls_total.inc(mode="single", outcome="error")
+            print(f"⚠️ LLM Error ({model}):", e)
+            continue
+
+        if result is not None:
+            return _finish(text, result, status, model)
+
+    return _fallback_result(
+        "error", "LLM unavailable or parsing failed"
+    )
+
+
+async def analyze_toxicity_llm_async(text: str, priority: str = "interactive") -> dict:
+    """
+    Async twin of analyze_toxicity_llm.
+    Waits for rate-limit slots on a future, so no thread is held.
+    With LLM_BATCHING=1, concurrent calls share one multi-item request.
+    """
+
+    cached = cached_verdict(text)
+    if cached:
+        return cached
+
+    if LLM_BATCHING:
+        result = await _get_batcher().submit((text, priority))
+        if result is not None:
+            return result
+
+    return await _analyze_single_async(text, priority)
+
+
+async def analyze_toxicity_llm_many_async(texts: list[str],
+                                         priority: str = "interactive") -> list[dict]:
+    """
+    Verdicts for several texts with one LLM request per LLM_BATCH_MAX
+    uncached texts, instead of one request each. Items the model drops
+    or garbles are retried as single calls.
+    """
+    results = [cached_verdict(text) for text in texts]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    chunks = [
+        missing[i:i + LLM_BATCH_MAX]
+        for i in range(0, len(missing), max(1, LLM_BATCH_MAX))
+    ]
+    batches = await asyncio.gather(*(
+        _analyze_batch([(texts[i], priority) for i in chunk]) for chunk in chunks
+    ))
+    for chunk, batch in zip(chunks, batches):
+        for i, result in zip(chunk, batch):
+            results[i] = result
+
+    retry = [i for i in missing if results[i] is None]
+    singles = await asyncio.gather(*(
+        _analyze_single_async(texts[i], priority) for i in retry
+    ))
+    for i, result in zip(retry, singles):
+        results[i] = result
+
+    return results
+
+
+async def _analyze_single_async(text: str, priority: str = "interactive") -> dict:
+    clients = get_clients()
+    if clients is None:
+        return _disabled_result()
+    async_client = clients[1]
+
+    with metrics.stage("llm_wait"):
+        status = await llm_gate.acquire_async(priority)
+
+    if status != "ok":
+        metrics.llm_throttled_total.inc(result=status)
+    if status == "shed":
+        return _fallback_result(
+            "shed", "LLM rate limit reached, request shed"
+        )
+
+    result, model = await _hedged_call(async_client, text)
+    if result is None:
+        return _fallback_result(
+            "error", "LLM unavailable or parsing failed"
+        )
+
+    return _finish(text, result, status, model)
+
+
+async def _call_model(async_client, model: str, text: str) -> dict | None:
+    """
+    One request to one model: the parsed verdict, or None.
+    """
+    start = time.perf_counter()
 
     try:
-        # ---------------- Build Messages Safely ----------------
+        with metrics.stage("llm"):
+            response = await async_client.chat.completions.create(
+                model=model,
+                messages=_build_messages(text, model=model),
+                temperature=0.2,
+                max_tokens=350
+            )
+        raw_text = response.choices[0].message.content
+    except asyncio.CancelledError:
+        # Lost to a hedge: it took at least this long. Without this sample
+        # only fast calls are seen and hedge_delay keeps shrinking.
+        _record_latency(model, time.perf_counter() - start)
+        raise
+    except Exception as e:
+        metrics.llm_calls_total.inc(mode="single", outcome="error")
+        print(f"⚠️ LLM Error ({model}):", e)
+        return None
 
-        if _supports_system_role(OPENROUTER_MODEL):
-            messages = [
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": text}
-            ]
-        else:
-            merged_prompt = f"{SYSTEM_PROMPT}\n\nUSER_TEXT:\n{text}"
-            messages = [
-                {"role": "user", "content": merged_prompt}
-            ]
-
-        # ---------------- LLM Call ----------------
-
-        response = client.chat.completions.create(
-            model=OPENROUTER_MODEL,
-            messages=messages,
-            temperature=0.2,
-            max_tokens=350
+    metrics.llm_calls_total.inc(mode="single", outcome="ok")
+    _record_latency(model, time.perf_counter() - start)
+
+    return _parse(raw_text)
+
+
+async def _hedged_call(async_client, text: str) -> tuple[dict | None, str | None]:
+    """
+    Tries LLM_MODELS in order. The next model starts when the current
+    one fails or, once its latency is known, is slower than hedge_delay.
+    First usable verdict wins; the other requests are cancelled.
+
+    Extra requests only go out when a rate-limit slot is free right now,
+    so hedging never queues behind other callers.
+    """
+    running = {}   # task -> model
+    next_model = 0
+
+    def launch():
+        nonlocal next_model
+        model = LLM_MODELS[next_model]
+        next_model += 1
+        running[asyncio.create_task(_call_model(async_client, model, text))] = model
+
+    launch()
+
+    try:
+        while running:
+            timeout = None
+            if next_model < len(LLM_MODELS):
+                timeout = hedge_delay(LLM_MODELS[next_model - 1])
+
+            done, _ = await asyncio.wait(
+                running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                model = running.pop(task)
+                result = task.result()
+                if result is not None:
+                    return result, model
+
+            if next_model >= len(LLM_MODELS):
+                continue
+
+            if llm_gate.try_acquire():
+                if not done:
+                    metrics.llm_hedged_total.inc()
+                launch()
+            elif not running:
+                break
+            else:
+                # No slot for a hedge: stop hedging, wait for what is running
+                next_model = len(LLM_MODELS)
+
+        return None, None
+
+    finally:
+        for task in running:
+            task.cancel()
+
+# =====================================================
+# MICRO-BATCHED REQUESTS
+# =====================================================
+
+def _get_batcher() -> MicroBatcher:
+    global _batcher
+
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher.loop is not loop:
+        _batcher = MicroBatcher(
+            _analyze_batch,
+            window_ms=LLM_BATCH_WINDOW_MS,
+            max_items=LLM_BATCH_MAX
         )
+    return _batcher
+
+
+def batcher_stats() -> dict | None:
+    return _batcher.stats() if _batcher else None
 
-        raw_text = response.choices[0].message.content.strip()
-        parsed = _extract_json(raw_text)
-
-        explanation = str(parsed.get("explanation", "")).strip()
-        if len(explanation) < 20:
-            explanation = "LLM did not provide a sufficient explanation."
-
-        result = {
-            "toxic": bool(parsed.get("toxic", False)),
-            "confidence": float(parsed.get("confidence", 0.0)),
-            "severity": parsed.get("severity", "low"),
-            "category": parsed.get("category", []),
-            "detected_phrases": parsed.get("detected_phrases", []),
-            "explanation": explanation
-        }
 
-        # ---------------- Update cache safely ----------------
-        with _llm_lock:
-            _last_llm_time = time.time()
-            _last_prompt = text
-            _last_llm_result = result
+async def _analyze_batch(items: list[tuple[str, str]]) -> list[dict | None]:
+    """
+    One LLM request for several (text, priority) items. The batch waits
+    for its slot at the priority of its most urgent item.
+
+    Returns one result per text. None means the item was missing or
+    unparseable and the caller should retry it as a single call.
+    """
+    if len(items) == 1:
+        return [None]
+
+    texts = [text for text, _ in items]
+    priority = min((p for _, p in items), key=lambda p: PRIORITIES.get(p, 0))
+
+    clients = get_clients()
+    if clients is None:
+        return [_disabled_result() for _ in texts]
+    async_client = clients[1]
+
+    with metrics.stage("llm_wait"):
+        status = await llm_gate.acquire_async(priority)
+
+    if status != "ok":
+        metrics.llm_throttled_total.inc(result=status)
+    if status == "shed":
+        return [
+            _fallback_result("shed", "LLM rate limit reached, request shed")
+            for _ in texts
+        ]
+
+    batch = [{"id": i, "text": text} for i, text in enumerate(texts)]
 
-        return result
+    try:
+        with metrics.stage("llm_batch"):
+            response = await async_client.chat.completions.create(
+                model=LLM_MODELS[0],
+                messages=_build_messages(
+                    json.dumps(batch, ensure_ascii=False),
+                    f"{SYSTEM_PROMPT}\n\n{BATCH_PROMPT_SUFFIX}",
+                    LLM_MODELS[0]
+                ),
+                temperature=0.2,
+                max_tokens=min(350 * len(texts), LLM_BATCH_MAX_TOKENS)
+            )
+        raw_text = response.choices[0].message.content.strip()
+        metrics.llm_calls_total.inc(mode="batch", outcome="ok")
 
     except Exception as e:
-        print("⚠️ LLM Error:", e)
-
-        return {
-            "toxic": False,
-            "confidence": 0.0,
-            "severity": "low",
-            "category": [],
-            "detected_phrases": [],
-            "explanation": "LLM unavailable or parsing failed"
-        }
+        metrics.llm_calls_total.inc(mode="batch", outcome="error")
+        print("⚠️ LLM batch error:", e)
+
+        # Fallback models exist: retry the items as single (hedged) calls
+        if len(LLM_MODELS) > 1:
+            return [None for _ in texts]
+
+        return [
+            _fallback_result("error", "LLM unavailable or parsing failed")
+            for _ in texts
+        ]
+
+    parsed = _extract_json(raw_text)
+    if isinstance(parsed, dict):
+        parsed = parsed.get("results")
+
+    by_id = {}
+    if isinstance(parsed, list):
+        for item in parsed:
+            if isinstance(item, dict) and isinstance(item.get("id"), int):
+                by_id[item["id"]] = item
+
+    results = []
+    for i, text in enumerate(texts):
+        # A bad item only fails itself: None → retried as a single call
+        try:
+            result = _normalize_result(by_id.get(i))
+        except Exception as e:
+            print(f"⚠️ LLM batch item {i} unusable:", e)
+            result = None
+
+        if result is not None:
+            _finish(text, result, status, LLM_MODELS[0])
+        else:
+            metrics.llm_parse_failures_total.inc()
+
+        results.append(result)
+
+    return results
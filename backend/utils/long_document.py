@@ -0,0 +1,88 @@
+from utils.abuse_words import get_matcher
+from utils.live_session import split_sentences
+
+
+# =====================================================
+# LONG DOCUMENTS (OVERLAPPING SENTENCE WINDOWS)
+# =====================================================
+#
+# Scored as one document, a multi-page post dilutes the TF-IDF
+# probability and sends the LLM a prompt it cannot finish. Instead the
+# text is split into sentences, and the sentences are grouped into windows
+# of `size` sentences. Each window shares `overlap` sentences with the
+# next, so a hit at a window edge is still seen with its context.
+
+def sentence_spans(text: str, max_chars: int = 400) -> list[tuple[int, int, str]]:
+    """
+    split_sentences, with run-on sentences (no punctuation for pages)
+    cut at whitespace into pieces of at most `max_chars`.
+    """
+    spans = []
+
+    for start, end, sentence in split_sentences(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+
+            piece = sentence[:cut].rstrip()
+            spans.append((start, start + len(piece), piece))
+
+            rest = sentence[cut:]
+            start += cut + (len(rest) - len(rest.lstrip()))
+            sentence = rest.lstrip()
+
+        if sentence:
+            spans.append((start, end, sentence))
+
+    return spans
+
+
+def build_windows(n_sentences: int, size: int, overlap: int) -> list[tuple[int, int]]:
+    """
+    (first, last) sentence index ranges, last exclusive.
+    """
+    stride = max(1, size - overlap)
+    windows = []
+
+    for first in range(0, n_sentences, stride):
+        last = min(first + size, n_sentences)
+        windows.append((first, last))
+        if last == n_sentences:
+            break
+
+    return windows
+
+
+# =====================================================
+# SPAN OFFSETS
+# =====================================================
+
+def rule_spans(sentence: str, offset: int, words: list[str]) -> list[dict]:
+    """
+    Document offsets of the rule hits in one sentence. A word only found
+    after normalization (obfuscated, e.g. "1d10t") spans the sentence.
+    """
+    lowered = sentence.lower()
+    found = {}
+
+    # Offsets are only exact when lowercasing kept the length
+    if len(lowered) == len(sentence):
+        for start, end, word in get_matcher().iter_matches(lowered):
+            found.setdefault(word, []).append((start, end))
+
+    return [
+        {"start": offset + start, "end": offset + end, "text": word, "source": "rules"}
+        for word in dict.fromkeys(words)
+        for start, end in found.get(word, [(0, len(sentence))])
+    ]
+
+
+def locate_phrase(lowered_text: str, start: int, end: int, phrase: str) -> tuple[int, int]:
+    """
+    Offsets of `phrase` within text[start:end], else the whole range.
+    """
+    i = lowered_text.find(phrase.lower(), start, end) if phrase else -1
+    if i < 0:
+        return start, end
+    return i, i + len(phrase)
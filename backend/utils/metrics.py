@@ -0,0 +1,238 @@
+import functools
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from threading import Lock
+
+
+# =====================================================
+# LIGHTWEIGHT METRICS (PROMETHEUS TEXT FORMAT)
+# =====================================================
+#
+# Counters, gauges and histograms kept in process memory and rendered
+# by GET /metrics. No client library needed; each update is a dict
+# lookup under a lock, cheap next to any pipeline stage.
+
+_registry = []
+
+# Seconds; covers microsecond regex passes up to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}"
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (+Inf last), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, key: tuple, value) -> list[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = f'le="{_fmt(bound)}"'
+            lines.append(
+                f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}"
+            )
+
+        labels = _label_str(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_fmt(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# =====================================================
+# TOXIGUARD METRICS
+# =====================================================
+
+requests_total = Counter(
+    "toxiguard_requests_total", "API requests by endpoint", ("endpoint",)
+)
+request_seconds = Histogram(
+    "toxiguard_request_seconds", "End-to-end request latency", ("endpoint",)
+)
+stage_seconds = Histogram(
+    "toxiguard_stage_seconds", "Pipeline stage latency", ("stage",)
+)
+
+llm_calls_total = Counter(
+    "toxiguard_llm_calls_total", "OpenRouter API calls", ("mode", "outcome")
+)
+llm_throttled_total = Counter(
+    "toxiguard_llm_throttled_total", "LLM calls delayed or shed by the rate limiter", ("result",)
+)
+llm_hedged_total = Counter(
+    "toxiguard_llm_hedged_total", "Backup LLM requests sent because the primary was slow"
+)
+llm_parse_failures_total = Counter(
+    "toxiguard_llm_parse_failures_total", "LLM responses without a usable verdict"
+)
+llm_cache_total = Counter(
+    "toxiguard_llm_cache_total", "LLM verdict cache lookups", ("result",)
+)
+near_duplicate_total = Counter(
+    "toxiguard_near_duplicate_total", "Near-duplicate verdict lookups", ("result",)
+)
+deadline_stages_total = Counter(
+    "toxiguard_deadline_stages_total", "Stage outcomes of /predict calls with deadline_ms", ("stage", "status")
+)
+llm_admission_total = Counter(
+    "toxiguard_llm_admission_total", "LLM slot requests by priority: admitted, queued, shed or timeout", ("priority", "result")
+)
+local_rejected_total = Counter(
+    "toxiguard_local_rejected_total", "Requests refused with 429 because the local stages were saturated", ("priority",)
+)
+stream_disconnects_total = Counter(
+    "toxiguard_stream_disconnects_total", "/predict/stream responses stopped because the client went away"
+)
+llm_queue_wait_seconds = Histogram(
+    "toxiguard_llm_queue_wait_seconds", "Time queued callers waited for an LLM slot", ("priority",)
+)
+
+llm_queue_depth = Gauge(
+    "toxiguard_llm_queue_depth", "Callers waiting for an LLM rate-limit slot", ("priority",)
+)
+llm_cache_entries = Gauge(
+    "toxiguard_llm_cache_entries", "Entries in the LLM verdict cache"
+)
+requests_in_flight = Gauge(
+    "toxiguard_predict_in_flight", "Distinct /predict computations running"
+)
+local_in_flight = Gauge(
+    "toxiguard_local_in_flight", "Requests admitted to the local stages and not finished"
+)
+
+
+# =====================================================
+# STAGE TIMERS
+# =====================================================
+#
+# stage("ml") always feeds stage_seconds. When the current request
+# opted in with start_timings(True), the elapsed milliseconds are also added
+# to its per-request breakdown. The dict lives in a ContextVar, so asyncio
+# tasks started by the request share it; executor threads need
+# in_context() because run_in_executor does not copy the context.
+
+_timings: ContextVar[dict | None] = ContextVar("toxiguard_timings", default=None)
+
+
+def start_timings(enabled: bool = True) -> dict | None:
+    """
+    Starts the per-request breakdown for the current context.
+    Returns the dict stages write into, or None when not requested.
+    """
+    timings = {} if enabled else None
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=name)
+
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = round(timings.get(name, 0.0) + elapsed * 1000, 3)
+
+
+def in_context(fn, *args):
+    """
+    `fn(*args)` bound to a copy of the current context, for executors.
+    """
+    return functools.partial(copy_context().run, fn, *args)
@@ -0,0 +1,308 @@
+import os
+import re
+import time
+from threading import Lock, Thread
+from typing import NamedTuple
+
+# =====================================================
+# VERSIONED MODEL REGISTRY
+# =====================================================
+#
+# A model version is a directory laid out like backend/ itself:
+#
+#   models/
+#     v1/
+#       abuse_model.joblib
+#       label_encoder.joblib
+#       abuse_model_linear/     (optional numpy export)
+#     v2/
+#       ...
+#
+# `python train_model.py --version v2` publishes one. New versions are
+# picked up by a polling thread, loaded, checked on a smoke set and only
+# then swapped in. The swap is a single reference assignment: requests
+# already holding the previous ModelHandle finish with it.
+#
+# The artifacts in backend/ itself are the "builtin" version, used when
+# the models directory is empty.
+
+BUILTIN_VERSION = "builtin"
+
+# (text, expect_positive) — unambiguous cases any usable model gets right
+SMOKE_SET = [
+    ("you are amazing and so kind", True),
+    ("honestly your work is excellent", True),
+    ("that guy is really helpful", True),
+    ("you are a stupid idiot", False),
+    ("go to hell you bastard", False),
+    ("you are pathetic trash", False)
+]
+
+
+class ModelHandle(NamedTuple):
+    version: str
+    model: object       # anything with predict_proba(list[str])
+    labels: list
+    loaded_at: float
+
+
+class SmokeTestFailed(Exception):
+    pass
+
+
+# -----------------------------------------------------
+# Loading + validation
+# -----------------------------------------------------
+
+def load_model_dir(root: str, ml_engine: str = "auto") -> tuple:
+    """
+    (model, labels) from a version directory.
+
+    ml_engine: auto    → numpy export when present, else sklearn
+               numpy   → numpy export only
+               sklearn → joblib Pipeline + LabelEncoder
+    joblib / sklearn are only imported for the sklearn engine.
+    """
+    linear_dir = os.path.join(root, "abuse_model_linear")
+
+    use_numpy = ml_engine == "numpy" or (
+        ml_engine == "auto"
+        and os.path.exists(os.path.join(linear_dir, "meta.json"))
+    )
+
+    if use_numpy:
+        from utils.linear_model import LinearTextModel
+
+        model = LinearTextModel(linear_dir)
+        return model, list(model.classes_)
+
+    import joblib
+
+    model = joblib.load(os.path.join(root, "abuse_model.joblib"))
+    label_encoder = joblib.load(os.path.join(root, "label_encoder.joblib"))
+    return model, list(label_encoder.classes_)
+
+
+def smoke_test(model, labels: list) -> float:
+    """
+    Runs SMOKE_SET through the model. Returns the accuracy, or raises
+    SmokeTestFailed when the output is malformed.
+    """
+    texts = [text for text, _ in SMOKE_SET]
+    probs = model.predict_proba(texts)
+
+    if getattr(probs, "shape", None) != (len(texts), len(labels)):
+        raise SmokeTestFailed(f"predict_proba shape {getattr(probs, 'shape', None)}")
+
+    correct = 0
+    for row, (_, expect_positive) in zip(probs, SMOKE_SET):
+        total = float(sum(row))
+        if not 0.99 <= total <= 1.01:
+            raise SmokeTestFailed(f"probabilities sum to {total}")
+
+        predicted = labels[int(row.argmax())]
+        if (predicted == "positive") == expect_positive:
+            correct += 1
+
+    return correct / len(SMOKE_SET)
+
+
+def _version_key(name: str) -> tuple:
+    """
+    Natural sort: v2 < v10, 2026-01-02 < 2026-01-10.
+    """
+    return tuple(
+        (0, int(part)) if part.isdigit() else (1, part)
+        for part in re.split(r"(\d+)", name) if part
+    )
+
+
+# -----------------------------------------------------
+# Registry
+# -----------------------------------------------------
+
+class ModelRegistry:
+
+    def __init__(self, models_dir: str, builtin_dir: str, ml_engine: str = "auto",
+                 min_smoke_accuracy: float = 0.8, hold_prefixes: tuple = ()):
+        self.models_dir = models_dir
+        self.builtin_dir = builtin_dir
+        self.ml_engine = ml_engine
+        self.min_smoke_accuracy = min_smoke_accuracy
+
+        # Versions named like this are never auto-promoted, only activated by hand
+        self.hold_prefixes = tuple(hold_prefixes)
+
+        self.active: ModelHandle | None = None
+        self._previous: ModelHandle | None = None
+
+        self._info = {}      # version -> status dict
+        self._seen = set()   # versions already considered for auto-promotion
+        self._lock = Lock()  # serializes loads / swaps, never taken by readers
+
+    # ---------------- Discovery ----------------
+
+    def _path(self, version: str) -> str:
+        if version == BUILTIN_VERSION:
+            return self.builtin_dir
+        return os.path.join(self.models_dir, version)
+
+    def available(self) -> list[str]:
+        """
+        Version directories, oldest first. Names starting with "." are
+        ignored so a version can be staged and renamed into place.
+        """
+        if not os.path.isdir(self.models_dir):
+            return []
+
+        return sorted(
+            (
+                name for name in os.listdir(self.models_dir)
+                if not name.startswith(".")
+                and os.path.isdir(os.path.join(self.models_dir, name))
+            ),
+            key=_version_key
+        )
+
+    def _held(self, version: str) -> bool:
+        if self.hold_prefixes and version.startswith(self.hold_prefixes):
+            self._info.setdefault(version, {}).setdefault("state", "held")
+            return True
+        return False
+
+    # ---------------- Load + swap ----------------
+
+    def _load(self, version: str) -> ModelHandle:
+        start = time.perf_counter()
+        info = self._info.setdefault(version, {})
+
+        try:
+            model, labels = load_model_dir(self._path(version), self.ml_engine)
+            accuracy = smoke_test(model, labels)
+            if accuracy < self.min_smoke_accuracy:
+                raise SmokeTestFailed(
+                    f"smoke accuracy {accuracy:.2f} < {self.min_smoke_accuracy}"
+                )
+        except Exception as e:
+            info.update(state="failed", error=str(e))
+            print(f"⚠️ Model {version} rejected: {e}")
+            raise
+
+        info.update(
+            state="validated",
+            error=None,
+            smoke_accuracy=round(accuracy, 3),
+            load_ms=round((time.perf_counter() - start) * 1000, 1)
+        )
+        return ModelHandle(version, model, labels, time.time())
+
+    def _swap(self, handle: ModelHandle):
+        old = self.active
+        if old is not None and old.version != handle.version:
+            self._previous = old
+
+        self.active = handle
+        print(f"✅ Model {handle.version} active")
+
+    def activate(self, version: str) -> ModelHandle:
+        """
+        Loads, validates and swaps in `version` (also used for rollback).
+        The current model keeps serving until the swap.
+        """
+        with self._lock:
+            self._seen.add(version)
+
+            if self.active and self.active.version == version:
+                return self.active
+
+            if self._previous and self._previous.version == version:
+                handle = self._previous
+            elif version == BUILTIN_VERSION or version in self.available():
+                handle = self._load(version)
+            else:
+                raise KeyError(version)
+
+            self._swap(handle)
+            return handle
+
+    def rollback(self) -> ModelHandle:
+        """
+        Swaps back to the previously active version (kept in memory).
+        """
+        previous = self._previous
+        if previous is None:
+            raise LookupError("No previous model version to roll back to")
+        return self.activate(previous.version)
+
+    def load_initial(self) -> ModelHandle:
+        """
+        Newest version that passes validation, else the builtin model.
+        Held versions are skipped.
+        """
+        versions = self.available()
+        self._seen.update(versions)
+
+        for version in reversed(versions):
+            if self._held(version):
+                continue
+            try:
+                return self.activate(version)
+            except Exception:
+                continue
+
+        return self.activate(BUILTIN_VERSION)
+
+    def poll(self):
+        """
+        Promotes the newest of the versions that appeared since the last
+        poll. A version that was rolled back from is not promoted again,
+        and held versions wait for /admin/models/{version}/activate.
+        """
+        new = [v for v in self.available() if v not in self._seen]
+        self._seen.update(new)
+
+        new = [v for v in new if not self._held(v)]
+        if not new:
+            return
+
+        try:
+            self.activate(new[-1])
+        except Exception:
+            pass
+
+    def watch(self, interval: float) -> Thread:
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.poll()
+                except Exception as e:
+                    print("⚠️ Model registry poll error:", e)
+
+        thread = Thread(target=loop, name="toxiguard-model-watch", daemon=True)
+        thread.start()
+        return thread
+
+    # ---------------- Reporting ----------------
+
+    def versions(self) -> list[dict]:
+        names = self.available()
+        if BUILTIN_VERSION in self._info or not names:
+            names = [BUILTIN_VERSION] + names
+
+        active = self.active.version if self.active else None
+        previous = self._previous.version if self._previous else None
+
+        return [
+            {
+                "version": name,
+                "active": name == active,
+                "previous": name == previous,
+                "state": self._info.get(name, {}).get("state", "available"),
+                **{
+                    k: v for k, v in self._info.get(name, {}).items()
+                    if k != "state"
+                }
+            }
+            for name in names
+        ]
@@ -0,0 +1,177 @@
+import copy
+import time
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+
+import numpy as np
+
+
+# =====================================================
+# SIMHASH FINGERPRINTS
+# =====================================================
+#
+# Raids post slight variants of one message: another emoji, an added
+# "bro", a typo. normalize_text() already strips emoji, case and
+# obfuscation; SimHash over character 4-grams of the result makes the
+# remaining edits flip only a few of 64 bits, while unrelated texts
+# differ in ~30. 4-grams (not 3) keep "not good" far from "good".
+#
+# Fingerprints use Python's hash(), which is salted per process. That is
+# fine: the index lives in memory and is never shared.
+
+FINGERPRINT_BITS = 64
+_MASK = (1 << FINGERPRINT_BITS) - 1
+
+
+def simhash(text: str, n: int = 4) -> int:
+    padded = f" {text} "
+    grams = [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+
+    hashes = np.fromiter((hash(g) & _MASK for g in grams), dtype=np.uint64, count=len(grams))
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, FINGERPRINT_BITS)
+
+    # Majority vote per bit position
+    votes = np.packbits(bits.sum(axis=0) * 2 > len(grams))
+    return int.from_bytes(votes.tobytes(), "big")
+
+
+# =====================================================
+# BANDED INDEX (LSH)
+# =====================================================
+
+class NearDuplicateIndex:
+    """
+    Recent texts → verdicts, looked up by SimHash distance.
+
+    The 64 bits are split into max_distance + 1 bands and every entry is
+    bucketed once per band. Two fingerprints within max_distance bits
+    agree on at least one whole band (pigeonhole), so a lookup only
+    compares against entries sharing a bucket: no full scan, no missed
+    match. Size-bounded LRU with a TTL.
+    """
+
+    def __init__(self, max_size: int = 5000, max_distance: int = 3,
+                 ttl: float = 600.0, min_chars: int = 16):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.min_chars = min_chars
+
+        n_bands = max_distance + 1
+        width = FINGERPRINT_BITS // n_bands
+        self._bands = [
+            (i * width, (1 << width) - 1 if i < n_bands - 1
+             else (1 << (FINGERPRINT_BITS - i * width)) - 1)
+            for i in range(n_bands)
+        ]
+
+        self._entries = OrderedDict()   # id -> (fingerprint, key, verdict, expires_at)
+        self._buckets = [{} for _ in self._bands]   # band value -> set of ids
+        self._by_key = {}                           # key -> id (one entry per key)
+        self._ids = count()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _band_values(self, fingerprint: int):
+        return [(fingerprint >> shift) & mask for shift, mask in self._bands]
+
+    def _remove(self, entry_id: int):
+        fingerprint, key = self._entries.pop(entry_id)[:2]
+        if key is not None and self._by_key.get(key) == entry_id:
+            del self._by_key[key]
+
+        for buckets, value in zip(self._buckets, self._band_values(fingerprint)):
+            bucket = buckets.get(value)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del buckets[value]
+
+    # ---------------- Lookup ----------------
+
+    def lookup(self, clean_text: str, key: str | None = None) -> dict | None:
+        """
+        {"verdict", "distance"} of the closest recent entry within
+        max_distance, or None. Entries stored under the same `key`
+        are skipped: the exact-match cache already covers them.
+        """
+        if len(clean_text) < self.min_chars:
+            return None
+
+        fingerprint = simhash(clean_text)
+        now = time.time()
+
+        with self._lock:
+            candidates = set()
+            for buckets, value in zip(self._buckets, self._band_values(fingerprint)):
+                candidates.update(buckets.get(value, ()))
+
+            best = None
+            for entry_id in candidates:
+                other, other_key, verdict, expires_at = self._entries[entry_id]
+
+                if expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                if key is not None and other_key == key:
+                    continue
+
+                distance = (fingerprint ^ other).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, entry_id, verdict)
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best[1])
+            self.hits += 1
+            return {"verdict": copy.deepcopy(best[2]), "distance": best[0]}
+
+    # ---------------- Store ----------------
+
+    def add(self, clean_text: str, verdict: dict, key: str | None = None):
+        if len(clean_text) < self.min_chars:
+            return
+
+        fingerprint = simhash(clean_text)
+        entry_id = next(self._ids)
+
+        with self._lock:
+            # A repeat (e.g. a verdict cache hit) refreshes its entry
+            if key is not None and key in self._by_key:
+                self._remove(self._by_key[key])
+            if key is not None:
+                self._by_key[key] = entry_id
+
+            self._entries[entry_id] = (
+                fingerprint, key, copy.deepcopy(verdict), time.time() + self.ttl
+            )
+            for buckets, value in zip(self._buckets, self._band_values(fingerprint)):
+                buckets.setdefault(value, set()).add(entry_id)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_key.clear()
+            for buckets in self._buckets:
+                buckets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,264 @@
+import csv
+import json
+import os
+import random
+import time
+from threading import Lock, Thread
+
+from utils.preprocessing import normalize_text
+
+# =====================================================
+# MODERATOR FEEDBACK LOG
+# =====================================================
+#
+# POST /feedback appends one JSON line per corrected verdict. The log is
+# the source of truth: the trainer keeps a byte offset into it, so a
+# restart resumes where it stopped and nothing is trained on twice.
+
+class FeedbackLog:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+        self.recorded = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.recorded += 1
+
+    def read_from(self, offset: int) -> tuple[list[dict], int]:
+        """
+        Complete records after `offset`, and the offset after them.
+        A trailing line still being written is left for the next read.
+        """
+        if not os.path.exists(self.path):
+            return [], offset
+
+        records = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for raw in iter(f.readline, b""):
+                if not raw.endswith(b"\n"):
+                    break
+                offset += len(raw)
+                try:
+                    records.append(json.loads(raw))
+                except ValueError:
+                    continue
+
+        return records, offset
+
+
+# =====================================================
+# INCREMENTAL TRAINER
+# =====================================================
+#
+# HashingVectorizer needs no vocabulary, so new words from feedback get
+# features without refitting. SGDClassifier(log_loss) supports
+# partial_fit and predict_proba. The first run bootstraps on the
+# training CSV; after that only feedback is consumed, in mini-batches.
+# Periodically the model is published as models/online-<timestamp>/
+# with the same LabelEncoder, and the model registry smoke-tests and
+# swaps it in like any other version.
+
+class OnlineTrainer:
+
+    def __init__(self, feedback: FeedbackLog, encoder_path: str, data_path: str,
+                 models_dir: str, state_path: str, batch_size: int = 32,
+                 publish_every: float = 300, feedback_weight: float = 3.0,
+                 on_publish=None):
+        self.feedback = feedback
+        self.encoder_path = encoder_path
+        self.data_path = data_path
+        self.models_dir = models_dir
+        self.state_path = state_path
+        self.batch_size = batch_size
+        self.publish_every = publish_every
+        self.feedback_weight = feedback_weight
+        self.on_publish = on_publish
+
+        self.pipeline = None
+        self.encoder = None
+        self.offset = 0            # feedback log bytes consumed
+        self.pending_publish = False
+        self.last_publish = time.time()
+
+        self.trained = 0
+        self.skipped = 0
+        self.published = []
+
+        self._lock = Lock()
+
+    # ---------------- State ----------------
+
+    def _new_pipeline(self):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.pipeline import Pipeline
+
+        return Pipeline([
+            ("hashing", HashingVectorizer(
+                n_features=2 ** 18,
+                ngram_range=(1, 2),
+                alternate_sign=False
+            )),
+            ("clf", SGDClassifier(
+                loss="log_loss",
+                alpha=1e-5,
+                random_state=42
+            ))
+        ])
+
+    def load(self):
+        import joblib
+
+        self.encoder = joblib.load(self.encoder_path)
+
+        if os.path.exists(self.state_path):
+            state = joblib.load(self.state_path)
+            self.pipeline = state["pipeline"]
+            self.offset = state["offset"]
+            print(f"✅ Online learner resumed at feedback offset {self.offset}")
+            return
+
+        self.pipeline = self._new_pipeline()
+        self._bootstrap()
+        self._save()
+
+    def _save(self):
+        import joblib
+
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        joblib.dump({"pipeline": self.pipeline, "offset": self.offset}, tmp)
+        os.replace(tmp, self.state_path)
+
+    # ---------------- Training ----------------
+
+    def _partial_fit(self, texts: list[str], labels: list[str], weight: float = 1.0):
+        import numpy as np
+
+        X = self.pipeline.named_steps["hashing"].transform(texts)
+        y = self.encoder.transform(labels)
+
+        self.pipeline.named_steps["clf"].partial_fit(
+            X, y,
+            classes=np.arange(len(self.encoder.classes_)),
+            sample_weight=np.full(len(texts), weight)
+        )
+
+    def _bootstrap(self, epochs: int = 5, chunk_size: int = 1000):
+        """
+        Initial passes over the training CSV so the first published
+        model is as good as a fresh retrain.
+        """
+        with open(self.data_path, newline="", encoding="utf-8") as f:
+            rows = [
+                (normalize_text(row["text"]), row["label"])
+                for row in csv.DictReader(f)
+            ]
+
+        for epoch in range(epochs):
+            random.Random(epoch).shuffle(rows)
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i:i + chunk_size]
+                self._partial_fit([t for t, _ in chunk], [l for _, l in chunk])
+
+        print(f"✅ Online learner bootstrapped on {len(rows)} rows")
+
+    def step(self) -> int:
+        """
+        Consumes new feedback in mini-batches; publishes when due.
+        Returns the number of feedback records trained on.
+        """
+        with self._lock:
+            records, offset = self.feedback.read_from(self.offset)
+            known = set(self.encoder.classes_)
+
+            batch = [
+                (normalize_text(r.get("text", "")), r.get("label"))
+                for r in records
+            ]
+            valid = [(t, l) for t, l in batch if t and l in known]
+            self.skipped += len(batch) - len(valid)
+
+            for i in range(0, len(valid), self.batch_size):
+                chunk = valid[i:i + self.batch_size]
+                self._partial_fit(
+                    [t for t, _ in chunk], [l for _, l in chunk],
+                    self.feedback_weight
+                )
+
+            if records:
+                self.offset = offset
+                self._save()
+
+            if valid:
+                self.trained += len(valid)
+                self.pending_publish = True
+
+            if self.pending_publish and time.time() - self.last_publish >= self.publish_every:
+                self.publish()
+
+            return len(valid)
+
+    # ---------------- Publishing ----------------
+
+    def publish(self) -> str:
+        """
+        Writes models/online-<timestamp>/ (staged, then renamed).
+        """
+        import joblib
+
+        version = time.strftime("online-%Y%m%d-%H%M%S")
+        target = os.path.join(self.models_dir, version)
+        staging = os.path.join(self.models_dir, f".staging-{version}")
+        os.makedirs(staging, exist_ok=True)
+
+        joblib.dump(self.pipeline, os.path.join(staging, "abuse_model.joblib"))
+        joblib.dump(self.encoder, os.path.join(staging, "label_encoder.joblib"))
+        os.replace(staging, target)
+
+        self.pending_publish = False
+        self.last_publish = time.time()
+        self.published.append(version)
+        print(f"✅ Online model published as {version}")
+
+        if self.on_publish:
+            self.on_publish(version)
+        return version
+
+    def run(self, interval: float) -> Thread:
+        def loop():
+            try:
+                self.load()
+            except Exception as e:
+                print("⚠️ Online learner disabled:", e)
+                return
+
+            while True:
+                try:
+                    self.step()
+                except Exception as e:
+                    print("⚠️ Online learner error:", e)
+                time.sleep(interval)
+
+        thread = Thread(target=loop, name="toxiguard-online-learner", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        return {
+            "feedback_recorded": self.feedback.recorded,
+            "trained": self.trained,
+            "skipped": self.skipped,
+            "offset": self.offset,
+            "pending_publish": self.pending_publish,
+            "last_version": self.published[-1] if self.published else None
+        }
@@ -21,6 +21,22 @@ OBFUSCATION_MAP = {
 }
 
 
+# =====================================================
+# PRECOMPILED TABLES
+# =====================================================
+
+_URL_RE = re.compile(r"http\S+|www\S+")
+_EMAIL_RE = re.compile(r"\S+@\S+")
+
+# De-obfuscation and punctuation removal folded into one translate table.
+# Obfuscation outputs are letters or spaces, never punctuation, so
+# applying both at once matches applying them one after the other.
+_CLEAN_TABLE = str.maketrans(
+    {ch: None for ch in string.punctuation} |
+    {k: (v or None) for k, v in OBFUSCATION_MAP.items()}
+)
+
+
 # =====================================================
 # CLEANING PIPELINE
 # =====================================================
@@ -28,34 +44,31 @@ OBFUSCATION_MAP = {
 def normalize_text(text: str) -> str:
     """
     Normalize text for ML + rule matching.
+
+    Lowercase → strip URLs / emails → de-obfuscate → drop non-ascii
+    and punctuation → collapse whitespace.
     """
 
     if not text:
         return ""
 
-    # Lowercase
-    text = text.lower().strip()
-
-    # Replace URLs
-    text = re.sub(r"http\S+|www\S+", " ", text)
+    text = text.lower()
 
-    # Replace emails
-    text = re.sub(r"\S+@\S+", " ", text)
+    # URLs then emails (regex only runs when it can match)
+    if "http" in text or "www" in text:
+        text = _URL_RE.sub(" ", text)
+    if "@" in text:
+        text = _EMAIL_RE.sub(" ", text)
 
-    # De-obfuscate characters
-    for k, v in OBFUSCATION_MAP.items():
-        text = text.replace(k, v)
+    # De-obfuscate + remove punctuation in one pass
+    text = text.translate(_CLEAN_TABLE)
 
     # Remove emojis and non-ascii
-    text = text.encode("ascii", "ignore").decode()
-
-    # Remove punctuation (keep spaces)
-    text = text.translate(str.maketrans("", "", string.punctuation))
+    if not text.isascii():
+        text = text.encode("ascii", "ignore").decode()
 
     # Normalize whitespace
-    text = re.sub(r"\s+", " ", text).strip()
-
-    return text
+    return " ".join(text.split())
 
 
 # =====================================================
@@ -0,0 +1,67 @@
+import time
+from threading import Lock
+
+
+# =====================================================
+# TOKEN BUCKET
+# =====================================================
+
+class TokenBucket:
+    """
+    Requests-per-minute limiter with burst capacity.
+
+    A plain refill counter: it only says whether a slot is free now and
+    when the next one will be. Waiting, queueing and shedding happen in
+    the PriorityGate in front of it (utils/admission.py).
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60.0   # tokens per second
+        self.burst = max(1, burst)
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+        self.granted = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    def try_acquire(self) -> bool:
+        """
+        Takes a slot if one is free right now.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.granted += 1
+                return True
+            return False
+
+    def next_token_in(self) -> float:
+        """
+        Seconds until try_acquire() can succeed (0.0 = now).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+
+            if self._tokens >= 1:
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return (1 - self._tokens) / self.rate
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "rate_per_minute": self.rate * 60,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 2),
+                "granted": self.granted
+            }
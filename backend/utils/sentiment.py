@@ -1,10 +1,170 @@
-from textblob import TextBlob
+import os
+from functools import lru_cache
+
+from utils.engines import engine
+
+# =====================================================
+# SENTIMENT CONFIG
+# =====================================================
+
+# fast     → flat lexicon table built from TextBlob's data (default)
+# textblob → a TextBlob object per call (reference implementation)
+SENTIMENT_ENGINE = os.getenv("SENTIMENT_ENGINE", "fast").lower()
+
+# Memoized texts (repeated comments, retries, batch duplicates)
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "20000"))
+
+
+# =====================================================
+# LAZY LEXICON LOAD
+# =====================================================
+
+@engine("sentiment")
+def get_lexicon():
+    """
+    TextBlob's pattern lexicon flattened into
+    {word: (polarity, subjectivity, intensity, is_modifier)}
+    plus the negation words, built once on first use.
+    """
+    from textblob.en import sentiment
+
+    if not dict.__len__(sentiment):
+        sentiment.load()
+
+    # Untagged input only ever reads the POS-averaged (None) entry
+    table = {
+        word: (*scores[None], any(m in scores for m in sentiment.modifiers))
+        for word, scores in dict.items(sentiment)
+        if None in scores
+    }
+
+    return table, frozenset(sentiment.negations)
+
+
+# =====================================================
+# SCORING
+# =====================================================
+#
+# Port of pattern's Sentiment.assessments() for untagged text, which is
+# what TextBlob(text).sentiment runs. On normalize_text() output (what
+# the pipeline passes in) TextBlob's tokenizer reduces to str.split()
+# and its punctuation / emoticon rules never fire, so polarity and
+# subjectivity match TextBlob to within 1e-9. Raw text with punctuation
+# can differ slightly ("good!" is boosted by TextBlob, not here).
+
+def score_tokens(tokens: list[str]) -> tuple[float, float]:
+    """
+    (polarity, subjectivity) for lowercased tokens.
+    """
+    table, negations = get_lexicon()
+
+    assessments = []     # [polarity, subjectivity, intensity, negated]
+    modifier = None      # preceding known adverb ("very good")
+    negation = None      # preceding negation ("not good")
+
+    for word in tokens:
+        entry = table.get(word)
+
+        if entry is not None:
+            p, s, i, is_modifier = entry
+
+            if modifier is None:
+                assessments.append([p, s, i, False])
+            else:
+                last = assessments[-1]
+                last[0] = max(-1.0, min(p * last[2], 1.0))
+                last[1] = max(-1.0, min(s * last[2], 1.0))
+                last[2] = i
+
+            if negation is not None:
+                assessments[-1][2] = 1.0 / assessments[-1][2]
+                assessments[-1][3] = True
+
+            modifier = word if is_modifier else None
+            negation = word if word in negations else None
+            continue
+
+        if word in negations:
+            negation = word
+        elif negation and len(word.strip("'")) > 1:
+            negation = None
+
+        # "really not good"
+        if negation is not None and modifier is not None and modifier.endswith("ly"):
+            assessments[-1][3] = True
+            negation = None
+        elif modifier and len(word) > 2:
+            modifier = None
+
+    if not assessments:
+        return 0.0, 0.0
+
+    # "not good" = slightly bad, "not bad" = slightly good
+    polarity = sum(p * -0.5 if negated else p for p, _, _, negated in assessments)
+    subjectivity = sum(s for _, s, _, _ in assessments)
+
+    return polarity / len(assessments), subjectivity / len(assessments)
+
+
+@lru_cache(maxsize=SENTIMENT_CACHE_SIZE)
+def _score_text(text: str) -> tuple[float, float]:
+    if SENTIMENT_ENGINE == "textblob":
+        from textblob import TextBlob
+
+        blob = TextBlob(text)
+        return float(blob.sentiment.polarity), float(blob.sentiment.subjectivity)
+
+    return score_tokens(text.lower().split())
+
+
+def cache_stats() -> dict:
+    info = _score_text.cache_info()
+    return {
+        "engine": SENTIMENT_ENGINE,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses
+    }
 
 
 # =====================================================
 # SENTIMENT ANALYSIS
 # =====================================================
 
+def neutral_sentiment() -> dict:
+    """
+    Neutral, zero-confidence result: empty text, errors, or a sentiment
+    stage that did not run (e.g. past a deadline).
+    """
+    return {
+        "polarity": 0.0,
+        "subjectivity": 0.0,
+        "label": "neutral",
+        "confidence": 0.0
+    }
+
+
+def _from_scores(polarity: float, subjectivity: float) -> dict:
+    # Label classification
+    if polarity > 0.15:
+        label = "positive"
+    elif polarity < -0.15:
+        label = "negative"
+    else:
+        label = "neutral"
+
+    # Confidence mapping
+    confidence = min(abs(polarity), 1.0)
+
+    return {
+        "polarity": round(polarity, 3),
+        "subjectivity": round(subjectivity, 3),
+        "label": label,
+        "confidence": round(confidence, 3)
+    }
+
+
 def analyze_sentiment(text: str) -> dict:
     """
     Analyze sentiment polarity and subjectivity.
@@ -19,42 +179,37 @@ def analyze_sentiment(text: str) -> dict:
     """
 
     if not text or not text.strip():
-        return {
-            "polarity": 0.0,
-            "subjectivity": 0.0,
-            "label": "neutral",
-            "confidence": 0.0
-        }
+        return neutral_sentiment()
 
     try:
-        blob = TextBlob(text)
-        polarity = float(blob.sentiment.polarity)
-        subjectivity = float(blob.sentiment.subjectivity)
-
-        # Label classification
-        if polarity > 0.15:
-            label = "positive"
-        elif polarity < -0.15:
-            label = "negative"
-        else:
-            label = "neutral"
-
-        # Confidence mapping
-        confidence = min(abs(polarity), 1.0)
-
-        return {
-            "polarity": round(polarity, 3),
-            "subjectivity": round(subjectivity, 3),
-            "label": label,
-            "confidence": round(confidence, 3)
-        }
+        if get_lexicon() is None:
+            raise RuntimeError("sentiment engine unavailable")
+
+        return _from_scores(*_score_text(text))
 
     except Exception as e:
         print("⚠️ Sentiment error:", e)
+        return neutral_sentiment()
 
-        return {
-            "polarity": 0.0,
-            "subjectivity": 0.0,
-            "label": "neutral",
-            "confidence": 0.0
-        }
+
+def analyze_sentiment_batch(texts: list[str]) -> list[dict]:
+    """
+    analyze_sentiment for many texts; duplicates are scored once
+    (within the batch, whatever the memo cache holds).
+    """
+    scored = {text: analyze_sentiment(text) for text in dict.fromkeys(texts)}
+    return [dict(scored[text]) for text in texts]
+
+
+def combine_sentiments(results: list[dict]) -> dict:
+    """
+    Document sentiment from per-sentence results (mean polarity and
+    subjectivity), so unchanged sentences need not be rescored.
+    """
+    if not results:
+        return neutral_sentiment()
+
+    return _from_scores(
+        sum(r["polarity"] for r in results) / len(results),
+        sum(r["subjectivity"] for r in results) / len(results)
+    )
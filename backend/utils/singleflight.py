@@ -0,0 +1,56 @@
+import asyncio
+import copy
+
+
+# =====================================================
+# SINGLE-FLIGHT REQUEST COALESCING
+# =====================================================
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time.
+
+    The first caller for a key starts the computation as its own task;
+    concurrent callers with the same key wait on that task. Every caller
+    gets a deep copy of the result, and a caller disconnecting does not
+    cancel the shared computation.
+    """
+
+    def __init__(self):
+        self._inflight = {}   # key -> asyncio.Task
+
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key, fn):
+        """
+        `fn` is a zero-argument coroutine function, only called by the
+        first caller for `key`.
+        """
+        task = self._inflight.get(key)
+
+        if task is None:
+            task = asyncio.get_running_loop().create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.leaders += 1
+        else:
+            self.collapsed += 1
+
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "collapsed": self.collapsed
+        }
@@ -0,0 +1,182 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+# =====================================================
+# KEYING
+# =====================================================
+
+def cache_key(text: str) -> str:
+    """
+    Hash of the case- and whitespace-normalized text.
+    """
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+# =====================================================
+# LRU + TTL CACHE
+# =====================================================
+
+class VerdictCache:
+    """
+    Size-bounded LRU cache with per-entry TTL for LLM verdicts.
+
+    When `db_path` is set, entries are also written to a SQLite file
+    so they survive restarts. Memory is checked first, SQLite second.
+    The file is pruned at startup and every PRUNE_EVERY writes: expired
+    rows go, then the oldest rows beyond `db_max_size`.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600.0,
+                 db_path: str | None = None, db_max_size: int = 100000):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_max_size = db_max_size
+
+        self._entries = OrderedDict()   # key -> (expires_at, result)
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db_evictions = 0
+        self._writes = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "key TEXT PRIMARY KEY, result TEXT, expires_at REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS verdicts_expires ON verdicts (expires_at)"
+            )
+            self._prune_db()
+
+    # ---------------- Lookup ----------------
+
+    def get(self, text: str) -> dict | None:
+        key = cache_key(text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry and entry[0] < now:
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT result, expires_at FROM verdicts "
+                    "WHERE key = ? AND expires_at >= ?",
+                    (key, now)
+                ).fetchone()
+                if row:
+                    entry = (row[1], json.loads(row[0]))
+                    self._insert(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def contains(self, text: str) -> bool:
+        """
+        Whether a live verdict exists for `text`. No stats, no LRU bump.
+        """
+        key = cache_key(text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] >= now:
+                return True
+
+            if self._db is None:
+                return False
+            return self._db.execute(
+                "SELECT 1 FROM verdicts WHERE key = ? AND expires_at >= ?",
+                (key, now)
+            ).fetchone() is not None
+
+    # ---------------- Store ----------------
+
+    def put(self, text: str, result: dict):
+        key = cache_key(text)
+        entry = (time.time() + self.ttl, copy.deepcopy(result))
+
+        with self._lock:
+            self._insert(key, entry)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?)",
+                    (key, json.dumps(entry[1]), entry[0])
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune_db()
+                else:
+                    self._db.commit()
+
+    def _prune_db(self):
+        """
+        Drops expired rows, then the soonest-to-expire (oldest) rows
+        beyond db_max_size. Caller holds the lock (or is __init__).
+        """
+        self._db.execute("DELETE FROM verdicts WHERE expires_at < ?", (time.time(),))
+
+        excess = self._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] - self.db_max_size
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM verdicts WHERE key IN ("
+                "SELECT key FROM verdicts ORDER BY expires_at LIMIT ?)",
+                (excess,)
+            )
+            self.db_evictions += excess
+
+        self._db.commit()
+
+    def _insert(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # ---------------- Admin ----------------
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM verdicts")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persistent": self._db is not None,
+                "db_max_size": self.db_max_size if self._db is not None else None,
+                "db_evictions": self.db_evictions
+            }
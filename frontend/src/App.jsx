@@ -1,5 +1,5 @@
 import { useEffect, useRef, useState } from "react";
-import { predictText } from "./api";
+import { applyDelta, openModerationSocket, predictText } from "./api";
 
 import Header from "./components/Header";
 import TextInput from "./components/TextInput";
@@ -26,12 +26,70 @@ export default function App() {
   // Used to prevent stale responses
   const requestIdRef = useRef(0);
 
+  // 🔌 Live moderation socket (falls back to /predict when closed)
+  const socketRef = useRef(null);
+  const liveResultRef = useRef({}); // result rebuilt from server deltas
+  const liveSeqRef = useRef(0);
+  const [socketOpen, setSocketOpen] = useState(false);
+  const [pending, setPending] = useState(false);
+
+  useEffect(() => {
+    if (!realtime) return;
+
+    const socket = openModerationSocket({
+      onOpen: () => {
+        liveResultRef.current = {};
+        setSocketOpen(true);
+      },
+      onClose: () => {
+        socketRef.current = null;
+        setSocketOpen(false);
+      },
+      onDelta: (delta) => {
+        // Deltas build on each other: apply every one, in order
+        liveResultRef.current = applyDelta(liveResultRef.current, delta);
+
+        const latest = delta.seq === liveSeqRef.current;
+        if (!latest) return;
+
+        setResult(liveResultRef.current);
+
+        if (delta.phase === "final") {
+          setPending(false);
+
+          // Push into toxicity graph
+          setToxicityHistory((prev) => [
+            ...prev.slice(-30),
+            {
+              time: new Date().toLocaleTimeString(),
+              value: Math.round(liveResultRef.current.confidence * 100),
+            },
+          ]);
+        }
+      },
+    });
+
+    socketRef.current = socket;
+    return () => socket.close();
+  }, [realtime]);
+
   // -------------------------------------------
   // ⚡ Real-Time Detection (Debounced + Safe)
   // -------------------------------------------
   useEffect(() => {
     if (!realtime || text.trim().length < 5) {
       setResult(null);
+      setPending(false);
+      return;
+    }
+
+    // Socket: the server debounces, cancels stale work and only
+    // rescores the sentences that changed
+    if (socketOpen && socketRef.current?.isOpen()) {
+      ++requestIdRef.current;
+      setLoading(false);
+      setPending(true);
+      socketRef.current.send(++liveSeqRef.current, text);
       return;
     }
 
@@ -65,7 +123,7 @@ export default function App() {
     }, 1200); // debounce delay
 
     return () => clearTimeout(timer);
-  }, [text, realtime]);
+  }, [text, realtime, socketOpen]);
 
   // -------------------------------------------
   // 🔍 Manual Analyze Button
@@ -168,7 +226,12 @@ export default function App() {
       )}
 
       {/* 🔴 Main Result */}
-      <LiveResult loading={loading} result={result} inputText={text} />
+      <LiveResult
+        loading={loading}
+        pending={pending}
+        result={result}
+        inputText={text}
+      />
 
       {/* 📈 Live Toxicity Trend */}
       {toxicityHistory.length > 0 && (
@@ -35,3 +35,47 @@ export async function predictText(text) {
     body: JSON.stringify({ text }),
   });
 }
+
+// =====================================================
+// Live Moderation (WebSocket)
+// =====================================================
+
+export function openModerationSocket({ onDelta, onOpen, onClose }) {
+  const socket = new WebSocket(`${BASE_URL.replace(/^http/, "ws")}/ws/moderate`);
+
+  socket.onopen = () => onOpen?.();
+  socket.onclose = () => onClose?.();
+
+  socket.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+
+    if (message.type === "delta") {
+      onDelta(message);
+    } else if (message.type === "error") {
+      console.error("Live moderation error:", message.detail);
+    }
+  };
+
+  return {
+    isOpen: () => socket.readyState === WebSocket.OPEN,
+    send: (seq, text) =>
+      socket.send(JSON.stringify({ type: "text", seq, text })),
+    close: () => socket.close(),
+  };
+}
+
+// Rebuilds the full result from the previous one plus a server delta
+export function applyDelta(result, delta) {
+  const next = { ...result, ...delta.changes };
+  delta.removed.forEach((key) => delete next[key]);
+
+  if (delta.sentences) {
+    const sentences = (result.sentences || []).slice(0, delta.sentences.count);
+    Object.entries(delta.sentences.changed).forEach(([index, sentence]) => {
+      sentences[Number(index)] = sentence;
+    });
+    next.sentences = sentences;
+  }
+
+  return next;
+}
@@ -39,7 +39,7 @@ function SeverityBadge({ severity }) {
 // -----------------------------------------------------
 // Main Component
 // -----------------------------------------------------
-export default function LiveResult({ loading, result, inputText }) {
+export default function LiveResult({ loading, pending, result, inputText }) {
   if (loading) {
     return (
       <div className="glass result-card">
@@ -65,12 +65,19 @@ export default function LiveResult({ loading, result, inputText }) {
     source,
     sentiment,
     llm,
+    sentences,
   } = result;
 
+  const flaggedSentences = sentences?.filter((s) => s.toxic).length || 0;
+
   const highlightedHTML = highlightText(inputText, abusive_words);
 
+  // Only show explanations from an LLM call that actually answered
+  const llmAnswered = !llm?.status || ["ok", "queued"].includes(llm.status);
+
   const llmExplanation =
     llm?.explanation &&
+    llmAnswered &&
     llm.explanation !== "LLM unavailable or parsing failed"
       ? llm.explanation
       : null;
@@ -83,6 +90,7 @@ export default function LiveResult({ loading, result, inputText }) {
         <div className="result-header">
           <h3>{toxic ? "⚠️ Toxic Content" : "✅ Safe Content"}</h3>
           <SeverityBadge severity={severity} />
+          {pending && <span className="pending-note">Updating…</span>}
         </div>
 
         {/* Confidence */}
@@ -115,6 +123,15 @@ export default function LiveResult({ loading, result, inputText }) {
             <div>{reason || "—"}</div>
           </div>
 
+          {sentences?.length > 1 && (
+            <div>
+              <b>Flagged Sentences</b>
+              <div>
+                {flaggedSentences} / {sentences.length}
+              </div>
+            </div>
+          )}
+
           {sentiment && (
             <div>
               <b>Sentiment</b>